@@ -1,26 +1,16 @@
-import time
-
 from magiceden_api import MagicParser
+from magiceden_api.watcher import CollectionWatcher
 
-known_collections = []  # better use db
-delay = 60
-
-if __name__ == '__main__':
-    mp = MagicParser()
 
-    # First init. Load all known collections to database
-    collections = mp.get_all_collections()
-    [known_collections.append(el['symbol']) for el in collections]
+def on_new_collection(event):
+    print("\n[+] New Collection!\n"
+          f"Name: '{event.collection['name']}'\n"
+          f"Link: https://magiceden.io/marketplace/{event.symbol}\n")
 
-    while 1:
-        print(f"[~] Delay {delay} sec...")
-        time.sleep(delay)
 
-        collections = mp.get_all_collections()
-        for el in collections:
-            if el['symbol'] not in known_collections:
-                known_collections.append(el['symbol'])
-                print("\n[+] New Collection!\n"
-                      f"Name: '{el['name']}'\n"
-                      f"Link: https://magiceden.io/marketplace/{el['symbol']}\n")
+if __name__ == '__main__':
+    mp = MagicParser()
 
+    # known collections are saved to collections.json, so restart don't miss new ones
+    watcher = CollectionWatcher(mp, index_path='collections.json', interval=60, on_add=on_new_collection)
+    watcher.run()
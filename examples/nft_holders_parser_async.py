@@ -0,0 +1,22 @@
+import asyncio
+
+from magiceden_api import AsyncMagicParser
+
+
+async def main():
+    async with AsyncMagicParser(concurrency=50) as ap:
+        collection = (await ap.get_popular_collections(limit=1, period='5m'))[0]
+        holders = (await ap.get_holders(collection_symbol=collection['collectionSymbol']))['topHolders']
+
+        # all holders at once, not more than 50 requests in flight
+        users = await ap.map(ap.get_user_info, [holder['owner'] for holder in holders], return_exceptions=True)
+
+        for holder, user in zip(holders, users):
+            if isinstance(user, Exception) or user == {} or 'displayName' not in user:
+                continue
+
+            print(f"{user['displayName']} - {holder['tokens']} tokens - {holder['buy7d']['volume'] / 10 ** 9} SOL")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
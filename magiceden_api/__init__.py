@@ -1,13 +1,30 @@
-import os
 import sys
-import json
 import time
 import logging
-from urllib.parse import quote, urlencode
+import warnings
+from contextlib import contextmanager
+from urllib.parse import urlsplit
 
 import requests
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
+
+from magiceden_api.batching import CollectionBatcher, SymbolBatcher
+from magiceden_api.cache import TTLCache
+from magiceden_api.driver import DRIVER_MODES, DriverPool, LazyDriver, is_challenge
+from magiceden_api.decoding import Decoder
+from magiceden_api.endpoints import SALE_TX_TYPES, Endpoints
+from magiceden_api.models import Listing, Activity, Holder, PopularCollection, Collection, iter_models, to_models
+from magiceden_api.metrics import DRIVER, HTTP, RETRY, Metrics, RequestEvent, endpoint_name
+from magiceden_api.pagination import paginate
+from magiceden_api.portfolio import get_wallet_portfolios
+from magiceden_api.ratelimit import RateLimiter, RetryPolicy, RetryError, CircuitOpenError, parse_retry_after
+from magiceden_api.singleflight import SingleFlight, normalize_url
+from magiceden_api.transport import Transport
+
+__all__ = [
+    'MagicParser', 'CollectionBatcher', 'SymbolBatcher', 'DriverPool', 'Endpoints', 'TTLCache', 'Metrics',
+    'RateLimiter', 'RetryPolicy', 'RetryError', 'CircuitOpenError', 'Transport',
+    'Listing', 'Activity', 'Holder', 'PopularCollection', 'Collection',
+]  # AsyncMagicParser is not listed, star import must not require aiohttp
 
 logger = logging.getLogger('MagicParser')
 
@@ -22,7 +39,11 @@ logger.setLevel(logging.ERROR)
 
 
 class MagicParser:
-    def __init__(self, profile: str = 'main', driver_headless: bool = True, temp_dir_path: str = None):
+    def __init__(self, profile: str = 'main', driver_headless: bool = True, temp_dir_path: str = None,
+                 driver_mode: str = 'lazy', driver_idle_timeout: float = 300, driver_pool: DriverPool = None,
+                 endpoints: Endpoints = None, cache: TTLCache = None, rate_limiter: RateLimiter = None,
+                 retry_policy: RetryPolicy = None, json_backend: str = None, metrics: Metrics = None,
+                 transport: Transport = None, single_flight: bool = True):
         """
         MagicEden api parser
 
@@ -32,96 +53,396 @@ class MagicParser:
         driver_headless: Chrome Headless mode
 
         temp_dir_path: Chrome profile dir
+
+        driver_mode: 'eager' - start Chrome now | 'lazy' - start Chrome on first Cloudflare fallback |
+        'http' - never use Chrome
+
+        driver_idle_timeout: seconds before idle Chrome is closed in 'lazy' mode. None - never close
+
+        driver_pool: shared DriverPool for Cloudflare fallback instead of own Chrome
+
+        endpoints: api urls builder. Default - MagicEden mainnet
+
+        cache: TTLCache or SqliteCache of responses of edge cached endpoints (edge_cache=true) and endpoints with
+        own ttl. Can be shared by many parsers. None - no cache
+
+        rate_limiter: RateLimiter with per host rate and circuit breaker. Can be shared by many parsers
+
+        retry_policy: RetryPolicy with attempts per call and backoff
+
+        json_backend: orjson | msgspec | json. None - fastest installed
+
+        metrics: Metrics for per endpoint latency, statuses, retries and fallbacks. None - no metrics
+
+        transport: Transport with connection pools, timeouts, compression and HTTP/2 settings
+
+        single_flight: concurrent calls of the same url share one request, including Chrome fallback
+        """
+        if driver_mode not in DRIVER_MODES:
+            raise ValueError(f"driver_mode available states {', '.join(DRIVER_MODES)}")
+
+        self.endpoints = endpoints or Endpoints()
+        self.transport = transport or Transport()
+        self.session = self.transport.session(
+            [self.endpoints.api_host, self.endpoints.stats_host, self.endpoints.binance_host]
+        )
+        self.driver_mode = driver_mode
+        self.cache = cache
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.decoder = Decoder(json_backend)
+        self.metrics = metrics
+        self.flights = SingleFlight() if single_flight else None
+        self.clearance = {}  # host: cf_clearance expiration timestamp
+
+        self._driver = None
+        self._own_driver = driver_pool is None
+        if driver_pool is not None and driver_mode != 'http':
+            self._driver = driver_pool
+        elif driver_mode != 'http':
+            self._driver = LazyDriver(
+                profile=profile,
+                driver_headless=driver_headless,
+                temp_dir_path=temp_dir_path,
+                idle_timeout=driver_idle_timeout if driver_mode == 'lazy' else None
+            )
+            if driver_mode == 'eager':
+                self._driver.get()
+                self._driver.release()
+
+    @property
+    def driver(self):
+        """
+        Deprecated. Returned driver can be closed by idle timer or recycled while it is still used.
+        Use `with mp.use_driver() as driver:`
         """
-        self.session = requests.Session()
+        warnings.warn('MagicParser.driver is deprecated, use "with mp.use_driver() as driver:"',
+                      DeprecationWarning, stacklevel=2)
+        with self.use_driver() as driver:
+            return driver
 
-        if temp_dir_path is None:
-            temp_dir_path = f"{os.getcwd()}\\_temp\\profile_{profile}".replace('\\', '\\\\')
+    @contextmanager
+    def use_driver(self):
+        """
+        Chrome driver that is not closed by idle timer until the block ends
+
+        with mp.use_driver() as driver:
+            driver.get(url)
 
-        os.makedirs(temp_dir_path, exist_ok=True)
-        options = uc.ChromeOptions()
-        options.add_argument("--disable-gpu")
-        options.page_load_strategy = 'eager'
-        options.headless = driver_headless
-        self.driver = uc.Chrome(options=options, user_data_dir=temp_dir_path, use_subprocess=True)
+        :return: uc.Chrome driver
+        """
+        if self._driver is None:
+            raise RuntimeError("Chrome driver is disabled in 'http' driver_mode")
+        if not self._own_driver:
+            raise RuntimeError("Parser use shared driver_pool. Use driver_pool.acquire()")
+        with self._driver as driver:
+            yield driver
 
-    def _request(self, url, retry_timeout=5):
-        r = None
-        is_error = True
-        while is_error:
+    def close(self):
+        """
+        Close Chrome and http session. Shared driver_pool is not closed
+        """
+        if self._driver is not None and self._own_driver:
+            self._driver.quit()
+        self.session.close()
+
+    def _request(self, url, raw=False, fields=None, path=None, cache=True, refresh=False):
+        """
+        Get url data
+
+        :param url: request url
+        :param raw: return response bytes without decoding
+        :param fields: decode only these fields of records list
+        :param path: key of records list for fields. None - payload is records list
+        :param cache: use response cache. False - don't read and don't save
+        :param refresh: don't read cached response, save new one
+        :return: data
+        """
+        ttl = self.cache.ttl_for(url) if cache and self.cache is not None else None
+        content = None
+        if ttl is not None and not refresh:
+            content = self.cache.get(str(url))
+
+        if content is None:
+            content = self._fetch(url)
+            if ttl is not None:
+                self.cache.set(str(url), content, ttl)
+
+        if raw:
+            return content
+        if fields:
+            return self.decoder.extract(content, fields, path)
+        return self.decoder.loads(content)
+
+    def fetch(self, url) -> bytes:
+        """
+        Response content of url, not cached. Rate limited, retried and fetched through Chrome when
+        Cloudflare blocks the request. Used by AsyncMagicParser fallback
+
+        :param url: request url
+        :return: response bytes
+        """
+        return self._fetch(url)
+
+    def _fetch(self, url) -> bytes:
+        if self.flights is not None:
+            return self.flights.do(normalize_url(url), self._fetch_once, url)
+        return self._fetch_once(url)
+
+    def _fetch_once(self, url) -> bytes:
+        r = self._http_get(url)
+        if r.status_code == 200:
+            return r.content
+        return self._fallback(url, r)
+
+    def _http_get(self, url, headers: dict = None) -> requests.Response:
+        """
+        Rate limited GET. Network errors, 429 and 5xx are retried with backoff
+
+        :param url: request url
+        :param headers: extra headers
+        :return: response
+        """
+        host = urlsplit(url).hostname
+        bucket = self.rate_limiter.bucket(host)
+        breaker = self.rate_limiter.breaker(host)
+        attempts = self.retry_policy.max_attempts
+
+        last_error = None
+        for attempt in range(attempts):
+            breaker.check(host)
+            bucket.acquire()
+
+            retry_after = None
+            started = time.time()
+            try:
+                r = self.session.get(url, headers=headers, timeout=self.transport.timeout)
+            except requests.RequestException as e:
+                logger.debug(e)
+                last_error = e
+                breaker.record_failure()
+                if self.metrics is not None:
+                    self._record(url, HTTP, time.time() - started, attempt=attempt, error=str(e), started=started)
+            else:
+                if self.metrics is not None:
+                    self._record(url, HTTP, time.time() - started, r.status_code, len(r.content), attempt,
+                                 started=started)
+                if r.status_code != 429 and (r.status_code < 500 or is_challenge(r)):
+                    bucket.on_success()
+                    breaker.record_success()
+                    return r
+
+                last_error = f'HTTP {r.status_code}'
+                retry_after = parse_retry_after(r.headers.get('Retry-After'))
+                bucket.on_throttle()
+                breaker.record_failure()
+
+            if attempt < attempts - 1:
+                delay = self.retry_policy.delay(attempt, retry_after)
+                if self.metrics is not None:
+                    self._record(url, RETRY, delay, attempt=attempt, error=str(last_error))
+                time.sleep(delay)
+
+        raise RetryError(url, attempts, last_error)
+
+    def _record(self, url, kind, seconds, status=None, size=0, attempt=0, error=None, started=None):
+        self.metrics.record(RequestEvent(
+            endpoint_name(url), str(url), kind, seconds, status, size, attempt, error,
+            time.time() if started is None else started
+        ))
+
+    def _fallback(self, url, r: requests.Response):
+        """
+        Request blocked by Cloudflare. Get it through Chrome
+
+        :param url: request url
+        :param r: blocked response
+        :return: response content
+        """
+        # Cloudflare rejected copied clearance, Chrome will get new one
+        self.clearance.pop(urlsplit(url).hostname, None)
+
+        if self._driver is None:
+            r.raise_for_status()
+            return r.content
+
+        attempts = self.retry_policy.max_attempts
+        last_error = None
+        for attempt in range(attempts):
+            started = time.time()
             try:
-                r = self.session.get(url, timeout=30)
-                is_error = False
+                content = self._driver_request(url)
             except Exception as e:
                 logger.debug(e)
-                time.sleep(retry_timeout)
-
+                last_error = e
+                if self.metrics is not None:
+                    self._record(url, DRIVER, time.time() - started, attempt=attempt, error=str(e), started=started)
+                if attempt < attempts - 1:
+                    delay = self.retry_policy.delay(attempt)
+                    if self.metrics is not None:
+                        self._record(url, RETRY, delay, attempt=attempt, error=str(e))
+                    time.sleep(delay)
+            else:
+                if self.metrics is not None:
+                    self._record(url, DRIVER, time.time() - started, 200, len(content), attempt, started=started)
+                return content
+
+        raise RetryError(url, attempts, last_error)
+
+    def _conditional_request(self, url, validators: dict = None):
+        """
+        Request with If-None-Match / If-Modified-Since headers
+
+        :param url: request url
+        :param validators: {'etag': ..., 'last_modified': ...} from previous response
+        :return: (data or None if not modified, new validators)
+        """
+        validators = validators or {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        r = self._http_get(url, headers)
+        if r.status_code == 304:
+            return None, validators
         if r.status_code == 200:
-            return r.json()
-        else:
-            while True:
-                try:
-                    return self._driver_request(url)
-                except Exception as e:
-                    logger.debug(e)
-                    time.sleep(retry_timeout)
+            validators = {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
+            return self.decoder.loads(r.content), validators
+        return self.decoder.loads(self._fallback(url, r)), {}
+
+    def _driver_request(self, url) -> bytes:
+        page = self._driver.request(url)
+        content = page.text.strip().encode()
+        if content[:1] not in (b'{', b'['):
+            raise ValueError(f'Not json page: {content[:100]}')
+        self._apply_clearance(url, page.cookies, page.user_agent)
+        return content
+
+    def _apply_clearance(self, url, cookies: list[dict], user_agent: str):
+        """
+        Copy Cloudflare cookies and User-Agent from Chrome to requests session.
+        Next requests to the same host pass Cloudflare without Chrome until cf_clearance expires
+
+        :param url: url solved by Chrome
+        :param cookies: Chrome cookies
+        :param user_agent: Chrome User-Agent. cf_clearance valid only with it
+        """
+        host = urlsplit(url).hostname
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie['name'],
+                cookie['value'],
+                domain=cookie.get('domain', host),
+                path=cookie.get('path', '/'),
+                expires=cookie.get('expiry'),
+                secure=cookie.get('secure', False)
+            )
+            if cookie['name'] == 'cf_clearance':
+                self.clearance[host] = cookie.get('expiry')
+
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+
+    def has_clearance(self, url) -> bool:
+        """
+        Check requests session has not expired cf_clearance for url host
+
+        :param url: url or host
+        :return: False | True
+        """
+        host = urlsplit(url).hostname or url
+        if host not in self.clearance:
+            return False
 
-    def _driver_request(self, url):
-        self.driver.get(url)
-        text = self.driver.find_element(By.TAG_NAME, 'body').get_attribute("textContent")
-        return json.loads(text)
+        expires = self.clearance[host]
+        return expires is None or expires > time.time()
 
-    def get_featured_carousels(self) -> list[dict]:
+    def get_featured_carousels(self, cache=True, refresh=False) -> list[dict]:
         """
         Get all data form Carousels on MagicEden main page
 
+        :param cache: use response cache
+        :param refresh: ignore cached response and save new one
         :return: list of carousels data.
         """
-        url = 'https://api-mainnet.magiceden.io/featured_carousels?edge_cache=true'
-        return self._request(url)
+        url = self.endpoints.featured_carousels()
+        return self._request(url, cache=cache, refresh=refresh)
 
-    def get_featured_collections_carousels(self) -> list[dict]:
+    def get_featured_collections_carousels(self, cache=True, refresh=False) -> list[dict]:
         """
         Get featured collections from MagicEden main page
 
+        :param cache: use response cache
+        :param refresh: ignore cached response and save new one
         :return: list of featured collections.
         """
-        url = 'https://api-mainnet.magiceden.io/featured_collections_carousels?edge_cache=true'
-        return self._request(url)
+        url = self.endpoints.featured_collections_carousels()
+        return self._request(url, cache=cache, refresh=refresh)
 
-    def get_magiceden_volumes(self) -> dict:
+    def get_magiceden_volumes(self, cache=True, refresh=False) -> dict:
         """
         Get Total ME volumes and volumes per 24h
 
+        :param cache: use response cache
+        :param refresh: ignore cached response and save new one
         :return: dict of volumes
         """
-        url = 'https://api-mainnet.magiceden.io/volumes?edge_cache=true'
-        return self._request(url)
+        url = self.endpoints.magiceden_volumes()
+        return self._request(url, cache=cache, refresh=refresh)
 
-    def get_all_collections(self) -> list[dict]:
+    def get_all_collections(self, raw=False, fields=None, cache=True, refresh=False) -> list[dict]:
         """
         Get all collections with little information
 
+        :param raw: return response bytes {"collections": [...]} without decoding
+        :param fields: decode only these collection fields, for example ['symbol', 'name']
+        :param cache: use response cache
+        :param refresh: ignore cached response and save new one
         :return: list of collections.
         """
-        url = 'https://api-mainnet.magiceden.io/all_collections_with_escrow_data?edge_cache=true'
-        return self._request(url)['collections']
+        url = self.endpoints.all_collections()
+        if raw:
+            return self._request(url, raw=True, cache=cache, refresh=refresh)
+        if fields:
+            return self._request(url, fields=fields, path='collections', cache=cache, refresh=refresh)
+        return self._request(url, cache=cache, refresh=refresh)['collections']
+
+    def get_all_collections_if_modified(self, validators: dict = None) -> tuple:
+        """
+        Get all collections only if they changed since previous call.
+        Server ETag / Last-Modified are used when available
+
+        :param validators: validators returned by previous call
+        :return: (list of collections or None if not modified, validators)
+        """
+        url = self.endpoints.all_collections()
+        data, validators = self._conditional_request(url, validators)
+        if data is None:
+            return None, validators
+        return data['collections'], validators
 
-    def get_all_organizations(self) -> list[dict]:
+    def get_all_organizations(self, raw=False, fields=None, cache=True, refresh=False) -> list[dict]:
         """
         Get all organizations registered on ME and they bio
 
+        :param raw: return response bytes without decoding
+        :param fields: decode only these organization fields
+        :param cache: use response cache
+        :param refresh: ignore cached response and save new one
         :return: list of organizations.
         """
-        url = 'https://api-mainnet.magiceden.io/all_organizations?edge_cache=true'
-        return self._request(url)
+        url = self.endpoints.all_organizations()
+        return self._request(url, raw=raw, fields=fields, cache=cache, refresh=refresh)
 
-    def get_popular_collections(self, limit=1000, period='1d') -> list[dict]:
+    def get_popular_collections(self, limit=1000, period='1d', typed=False) -> list[dict]:
         """
         Parse top collections per set period
 
         :param limit: items limit (1-1000)
         :param period: '5m', '15m', '1h', '6h', '1d', '7d', '30d'
+        :param typed: return list of PopularCollection models
         :return: list of collections.
         """
 
@@ -129,9 +450,11 @@ class MagicParser:
             print("Error! 'get_collections': period available states '5m', '15m', '1h', '6h', '1d', '7d', '30d'")
             exit()
 
-        url = f"https://stats-mainnet.magiceden.io/collection_stats/popular_collections/sol?limit={limit}" \
-              f"&window={period}"
-        return self._request(url)
+        url = self.endpoints.popular_collections(limit, period)
+        collections = self._request(url)
+        if typed:
+            return to_models(collections, PopularCollection)
+        return collections
 
     def get_price(self, currency='SOL') -> dict:
         """
@@ -140,17 +463,19 @@ class MagicParser:
         :param currency: 'SOL' / 'ETH'
         :return: dict with price data {symbol: "SOLUSDC", price: "31.64000000"}
         """
-        url = f'https://api.binance.com/api/v3/ticker/price?symbol={currency}USDC'
+        url = self.endpoints.price(currency)
         return self._request(url)
 
-    def get_launchpad_collections(self) -> list[dict]:
+    def get_launchpad_collections(self, cache=True, refresh=False) -> list[dict]:
         """
         Get list of launchpad collections
 
+        :param cache: use response cache
+        :param refresh: ignore cached response and save new one
         :return: list of launchpad collections
         """
-        url = 'https://api-mainnet.magiceden.io/launchpad_collections?edge_cache=true'
-        return self._request(url)
+        url = self.endpoints.launchpad_collections()
+        return self._request(url, cache=cache, refresh=refresh)
 
     def get_auctions(self, status='live', timeout=30000) -> list[dict]:
         """
@@ -160,20 +485,12 @@ class MagicParser:
         :param timeout: period limit
         :return: list of auctions
         """
-        sort = '%7B%22config.endDate%22:1%7D'
-        if status == 'upcoming':
-            sort = '%7B%22config.startDate%22:1%7D'
-
-        elif status == 'finished':
-            sort = '%7B%22config.endDate%22:-1%7D&limit=20&'
-
-        url = f'https://api-mainnet.magiceden.io/auctions?status={status}&sort={sort}&' \
-              f'edge_cache=true&timeout={timeout}'
+        url = self.endpoints.auctions(status, timeout)
         return self._request(url)
 
     def get_auction_by_symbol(self, collection_symbol):
         # search_params = {"$match": {}, "$sort": {"price": 1}, "$skip": 0, "$limit": 20} not now
-        url = f'https://api-mainnet.magiceden.io/auctions/{collection_symbol}'
+        url = self.endpoints.auction_by_symbol(collection_symbol)
         return self._request(url)
 
     def get_drops(self, limit=500, offset=0, top=None) -> list[dict]:
@@ -186,25 +503,34 @@ class MagicParser:
         :return: list of drops
         """
 
-        params = {
-            'limit': limit,
-            'offset': offset
-        }
+        url = self.endpoints.drops(limit, offset, top)
+        return self._request(url)
 
-        if top is not None:
-            params['top'] = top
+    def iter_drops(self, page_size=500, max_items=None, timeout=None, prefetch=True):
+        """
+        Iterate over all drops. Pages are loaded on demand
 
-        url = f'https://api-mainnet.magiceden.io/drops?{urlencode(params)}'
-        return self._request(url)
+        :param page_size: [1-500] drops per request
+        :param max_items: stop after this count of drops
+        :param timeout: stop after this count of seconds
+        :param prefetch: load next page in background
+        :return: drops generator
+        """
+        return paginate(
+            lambda offset, limit: self.get_drops(limit, offset),
+            page_size=page_size, max_items=max_items, timeout=timeout, prefetch=prefetch
+        )
 
-    def get_most_watched_collections(self) -> list[dict]:
+    def get_most_watched_collections(self, cache=True, refresh=False) -> list[dict]:
         """
         Get list of collections most_watched
 
+        :param cache: use response cache
+        :param refresh: ignore cached response and save new one
         :return: list of collections
         """
-        url = 'https://api-mainnet.magiceden.io/collection_watchlists/most_watched?edge_cache=true'
-        return self._request(url)
+        url = self.endpoints.most_watched_collections()
+        return self._request(url, cache=cache, refresh=refresh)
 
     def get_multi_collection_stats(self, collections_symbols: list) -> list[dict]:
         """
@@ -212,8 +538,7 @@ class MagicParser:
         :param collections_symbols:
         :return:
         """
-        collections_symbols = ','.join(collections_symbols)
-        url = f'https://api-mainnet.magiceden.io/rpc/getMultiCollectionEscrowStats/{collections_symbols}'
+        url = self.endpoints.multi_collection_stats(collections_symbols)
         return self._request(url)
 
     def get_collections_witch_symbols(self, collection_symbols: list) -> list[dict]:
@@ -224,15 +549,14 @@ class MagicParser:
         :return: list collections info
         """
 
-        collection_symbols = quote(str(collection_symbols)).replace('%27', '%22')
-        url = f'https://api-mainnet.magiceden.io/rpc/getCollectionsWithSymbols?symbols={collection_symbols}'
+        url = self.endpoints.collections_witch_symbols(collection_symbols)
         return self._request(url)
 
     def get_collection_escrow_stats(self, collection_symbol: str) -> dict:
-        url = f'https://api-mainnet.magiceden.io/rpc/getCollectionEscrowStats/{collection_symbol}'
+        url = self.endpoints.collection_escrow_stats(collection_symbol)
         return self._request(url)
 
-    def get_collection(self, symbol: str) -> dict:
+    def get_collection(self, symbol: str, typed=False) -> dict:
         """
         Get collection info
 
@@ -266,10 +590,14 @@ class MagicParser:
         }
 
         :param symbol:
+        :param typed: return Collection model
         :return:
         """
-        url = f'https://api-mainnet.magiceden.io/collections/{symbol}'
-        return self._request(url)
+        url = self.endpoints.collection(symbol)
+        collection = self._request(url)
+        if typed:
+            return Collection.from_dict(collection)
+        return collection
 
     def check_collection_scam_flag(self, collection_symbol: str) -> bool:
         """
@@ -278,7 +606,7 @@ class MagicParser:
         :return: False | True
         """
 
-        url = f'https://api-mainnet.magiceden.io/collection_flags/check/{collection_symbol}'
+        url = self.endpoints.collection_scam_flag(collection_symbol)
         return self._request(url)['hasFlag']
 
     def get_twitter_followers(self, collection_symbol: str) -> int:
@@ -288,7 +616,7 @@ class MagicParser:
         :param collection_symbol: collection symbol
         :return: int followers count
         """
-        url = f'https://stats-mainnet.magiceden.io/social_metrics/collection/{collection_symbol}'
+        url = self.endpoints.twitter_followers(collection_symbol)
         return self._request(url)['twitterFollowerCount']
 
     def get_nft_by_mint_address(self, mint_address: str, use_rarity=False) -> dict:
@@ -299,12 +627,7 @@ class MagicParser:
         :param use_rarity:
         :return: nft info dict
         """
-        if use_rarity:
-            use_rarity = 'true'
-        else:
-            use_rarity = 'false'
-
-        url = f'https://api-mainnet.magiceden.io/rpc/getNFTByMintAddress/{mint_address}?useRarity={use_rarity}'
+        url = self.endpoints.nft_by_mint_address(mint_address, use_rarity)
         return self._request(url)
 
     def get_whitelists(self) -> list[dict]:
@@ -312,30 +635,45 @@ class MagicParser:
         Get upcoming whitelist
         :return: list of dicts
         """
-        url = 'https://api-mainnet.magiceden.io/whitelists/upcoming'
+        url = self.endpoints.whitelists()
         return self._request(url)
 
-    def get_listed_nfts(self, collection_symbol) -> list[dict]:
+    def get_listed_nfts(self, collection_symbol, *, offset=0, limit=20, typed=False) -> list[dict]:
         """
         Get all listings from collections
 
         :param collection_symbol: symbol name of collection
+        :param offset: listings offset
+        :param limit: listings limit
+        :param typed: return list of Listing models
         :return: list of dict listings info
         """
-        q = {
-            "$match": {
-                "collectionSymbol": collection_symbol
-            },
-            "$sort": {
-                "takerAmount": 1
-            },
-            "$skip": 0,
-            "$limit": 20,
-            "status": []
-        }
-        q = json.dumps(q)
-        url = f'https://api-mainnet.magiceden.io/rpc/getListedNFTsByQueryLite?q={q}'
-        return self._request(url)['results']
+        url = self.endpoints.listed_nfts(collection_symbol, offset=offset, limit=limit)
+        listings = self._request(url)['results']
+        if typed:
+            return to_models(listings, Listing)
+        return listings
+
+    def iter_listed_nfts(self, collection_symbol, page_size=20, max_items=None, timeout=None, prefetch=True,
+                         typed=False):
+        """
+        Iterate over all collection listings, cheapest first. Pages are loaded on demand
+
+        :param collection_symbol: symbol name of collection
+        :param page_size: listings per request
+        :param max_items: stop after this count of listings
+        :param timeout: stop after this count of seconds
+        :param prefetch: load next page in background
+        :param typed: yield Listing models
+        :return: listings generator
+        """
+        listings = paginate(
+            lambda offset, limit: self.get_listed_nfts(collection_symbol, offset=offset, limit=limit),
+            page_size=page_size, max_items=max_items, timeout=timeout, prefetch=prefetch
+        )
+        if typed:
+            return iter_models(listings, Listing)
+        return listings
 
     def get_floor_price(self, collection_symbol) -> float:
         """
@@ -352,43 +690,57 @@ class MagicParser:
             return listings[0]['price']
 
     def get_collections_info(self, collection_symbols_list: list):
-        c = ','.join(collection_symbols_list)
-        url = 'https://api-mainnet.magiceden.io/rpc/getAggregatedCollectionMetricsBySymbol?' \
-              f'edge_cache=true&symbols={c}'
+        url = self.endpoints.collections_info(collection_symbols_list)
         return self._request(url)
 
-    def get_global_activities(self, collection_symbol: str) -> list[dict]:
+    def get_global_activities(self, collection_symbol: str, *, offset=0, limit=50, typed=False,
+                              tx_types=SALE_TX_TYPES) -> list[dict]:
         """
         Collections Activity tab data
         Get collection activity log. Exchange, acceptBid, auctionSettled etc.
 
         :param collection_symbol:
+        :param offset: activities offset
+        :param limit: activities limit
+        :param typed: return list of Activity models
+        :param tx_types: activity types, sales by default
         :return: list of activities
         """
 
-        q = {
-            "$match": {
-                "txType": {
-                    "$in": ["exchange", "acceptBid", "auctionSettled"]
-                },
-                "source": {
-                    "$nin": ["yawww"]
-                },
-                "collection_symbol": collection_symbol
-            },
-            "$sort": {
-                "blockTime": -1,
-                "createdAt": -1
-            },
-            "$skip": 0,
-            "$limit": 50
-        }
+        url = self.endpoints.global_activities(collection_symbol, offset=offset, limit=limit, tx_types=tx_types)
+        activities = self._request(url)['results']
+        if typed:
+            return to_models(activities, Activity)
+        return activities
 
-        q = json.dumps(q)
-        url = f'https://api-mainnet.magiceden.io/rpc/getGlobalActivitiesByQuery?q={q}'
-        return self._request(url)['results']
+    def iter_activities(self, collection_symbol: str, since=None, page_size=50, max_items=None, timeout=None,
+                        prefetch=True, typed=False):
+        """
+        Iterate over collection activity log, newest first. Pages are loaded on demand
 
-    def get_activities_lite(self, collection_symbol, limit=500, offset=0, _type='buy,buyNow') -> list[dict]:
+        :param collection_symbol:
+        :param since: stop on activities older than this blockTime (unix seconds)
+        :param page_size: activities per request
+        :param max_items: stop after this count of activities
+        :param timeout: stop after this count of seconds
+        :param prefetch: load next page in background
+        :param typed: yield Activity models
+        :return: activities generator
+        """
+        stop_when = None
+        if since is not None:
+            stop_when = lambda activity: activity.get('blockTime', 0) < since
+
+        activities = paginate(
+            lambda offset, limit: self.get_global_activities(collection_symbol, offset=offset, limit=limit),
+            page_size=page_size, max_items=max_items, timeout=timeout, stop_when=stop_when, prefetch=prefetch
+        )
+        if typed:
+            return iter_models(activities, Activity)
+        return activities
+
+    def get_activities_lite(self, collection_symbol, limit=500, offset=0, _type='buy,buyNow',
+                            columnar=False) -> list[dict]:
         """
         Collections Analytics tab data
 
@@ -396,16 +748,15 @@ class MagicParser:
         :param limit: 1-500
         :param offset:
         :param _type: buy,buyNow
+        :param columnar: return Columns with numpy arrays timestamp, price
         :return:
         """
-        params = {
-            'limit': limit,
-            'offset': offset,
-            'type': _type
-        }
-
-        url = f'https://api-mainnet.magiceden.io/v2/collections/{collection_symbol}/activitiesLite?{params}'
-        return self._request(url)
+        url = self.endpoints.activities_lite(collection_symbol, limit, offset, _type)
+        activities = self._request(url)
+        if columnar:
+            from magiceden_api.columnar import ACTIVITIES_COLUMNS, to_columns
+            return to_columns(activities, ACTIVITIES_COLUMNS)
+        return activities
 
     def get_approx_listings(self, collection_symbol: str, limit=500, offset=0) -> list[dict]:
         """
@@ -416,33 +767,38 @@ class MagicParser:
         :param offset:
         :return:
         """
-        params = {
-            'limit': limit,
-            'offset': offset,
-        }
-        url = f'https://api-mainnet.magiceden.io/v2/collections/{collection_symbol}/approx_listings?{params}'
+        url = self.endpoints.approx_listings(collection_symbol, limit, offset)
         return self._request(url)
 
-    def get_holders(self, collection_symbol) -> dict:
+    def get_holders(self, collection_symbol, typed=False) -> dict:
         """
         Collections holder's stats
 
         :param collection_symbol:
+        :param typed: return list of Holder models from 'topHolders'
         :return:
         """
-        url = f'https://api-mainnet.magiceden.io/v2/collections/{collection_symbol}/holder_stats'
-        return self._request(url)
+        url = self.endpoints.holders(collection_symbol)
+        holders = self._request(url)
+        if typed:
+            return to_models(holders['topHolders'], Holder)
+        return holders
 
-    def get_collection_time_series(self, collection_symbol: str, tdelta: str = '1h') -> list[dict]:
+    def get_collection_time_series(self, collection_symbol: str, tdelta: str = '1h', columnar=False) -> list[dict]:
         """
         Collection data per time delta
 
         :param collection_symbol:
         :param tdelta: 1h | 1d | 6h | 10m
+        :param columnar: return Columns with numpy arrays timestamp, floor_price, volume
         :return:
         """
-        url = f'https://api-mainnet.magiceden.io/rpc/getCollectionTimeSeries/{collection_symbol}?&resolution={tdelta}'
-        return self._request(url)
+        url = self.endpoints.collection_time_series(collection_symbol, tdelta)
+        series = self._request(url)
+        if columnar:
+            from magiceden_api.columnar import TIME_SERIES_COLUMNS, to_columns
+            return to_columns(series, TIME_SERIES_COLUMNS)
+        return series
 
     def get_nfts_by_escrow_owner(self, holder_wallet: str) -> list[dict]:
         """
@@ -451,7 +807,7 @@ class MagicParser:
         :param holder_wallet: holder wallet address
         :return:
         """
-        url = f'https://api-mainnet.magiceden.io/rpc/getNFTsByEscrowOwner/{holder_wallet}'
+        url = self.endpoints.nfts_by_escrow_owner(holder_wallet)
         return self._request(url)['results']
 
     def get_biddings_by_query(self, holder_wallet: str, _type='initializerKey') -> list[dict]:
@@ -462,21 +818,11 @@ class MagicParser:
         :param _type: initializerKey | bidderPubkey
         :return:
         """
-        q = {
-            "$match": {},
-            "$sort": {
-                "createdAt": -1
-            }
-        }
-
-        q['$match'][_type] = holder_wallet
-        q = json.dumps(q)
-
-        url = f'https://api-mainnet.magiceden.io/rpc/getBiddingsByQuery?q={q}'
+        url = self.endpoints.biddings_by_query(holder_wallet, _type)
         return self._request(url)['results']
 
     def get_user_auction_wallet(self, holder_wallet: str) -> dict:
-        url = f'https://api-mainnet.magiceden.io/auctions/wallets/{holder_wallet}'
+        url = self.endpoints.user_auction_wallet(holder_wallet)
         return self._request(url)
 
     def get_user_info(self, holder_wallet: str) -> dict:
@@ -486,7 +832,7 @@ class MagicParser:
         :return:
         """
 
-        url = f'https://api-mainnet.magiceden.io/auth/user/{holder_wallet}'
+        url = self.endpoints.user_info(holder_wallet)
         return self._request(url)
 
     def get_user_listings(self, holder_wallet: str) -> list[dict]:
@@ -496,31 +842,19 @@ class MagicParser:
         :param holder_wallet:
         :return:
         """
-        url = f'https://api-mainnet.magiceden.io/search_escrows?initializerKey={holder_wallet}'
+        url = self.endpoints.user_listings(holder_wallet)
         return self._request(url)['results']
 
-    def get_user_activity(self, holder_wallet: str) -> list[dict]:
-        q = {
-            "$match": {
-                "$or": [
-                    {
-                        "seller_address": holder_wallet
-                    },
-                    {
-                        "buyer_address": holder_wallet
-                    }
-                ],
-                "source": {
-                    "$nin": ["yawww"]}
-            },
-            "$sort": {
-                "blockTime": -1,
-                "createdAt": -1
-            },
-            "$skip": 0
-        }
-        q = json.dumps(q)
-        url = f'https://api-mainnet.magiceden.io/rpc/getGlobalActivitiesByQuery?q={q}'
+    def get_user_activity(self, holder_wallet: str, *, offset=0, limit=None) -> list[dict]:
+        """
+        User activity log, newest first
+
+        :param holder_wallet:
+        :param offset: activities offset
+        :param limit: activities limit. None - server default
+        :return: list of activities
+        """
+        url = self.endpoints.user_activity(holder_wallet, offset=offset, limit=limit)
         return self._request(url)['results']
 
     def get_nfts_by_owner(self, holder_wallet: str) -> list[dict]:
@@ -530,11 +864,46 @@ class MagicParser:
         :param holder_wallet:
         :return:
         """
-        url = f'https://api-mainnet.magiceden.io/rpc/getNFTsByOwner/{holder_wallet}'
+        url = self.endpoints.nfts_by_owner(holder_wallet)
         return self._request(url)['results']
 
     def get_offers_received(self, holder_wallet: str) -> list[dict]:
-        url = f'https://api-mainnet.magiceden.io/rpc/m2/getOffersReceived/{holder_wallet}'
+        url = self.endpoints.offers_received(holder_wallet)
         return self._request(url)['results']
 
+    def get_wallet_portfolio(self, holder_wallet: str, max_workers: int = 8) -> dict:
+        """
+        Wallet portfolio. Owned and escrow nfts, listings, bids, offers and user info are loaded concurrently
+        and joined by mint address, floor prices are added with bulk collection stats.
+        Failed calls leave their parts empty and are listed in errors
+
+        :param holder_wallet: wallet address
+        :param max_workers: max parallel requests
+        :return: {wallet, user, nfts: {mint: {...}}, collections, bids_placed, floor_value, errors: {part: exception}}
+        """
+        return get_wallet_portfolios(self, [holder_wallet], max_workers)[holder_wallet]
+
+    def get_wallet_portfolios(self, holder_wallets: list, max_workers: int = 16) -> dict:
+        """
+        Portfolios of many wallets. All calls of all wallets run concurrently
+
+        :param holder_wallets: wallet addresses
+        :param max_workers: max parallel requests
+        :return: {wallet: portfolio}
+        """
+        return get_wallet_portfolios(self, holder_wallets, max_workers)
+
 
+def __getattr__(name):
+    # AsyncMagicParser is imported on first access, so aiohttp is not loaded by sync users
+    if name == 'AsyncMagicParser':
+        try:
+            from magiceden_api.aio import AsyncMagicParser
+        except ModuleNotFoundError as e:
+            if e.name != 'aiohttp':
+                raise
+            raise ImportError(
+                "aiohttp is required for AsyncMagicParser. pip install magiceden_api_parser[async]"
+            ) from e
+        return AsyncMagicParser
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+
+import aiohttp
+
+from magiceden_api.decoding import Decoder
+from magiceden_api.driver import is_challenge
+from magiceden_api.endpoints import Endpoints, PERIODS, SALE_TX_TYPES
+from magiceden_api.ratelimit import RetryError, RetryPolicy, parse_retry_after
+from magiceden_api.singleflight import AsyncSingleFlight, normalize_url
+
+logger = logging.getLogger('MagicParser')
+
+
+class AsyncMagicParser:
+    def __init__(self, concurrency: int = 20, timeout: float = 30, retries: int = 3, retry_timeout: float = 5,
+                 fallback=None, endpoints: Endpoints = None, json_backend: str = None,
+                 single_flight: bool = True, retry_policy: RetryPolicy = None):
+        """
+        Asyncio MagicEden api parser
+
+
+        concurrency: max requests in flight
+
+        timeout: request timeout
+
+        retries: retries count on network errors, 429 and 5xx
+
+        retry_timeout: first retry delay, doubled every retry. 429 waits at least Retry-After
+
+        fallback: MagicParser used for Cloudflare fallback through Chrome, its fetch() is called
+        in thread pool. None - raise on non-200
+
+        endpoints: api urls builder. Default - MagicEden mainnet
+
+        json_backend: orjson | msgspec | json. None - fastest installed
+
+        single_flight: concurrent calls of the same url share one request
+
+        retry_policy: backoff settings, overrides retries and retry_timeout
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_timeout = retry_timeout
+        self.retry_policy = retry_policy or RetryPolicy(max_attempts=retries + 1, backoff_base=retry_timeout)
+        self.fallback = fallback
+        self.endpoints = endpoints or Endpoints()
+        self.decoder = Decoder(json_backend)
+        self.flights = AsyncSingleFlight() if single_flight else None
+
+        self.session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency)
+            self.session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self.session
+
+    async def close(self):
+        """
+        Close http session
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, url):
+        if self.flights is not None:
+            content = await self.flights.do(normalize_url(url), self._fetch, url)
+        else:
+            content = await self._fetch(url)
+        return self.decoder.loads(content)
+
+    async def _fetch(self, url) -> bytes:
+        session = self._get_session()
+        attempts = self.retry_policy.max_attempts
+        last_error = None
+        for attempt in range(attempts):
+            retry_after = None
+            try:
+                # concurrency slot is held only while request runs, not while waiting for retry
+                async with self._semaphore, session.get(url) as r:
+                    if r.status == 200:
+                        return await r.read()
+                    if r.status != 429 and (r.status < 500 or is_challenge(r)):
+                        if self.fallback is None:
+                            r.raise_for_status()
+                            return await r.read()
+                        break
+                    last_error = f'HTTP {r.status}'
+                    retry_after = parse_retry_after(r.headers.get('Retry-After'))
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                logger.debug(e)
+                last_error = e
+
+            if attempt < attempts - 1:
+                await asyncio.sleep(self.retry_policy.delay(attempt, retry_after))
+        else:
+            raise RetryError(url, attempts, last_error)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.fallback.fetch, url)
+
+    async def gather(self, *aws, return_exceptions: bool = False) -> list:
+        """
+        Run coroutines concurrently. Concurrency is limited by parser settings
+
+        :param aws: coroutines, for example parser.get_user_info(wallet)
+        :param return_exceptions: return exceptions instead of raising first one
+        :return: list of results in same order
+        """
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    async def map(self, method, args, return_exceptions: bool = False) -> list:
+        """
+        Call endpoint method for each argument concurrently
+
+        results = await ap.map(ap.get_user_info, wallets)
+
+        :param method: parser coroutine method
+        :param args: iterable of arguments. Tuples are unpacked
+        :param return_exceptions: return exceptions instead of raising first one
+        :return: list of results in same order
+        """
+        aws = [method(*a) if isinstance(a, tuple) else method(a) for a in args]
+        return await self.gather(*aws, return_exceptions=return_exceptions)
+
+    async def get_featured_carousels(self) -> list[dict]:
+        return await self._request(self.endpoints.featured_carousels())
+
+    async def get_featured_collections_carousels(self) -> list[dict]:
+        return await self._request(self.endpoints.featured_collections_carousels())
+
+    async def get_magiceden_volumes(self) -> dict:
+        return await self._request(self.endpoints.magiceden_volumes())
+
+    async def get_all_collections(self) -> list[dict]:
+        return (await self._request(self.endpoints.all_collections()))['collections']
+
+    async def get_all_organizations(self) -> list[dict]:
+        return await self._request(self.endpoints.all_organizations())
+
+    async def get_popular_collections(self, limit=1000, period='1d') -> list[dict]:
+        if period not in PERIODS:
+            raise ValueError(f"period available states {', '.join(PERIODS)}")
+        return await self._request(self.endpoints.popular_collections(limit, period))
+
+    async def get_price(self, currency='SOL') -> dict:
+        return await self._request(self.endpoints.price(currency))
+
+    async def get_launchpad_collections(self) -> list[dict]:
+        return await self._request(self.endpoints.launchpad_collections())
+
+    async def get_auctions(self, status='live', timeout=30000) -> list[dict]:
+        return await self._request(self.endpoints.auctions(status, timeout))
+
+    async def get_auction_by_symbol(self, collection_symbol):
+        return await self._request(self.endpoints.auction_by_symbol(collection_symbol))
+
+    async def get_drops(self, limit=500, offset=0, top=None) -> list[dict]:
+        return await self._request(self.endpoints.drops(limit, offset, top))
+
+    async def get_most_watched_collections(self) -> list[dict]:
+        return await self._request(self.endpoints.most_watched_collections())
+
+    async def get_multi_collection_stats(self, collections_symbols: list) -> list[dict]:
+        return await self._request(self.endpoints.multi_collection_stats(collections_symbols))
+
+    async def get_collections_witch_symbols(self, collection_symbols: list) -> list[dict]:
+        return await self._request(self.endpoints.collections_witch_symbols(collection_symbols))
+
+    async def get_collection_escrow_stats(self, collection_symbol: str) -> dict:
+        return await self._request(self.endpoints.collection_escrow_stats(collection_symbol))
+
+    async def get_collection(self, symbol: str) -> dict:
+        return await self._request(self.endpoints.collection(symbol))
+
+    async def check_collection_scam_flag(self, collection_symbol: str) -> bool:
+        return (await self._request(self.endpoints.collection_scam_flag(collection_symbol)))['hasFlag']
+
+    async def get_twitter_followers(self, collection_symbol: str) -> int:
+        return (await self._request(self.endpoints.twitter_followers(collection_symbol)))['twitterFollowerCount']
+
+    async def get_nft_by_mint_address(self, mint_address: str, use_rarity=False) -> dict:
+        return await self._request(self.endpoints.nft_by_mint_address(mint_address, use_rarity))
+
+    async def get_whitelists(self) -> list[dict]:
+        return await self._request(self.endpoints.whitelists())
+
+    async def get_listed_nfts(self, collection_symbol, *, offset=0, limit=20) -> list[dict]:
+        url = self.endpoints.listed_nfts(collection_symbol, offset=offset, limit=limit)
+        return (await self._request(url))['results']
+
+    async def get_floor_price(self, collection_symbol) -> float:
+        listings = await self.get_listed_nfts(collection_symbol)
+        if len(listings) == 0:
+            return 0
+        else:
+            return listings[0]['price']
+
+    async def get_collections_info(self, collection_symbols_list: list):
+        return await self._request(self.endpoints.collections_info(collection_symbols_list))
+
+    async def get_global_activities(self, collection_symbol: str, *, offset=0, limit=50,
+                                    tx_types=SALE_TX_TYPES) -> list[dict]:
+        url = self.endpoints.global_activities(collection_symbol, offset=offset, limit=limit, tx_types=tx_types)
+        return (await self._request(url))['results']
+
+    async def get_activities_lite(self, collection_symbol, limit=500, offset=0, _type='buy,buyNow') -> list[dict]:
+        return await self._request(self.endpoints.activities_lite(collection_symbol, limit, offset, _type))
+
+    async def get_approx_listings(self, collection_symbol: str, limit=500, offset=0) -> list[dict]:
+        return await self._request(self.endpoints.approx_listings(collection_symbol, limit, offset))
+
+    async def get_holders(self, collection_symbol) -> dict:
+        return await self._request(self.endpoints.holders(collection_symbol))
+
+    async def get_collection_time_series(self, collection_symbol: str, tdelta: str = '1h') -> list[dict]:
+        return await self._request(self.endpoints.collection_time_series(collection_symbol, tdelta))
+
+    async def get_nfts_by_escrow_owner(self, holder_wallet: str) -> list[dict]:
+        return (await self._request(self.endpoints.nfts_by_escrow_owner(holder_wallet)))['results']
+
+    async def get_biddings_by_query(self, holder_wallet: str, _type='initializerKey') -> list[dict]:
+        return (await self._request(self.endpoints.biddings_by_query(holder_wallet, _type)))['results']
+
+    async def get_user_auction_wallet(self, holder_wallet: str) -> dict:
+        return await self._request(self.endpoints.user_auction_wallet(holder_wallet))
+
+    async def get_user_info(self, holder_wallet: str) -> dict:
+        return await self._request(self.endpoints.user_info(holder_wallet))
+
+    async def get_user_listings(self, holder_wallet: str) -> list[dict]:
+        return (await self._request(self.endpoints.user_listings(holder_wallet)))['results']
+
+    async def get_user_activity(self, holder_wallet: str, *, offset=0, limit=None) -> list[dict]:
+        return (await self._request(self.endpoints.user_activity(holder_wallet, offset=offset, limit=limit)))['results']
+
+    async def get_nfts_by_owner(self, holder_wallet: str) -> list[dict]:
+        return (await self._request(self.endpoints.nfts_by_owner(holder_wallet)))['results']
+
+    async def get_offers_received(self, holder_wallet: str) -> list[dict]:
+        return (await self._request(self.endpoints.offers_received(holder_wallet)))['results']
@@ -0,0 +1,210 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger('MagicParser')
+
+
+def index_by_symbol(payload) -> dict:
+    """
+    Convert multi symbol response to {symbol: item}
+
+    :param payload: list of items, {'results': [...]} or dict already keyed by symbol
+    :return: dict
+    """
+    if isinstance(payload, dict):
+        for key in ('results', 'collections'):
+            if isinstance(payload.get(key), list):
+                payload = payload[key]
+                break
+        else:
+            return payload
+
+    result = {}
+    for item in payload:
+        symbol = item.get('symbol') or item.get('collectionSymbol')
+        if symbol is not None:
+            result[symbol] = item
+    return result
+
+
+def chunk_symbols(symbols: list, url_for, max_batch: int = 50, max_url_length: int = 2000) -> list[list]:
+    """
+    Split symbols to chunks, so every chunk url is shorter than max_url_length
+
+    :param symbols: list of symbols
+    :param url_for: function(symbols) -> url
+    :param max_batch: max symbols per chunk
+    :param max_url_length: max url length
+    :return: list of chunks
+    """
+    chunks = []
+    chunk = []
+    for symbol in symbols:
+        if chunk and (len(chunk) >= max_batch or len(url_for(chunk + [symbol])) > max_url_length):
+            chunks.append(chunk)
+            chunk = []
+        chunk.append(symbol)
+
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class SymbolBatcher:
+    def __init__(self, fetch_many, url_for, window: float = 0.05, max_batch: int = 50, max_url_length: int = 2000):
+        """
+        Collect single symbol requests made within window and send them as one multi symbol request.
+        Error of request is set to futures of all its symbols
+
+        batcher = SymbolBatcher(lambda symbols: index_by_symbol(mp.get_multi_collection_stats(symbols)),
+                                mp.endpoints.multi_collection_stats)
+        stats = batcher.get('degods')  # waits up to window for other symbols
+
+
+        fetch_many: function(symbols) -> {symbol: result}
+
+        url_for: function(symbols) -> url, used to keep urls shorter than max_url_length
+
+        window: seconds to wait for other requests before sending
+
+        max_batch: max symbols per request
+
+        max_url_length: max request url length
+        """
+        self.fetch_many = fetch_many
+        self.url_for = url_for
+        self.window = window
+        self.max_batch = max_batch
+        self.max_url_length = max_url_length
+
+        self.requests_sent = 0
+
+        self._pending = {}  # symbol: [futures]
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def submit(self, symbol: str) -> Future:
+        """
+        Add symbol to next batch
+
+        :param symbol: collection symbol
+        :return: Future with result. Result is None if server don't know symbol
+        """
+        future = Future()
+        with self._lock:
+            self._pending.setdefault(symbol, []).append(future)
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def get(self, symbol: str, timeout: float = None):
+        """
+        Get result for symbol, blocks until batch is sent
+
+        :param symbol: collection symbol
+        :param timeout: max seconds to wait
+        :return: result
+        """
+        return self.submit(symbol).result(timeout)
+
+    def map(self, symbols: list) -> list:
+        """
+        Get results for many symbols with minimal requests count
+
+        :param symbols: list of symbols
+        :return: list of results in same order
+        """
+        futures = [self.submit(symbol) for symbol in symbols]
+        self.flush()
+        return [future.result() for future in futures]
+
+    def flush(self):
+        """
+        Send pending symbols now
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, {}
+
+        for chunk in chunk_symbols(list(pending), self.url_for, self.max_batch, self.max_url_length):
+            # flush runs in timer thread and in callers of map() at the same time
+            with self._lock:
+                self.requests_sent += 1
+            try:
+                results = self.fetch_many(chunk)
+            except Exception as e:
+                logger.debug(e)
+                for symbol in chunk:
+                    for future in pending[symbol]:
+                        future.set_exception(e)
+                continue
+
+            for symbol in chunk:
+                for future in pending[symbol]:
+                    future.set_result(results.get(symbol))
+
+
+class CollectionBatcher:
+    def __init__(self, parser, window: float = 0.05, max_batch: int = 50, max_url_length: int = 2000):
+        """
+        Batched per symbol collection lookups. Thread safe, calls from many threads are merged
+
+        batcher = CollectionBatcher(mp)
+        stats = batcher.map_collection_escrow_stats(symbols)
+
+        check_collection_scam_flag and get_twitter_followers have no multi symbol endpoint and are not batched.
+
+
+        parser: MagicParser
+
+        window: seconds to wait for other requests before sending
+
+        max_batch: max symbols per request
+
+        max_url_length: max request url length
+        """
+        endpoints = parser.endpoints
+        options = {'window': window, 'max_batch': max_batch, 'max_url_length': max_url_length}
+
+        self.collections = SymbolBatcher(
+            lambda symbols: index_by_symbol(parser.get_collections_witch_symbols(symbols)),
+            endpoints.collections_witch_symbols, **options
+        )
+        self.escrow_stats = SymbolBatcher(
+            lambda symbols: index_by_symbol(parser.get_multi_collection_stats(symbols)),
+            endpoints.multi_collection_stats, **options
+        )
+        self.collections_info = SymbolBatcher(
+            lambda symbols: index_by_symbol(parser.get_collections_info(symbols)),
+            endpoints.collections_info, **options
+        )
+
+    def get_collection_record(self, symbol: str) -> dict:
+        """
+        Collection record of getCollectionsWithSymbols, not the /collections/{symbol} payload of
+        MagicParser.get_collection
+
+        :param symbol: collection symbol
+        :return: collection record or None
+        """
+        return self.collections.get(symbol)
+
+    def get_collection_escrow_stats(self, collection_symbol: str) -> dict:
+        return self.escrow_stats.get(collection_symbol)
+
+    def get_collection_info(self, collection_symbol: str) -> dict:
+        return self.collections_info.get(collection_symbol)
+
+    def map_collection_records(self, symbols: list) -> list[dict]:
+        return self.collections.map(symbols)
+
+    def map_collection_escrow_stats(self, symbols: list) -> list[dict]:
+        return self.escrow_stats.map(symbols)
+
+    def map_collections_info(self, symbols: list) -> list[dict]:
+        return self.collections_info.map(symbols)
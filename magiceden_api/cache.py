@@ -0,0 +1,246 @@
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from magiceden_api.metrics import endpoint_name
+
+_MISSING = object()
+
+
+def _size(value) -> int:
+    return len(value) if isinstance(value, (bytes, bytearray, str)) else 0
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 256, ttl: float = 60, ttls: dict = None, max_bytes: int = None):
+        """
+        Thread safe responses cache. Items expire after ttl, least recently used items are evicted
+        after maxsize items or max_bytes of values
+
+        mp = MagicParser(cache=TTLCache(ttl=60, ttls={'all_collections': 600}, max_bytes=200 * 2 ** 20))
+
+
+        maxsize: max items count
+
+        ttl: item lifetime in seconds
+
+        ttls: {endpoint name: ttl} for endpoints with other lifetime. Endpoints with ttl are cached
+        even without edge_cache=true, 0 - never cache endpoint
+
+        max_bytes: max size of bytes values. None - no limit
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+        self._data = OrderedDict()  # key: (expires, value, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def ttl_for(self, url) -> float:
+        """
+        :param url: request url
+        :return: url items lifetime. None - url is not cached
+        """
+        ttl = self.ttls.get(endpoint_name(url))
+        if ttl is not None:
+            return ttl or None
+        return self.ttl if is_edge_cached(url) else None
+
+    def get(self, key, default=None):
+        """
+        Get not expired value
+
+        :param key: cache key
+        :param default: value if key not found or expired
+        :return: cached value
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires, value, size = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                self.bytes -= size
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Save value
+
+        :param key: cache key
+        :param value: value
+        :param ttl: item lifetime. Default - cache ttl
+        """
+        if ttl is None:
+            ttl = self.ttl
+        size = _size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._data[key] = (time.monotonic() + ttl, value, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self.bytes -= item[2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        """
+        :return: {hits, misses, evictions, items, bytes}
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'items': len(self._data),
+                'bytes': self.bytes,
+            }
+
+
+class SqliteCache(TTLCache):
+    def __init__(self, path: str = 'cache.db', maxsize: int = 10000, ttl: float = 60, ttls: dict = None,
+                 max_bytes: int = None):
+        """
+        TTLCache in sqlite file, survives restarts and can be shared by processes. Values must be bytes
+
+        mp = MagicParser(cache=SqliteCache('cache.db', ttl=600, max_bytes=2 ** 30))
+
+
+        path: database file
+        """
+        super().__init__(maxsize, ttl, ttls, max_bytes)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL NOT NULL,
+                used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_cache_used ON cache (used);
+        """)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires FROM cache WHERE key = ?', (str(key),)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute('DELETE FROM cache WHERE key = ?', (str(key),))
+                self.misses += 1
+                return default
+
+            self._conn.execute('UPDATE cache SET used = ? WHERE key = ?', (now, str(key)))
+            self.hits += 1
+            return bytes(row[0])
+
+    def set(self, key, value, ttl: float = None):
+        if ttl is None:
+            ttl = self.ttl
+        size = _size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO cache (key, value, size, expires, used) VALUES (?, ?, ?, ?, ?)',
+                    (str(key), value, size, now + ttl, now)
+                )
+                self._evict(now)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def _evict(self, now: float):
+        self._conn.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache').fetchone()
+        if count <= self.maxsize and (self.max_bytes is None or size <= self.max_bytes):
+            return
+
+        # least recently used first
+        evicted = []
+        for key, item_size in self._conn.execute('SELECT key, size FROM cache ORDER BY used'):
+            if count <= self.maxsize and (self.max_bytes is None or size <= self.max_bytes):
+                break
+            evicted.append((key,))
+            count -= 1
+            size -= item_size
+        self._conn.executemany('DELETE FROM cache WHERE key = ?', evicted)
+        self.evictions += len(evicted)
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache WHERE key = ?', (str(key),))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache')
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache').fetchone()
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'items': count,
+                    'bytes': size}
+
+
+def is_edge_cached(url: str) -> bool:
+    """
+    Check url is cached on MagicEden edge, so short local caching don't return stale data
+
+    :param url: request url
+    :return: False | True
+    """
+    return 'edge_cache=true' in url
@@ -0,0 +1,183 @@
+try:
+    import numpy as np
+except ImportError:  # pip install magiceden_api_parser[numpy]
+    np = None
+
+# column: (payload key, dtype, scale)
+TIME_SERIES_COLUMNS = {
+    'timestamp': ('ts', 'float64', 1e-3),  # ms -> unix seconds
+    'floor_price': ('fp', 'float64', 1e-9),  # lamports -> SOL
+    'volume': ('vol', 'float64', 1e-9),  # lamports -> SOL
+}
+
+RESAMPLE_HOW = ('last', 'first', 'sum', 'mean', 'min', 'max')
+
+ACTIVITIES_COLUMNS = {
+    'timestamp': ('blockTime', 'float64', 1),
+    'price': ('price', 'float64', 1),  # SOL
+}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for columnar results. pip install magiceden_api_parser[numpy]")
+
+
+class Columns:
+    __slots__ = ('_data',)
+
+    def __init__(self, **arrays):
+        """
+        Struct of arrays. Every column is contiguous numpy array of same length
+
+        series.timestamp, series['floor_price']
+        """
+        object.__setattr__(self, '_data', arrays)
+
+    def __getattr__(self, name):
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, name):
+        return self._data[name]
+
+    def __len__(self):
+        for array in self._data.values():
+            return len(array)
+        return 0
+
+    def __repr__(self):
+        return f"Columns({', '.join(self._data)}, rows={len(self)})"
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._data)
+
+    def sort(self, by: str = 'timestamp') -> 'Columns':
+        """
+        Sorted copy
+
+        :param by: column name
+        :return: Columns
+        """
+        order = np.argsort(self._data[by], kind='stable')
+        return Columns(**{name: array[order] for name, array in self._data.items()})
+
+    def to_records(self) -> list[dict]:
+        names = self.names
+        return [dict(zip(names, row)) for row in zip(*(self._data[name].tolist() for name in names))]
+
+
+def to_columns(records: list[dict], columns: dict) -> Columns:
+    """
+    Parse list of dicts to Columns. Missing values are NaN
+
+    :param records: list of dicts
+    :param columns: {column: (payload key, dtype, scale)}
+    :return: Columns
+    """
+    _require_numpy()
+    count = len(records)
+    arrays = {}
+    for name, (key, dtype, scale) in columns.items():
+        array = np.fromiter(
+            (np.nan if (v := r.get(key)) is None else v for r in records), dtype=dtype, count=count
+        )
+        if scale != 1:
+            array *= scale
+        arrays[name] = array
+    return Columns(**arrays)
+
+
+def resample(timestamp, values, interval: float, how: str = 'last'):
+    """
+    Resample series to fixed interval buckets. Timestamps must be sorted
+
+    :param timestamp: unix seconds array
+    :param values: values array
+    :param interval: bucket size in seconds
+    :param how: last | first | sum | mean | min | max
+    :return: (bucket start timestamps, values). Empty series - empty arrays
+    """
+    _require_numpy()
+    if how not in RESAMPLE_HOW:
+        raise ValueError("how available states last, first, sum, mean, min, max")
+    timestamp = np.asarray(timestamp)
+    values = np.asarray(values)
+    if not len(timestamp):
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=values.dtype)
+
+    buckets = np.floor_divide(timestamp, interval)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    bucket_ts = buckets[starts] * interval
+
+    if how == 'first':
+        return bucket_ts, values[starts]
+    if how == 'last':
+        return bucket_ts, values[np.r_[starts[1:] - 1, len(values) - 1]]
+    if how == 'sum':
+        return bucket_ts, np.add.reduceat(values, starts)
+    if how == 'mean':
+        return bucket_ts, np.add.reduceat(values, starts) / np.diff(np.r_[starts, len(values)])
+    if how == 'min':
+        return bucket_ts, np.minimum.reduceat(values, starts)
+    return bucket_ts, np.maximum.reduceat(values, starts)
+
+
+def rolling_mean(values, window: int):
+    """
+    Rolling mean. First window - 1 values are NaN
+
+    :param values: array
+    :param window: items count
+    :return: array of same length
+    """
+    _require_numpy()
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        cumsum = np.cumsum(np.r_[0.0, values])
+        result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+
+def rolling_min(values, window: int):
+    """
+    Rolling min, for example rolling floor price. First window - 1 values are NaN
+
+    :param values: array
+    :param window: items count
+    :return: array of same length
+    """
+    _require_numpy()
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).min(axis=1)
+    return result
+
+
+def rolling_sum(values, window: int):
+    """
+    Rolling sum, for example rolling volume. First window - 1 values are NaN
+
+    :param values: array
+    :param window: items count
+    :return: array of same length
+    """
+    return rolling_mean(values, window) * window
+
+
+def vwap(price, volume, window: int = None):
+    """
+    Volume weighted average price
+
+    :param price: price array
+    :param volume: volume array. For sales - ones
+    :param window: rolling window in items. None - single value for all items
+    :return: float or array of same length
+    """
+    _require_numpy()
+    if window is None:
+        return float(np.sum(price * volume) / np.sum(volume))
+    return rolling_sum(price * volume, window) / rolling_sum(volume, window)
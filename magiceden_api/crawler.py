@@ -0,0 +1,221 @@
+import os
+import json
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from magiceden_api.portfolio import collection_of
+
+logger = logging.getLogger('MagicParser')
+
+COLLECTION = 'collection'
+WALLET = 'wallet'
+
+
+class HolderCrawler:
+    def __init__(self, parser, state_path: str = None, edges_path: str = None, max_depth: int = 2,
+                 max_requests: int = 1000, max_workers: int = 8, max_holders: int = None, max_attempts: int = 3,
+                 save_every: int = 50):
+        """
+        Breadth-first crawler of collection <-> holder wallet graph.
+        Collection expands to its top holders, wallet expands to collections of its nfts
+
+        crawler = HolderCrawler(mp, state_path='crawl.json', edges_path='edges.jsonl', max_depth=2)
+        for edge in crawler.crawl(collections=['degods']):
+            ...
+
+        Crawl can be stopped any time and continued from state_path. State keeps edges file size,
+        edges of nodes expanded after last save are cut on resume and these nodes are expanded again.
+
+
+        parser: MagicParser
+
+        state_path: json file for frontier and visited nodes. None - keep state in memory only
+
+        edges_path: jsonl file, edges are appended to it. None - don't save edges
+
+        max_depth: max distance from start nodes
+
+        max_requests: requests budget for crawl including previous runs
+
+        max_workers: max parallel requests
+
+        max_holders: max holders per collection. None - all top holders
+
+        max_attempts: requests per node, node is moved to failed after max_attempts errors
+
+        save_every: save state after every save_every expanded nodes and at crawl end
+        """
+        self.parser = parser
+        self.state_path = state_path
+        self.edges_path = edges_path
+        self.max_depth = max_depth
+        self.max_requests = max_requests
+        self.max_workers = max_workers
+        self.max_holders = max_holders
+        self.max_attempts = max_attempts
+        self.save_every = save_every
+
+        self.frontier = deque()  # (kind, id, depth)
+        self.visited = set()  # (kind, id)
+        self.attempts = {}  # (kind, id): errors count
+        self.failed = []  # (kind, id, depth) nodes failed max_attempts times
+        self.requests = 0
+        self.edges_size = None  # edges file size at last save
+
+        if state_path is not None and os.path.exists(state_path):
+            self.load()
+
+    def add(self, kind: str, node_id: str, depth: int = 0):
+        """
+        Add start node
+
+        :param kind: 'collection' | 'wallet'
+        :param node_id: collection symbol or wallet address
+        :param depth: node depth
+        """
+        if (kind, node_id) not in self.visited:
+            self.visited.add((kind, node_id))
+            self.frontier.append((kind, node_id, depth))
+
+    def crawl(self, collections: list = (), wallets: list = ()):
+        """
+        Crawl graph
+
+        :param collections: start collections symbols
+        :param wallets: start wallets addresses
+        :return: generator of edges {'wallet', 'collection', 'tokens', 'depth'}
+        """
+        for symbol in collections:
+            self.add(COLLECTION, symbol)
+        for wallet in wallets:
+            self.add(WALLET, wallet)
+
+        edges_file = self._open_edges()
+        running = {}
+        expanded = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while self.frontier or running:
+                    while self.frontier and len(running) < self.max_workers and self.requests < self.max_requests:
+                        node = self.frontier.popleft()
+                        self.requests += 1
+                        running[executor.submit(self._expand, node)] = node
+
+                    if not running:
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        node = running.pop(future)
+                        try:
+                            edges = future.result()
+                        except Exception as e:
+                            self._failed(node, e)
+                            continue
+
+                        for edge in edges:
+                            if edges_file is not None:
+                                edges_file.write(json.dumps(edge) + '\n')
+                            self._discover(node, edge)
+                        self.attempts.pop(node[:2], None)
+
+                        expanded += 1
+                        if expanded % self.save_every == 0:
+                            self._checkpoint(edges_file, running.values())
+
+                        yield from edges
+        finally:
+            # generator closed or crawl failed: running nodes are saved to frontier
+            self._checkpoint(edges_file, running.values())
+            if edges_file is not None:
+                edges_file.close()
+
+    def _failed(self, node, error: Exception):
+        key = node[:2]
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        logger.error(f'{node[0]} {node[1]} attempt {self.attempts[key]}: {error}')
+        if self.attempts[key] < self.max_attempts:
+            self.frontier.append(node)
+        else:
+            self.failed.append(node)
+
+    def _open_edges(self):
+        if self.edges_path is None:
+            return None
+        # edges written after last saved state belong to nodes that are still in frontier
+        if self.edges_size is not None and os.path.exists(self.edges_path) \
+                and os.path.getsize(self.edges_path) > self.edges_size:
+            with open(self.edges_path, 'r+b') as f:
+                f.truncate(self.edges_size)
+        return open(self.edges_path, 'a', encoding='utf-8')
+
+    def _checkpoint(self, edges_file, running=()):
+        # edges are on disk before state that refers to them
+        if edges_file is not None:
+            edges_file.flush()
+            os.fsync(edges_file.fileno())
+            self.edges_size = os.path.getsize(self.edges_path)
+        self.save(running)
+
+    def _expand(self, node) -> list[dict]:
+        kind, node_id, depth = node
+        edges = []
+        if kind == COLLECTION:
+            holders = self.parser.get_holders(node_id).get('topHolders') or []
+            for holder in holders[:self.max_holders]:
+                edges.append({'wallet': holder['owner'], 'collection': node_id, 'tokens': holder.get('tokens'),
+                              'depth': depth})
+        else:
+            counts = {}
+            for nft in self.parser.get_nfts_by_owner(node_id):
+                symbol = collection_of(nft)
+                if symbol:
+                    counts[symbol] = counts.get(symbol, 0) + 1
+            for symbol, tokens in counts.items():
+                edges.append({'wallet': node_id, 'collection': symbol, 'tokens': tokens, 'depth': depth})
+        return edges
+
+    def _discover(self, node, edge):
+        kind, _, depth = node
+        if depth + 1 > self.max_depth:
+            return
+        if kind == COLLECTION:
+            self.add(WALLET, edge['wallet'], depth + 1)
+        else:
+            self.add(COLLECTION, edge['collection'], depth + 1)
+
+    def load(self):
+        """
+        Load frontier, visited and failed nodes from state_path
+        """
+        with open(self.state_path, 'r') as f:
+            state = json.load(f)
+        self.frontier = deque(tuple(node) for node in state['frontier'])
+        self.visited = set(tuple(node) for node in state['visited'])
+        self.requests = state['requests']
+        self.attempts = {(kind, node_id): count for kind, node_id, count in state.get('attempts', ())}
+        self.failed = [tuple(node) for node in state.get('failed', ())]
+        self.edges_size = state.get('edges_size')
+
+    def save(self, running=()):
+        """
+        Save frontier, visited and failed nodes to state_path
+
+        :param running: nodes in progress, they are saved to frontier
+        """
+        if self.state_path is None:
+            return
+
+        state = {
+            'frontier': list(running) + list(self.frontier),
+            'visited': list(self.visited),
+            'requests': self.requests - len(running),
+            'attempts': [[kind, node_id, count] for (kind, node_id), count in self.attempts.items()],
+            'failed': list(self.failed),
+            'edges_size': self.edges_size,
+        }
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
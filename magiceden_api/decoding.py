@@ -0,0 +1,92 @@
+import json
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BACKENDS = ('orjson', 'msgspec', 'json')
+
+
+def available_backends() -> list[str]:
+    """
+    :return: installed json backends, fastest first
+    """
+    backends = []
+    if orjson is not None:
+        backends.append('orjson')
+    if msgspec is not None:
+        backends.append('msgspec')
+    backends.append('json')
+    return backends
+
+
+@lru_cache(maxsize=64)
+def _partial_type(fields: tuple, path: str):
+    # msgspec skips not listed fields without building python objects for them.
+    # Missing fields stay UNSET and are omitted by to_builtins, explicit nulls are kept like in json
+    record = msgspec.defstruct('Record', [(field, object, msgspec.UNSET) for field in fields])
+    if path is None:
+        return list[record]
+    return msgspec.defstruct('Payload', [(path, list[record])])
+
+
+class Decoder:
+    def __init__(self, backend: str = None):
+        """
+        Json decoder. Use orjson or msgspec when installed
+
+
+        backend: orjson | msgspec | json. None - fastest installed
+        """
+        if backend is None:
+            backend = available_backends()[0]
+        if backend not in available_backends():
+            raise ValueError(f"json backend {backend} is not installed. Available: {', '.join(available_backends())}")
+
+        self.backend = backend
+        if backend == 'orjson':
+            self._loads = orjson.loads
+        elif backend == 'msgspec':
+            self._loads = msgspec.json.Decoder().decode
+        else:
+            self._loads = json.loads
+
+    def loads(self, content):
+        """
+        Decode json
+
+        :param content: bytes or str
+        :return: data
+        """
+        return self._loads(content)
+
+    def extract(self, content, fields: list, path: str = None) -> list[dict]:
+        """
+        Decode only listed fields of records list. Every backend returns the same result,
+        msgspec backend doesn't build python objects for other fields
+
+        decoder.extract(content, ['symbol', 'name'], path='collections')
+
+        :param content: bytes or str
+        :param fields: record fields to keep
+        :param path: key of records list in payload. None - payload is records list
+        :return: list of dicts with listed fields that are present in record
+        """
+        fields = tuple(fields)
+        if self.backend == 'msgspec':
+            decoded = msgspec.json.decode(content, type=_partial_type(fields, path))
+            if path is not None:
+                decoded = getattr(decoded, path)
+            return msgspec.to_builtins(decoded)
+
+        data = self.loads(content)
+        if path is not None:
+            data = data[path]
+        return [{field: record[field] for field in fields if field in record} for record in data]
@@ -0,0 +1,300 @@
+import os
+import queue
+import logging
+import threading
+from typing import NamedTuple
+from contextlib import contextmanager
+
+logger = logging.getLogger('MagicParser')
+
+DRIVER_MODES = ('eager', 'lazy', 'http')
+
+
+class Page(NamedTuple):
+    text: str
+    cookies: list[dict]
+    user_agent: str
+
+
+def start_chrome(profile: str = 'main', driver_headless: bool = True, temp_dir_path: str = None):
+    """
+    Start new undetected Chrome instance
+
+    undetected_chromedriver and selenium are imported here, so HTTP-only parsers never load them.
+
+    :param profile: Chrome profile name
+    :param driver_headless: Chrome Headless mode
+    :param temp_dir_path: Chrome profile dir
+    :return: uc.Chrome driver
+    """
+    import undetected_chromedriver as uc
+
+    if temp_dir_path is None:
+        temp_dir_path = f"{os.getcwd()}\\_temp\\profile_{profile}".replace('\\', '\\\\')
+
+    os.makedirs(temp_dir_path, exist_ok=True)
+    options = uc.ChromeOptions()
+    options.add_argument("--disable-gpu")
+    options.page_load_strategy = 'eager'
+    options.headless = driver_headless
+    return uc.Chrome(options=options, user_data_dir=temp_dir_path, use_subprocess=True)
+
+
+def page_text(driver) -> str:
+    """
+    Get textContent of current page body
+
+    :param driver: Chrome driver
+    :return: page text
+    """
+    from selenium.webdriver.common.by import By
+    return driver.find_element(By.TAG_NAME, 'body').get_attribute("textContent")
+
+
+def is_challenge(response) -> bool:
+    """
+    Check response is Cloudflare challenge page
+
+    :param response: requests.Response or aiohttp.ClientResponse
+    :return: False | True
+    """
+    status = response.status_code if hasattr(response, 'status_code') else response.status
+    if status not in (403, 503):
+        return False
+    return response.headers.get('cf-mitigated') == 'challenge' or \
+        'text/html' in response.headers.get('Content-Type', '')
+
+
+class LazyDriver:
+    def __init__(self, profile: str = 'main', driver_headless: bool = True, temp_dir_path: str = None,
+                 idle_timeout: float = 300, max_page_loads: int = None):
+        """
+        Chrome driver, started on first use and closed after idle period
+
+
+        profile: Chrome profile name
+
+        driver_headless: Chrome Headless mode
+
+        temp_dir_path: Chrome profile dir
+
+        idle_timeout: seconds without requests before Chrome is closed. None - never close
+
+        max_page_loads: restart Chrome after this count of page loads. None - never restart
+        """
+        self.profile = profile
+        self.driver_headless = driver_headless
+        self.temp_dir_path = temp_dir_path
+        self.idle_timeout = idle_timeout
+        self.max_page_loads = max_page_loads
+
+        self.page_loads = 0
+        self.starts = 0
+        self.errors = 0
+
+        self._driver = None
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self.get()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    @property
+    def is_running(self) -> bool:
+        return self._driver is not None
+
+    def get(self):
+        """
+        Get running driver. Start Chrome if it is not running. Idle timer is stopped until release()
+
+        with lazy_driver as driver:  # get() and release()
+            driver.get(url)
+
+        :return: uc.Chrome driver
+        """
+        with self._lock:
+            self._cancel_timer()
+            if self._driver is None:
+                logger.debug('Starting Chrome')
+                self._driver = start_chrome(self.profile, self.driver_headless, self.temp_dir_path)
+                self.page_loads = 0
+                self.starts += 1
+            return self._driver
+
+    def release(self):
+        """
+        Mark driver idle. Chrome will be closed after idle_timeout
+        """
+        with self._lock:
+            self._cancel_timer()
+            if self._driver is not None and self.idle_timeout is not None:
+                self._timer = threading.Timer(self.idle_timeout, self.quit)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def is_alive(self) -> bool:
+        """
+        Check Chrome still responds
+
+        :return: False | True
+        """
+        with self._lock:
+            if self._driver is None:
+                return False
+            try:
+                self._driver.current_url
+                return True
+            except Exception as e:
+                logger.debug(e)
+                return False
+
+    def request(self, url) -> Page:
+        """
+        Open url in Chrome and get page text with Chrome cookies and User-Agent.
+        Crashed Chrome or Chrome with max_page_loads is closed and started again on next request
+
+        :param url: page url
+        :return: Page(text, cookies, user_agent)
+        """
+        with self._lock:
+            driver = self.get()
+            try:
+                self.page_loads += 1
+                driver.get(url)
+                return Page(
+                    text=page_text(driver),
+                    cookies=driver.get_cookies(),
+                    user_agent=driver.execute_script("return navigator.userAgent")
+                )
+            except Exception:
+                self.errors += 1
+                if not self.is_alive():
+                    self.quit()
+                raise
+            finally:
+                if self.max_page_loads is not None and self.page_loads >= self.max_page_loads:
+                    self.quit()
+                self.release()
+
+    def quit(self):
+        """
+        Close Chrome. It will be started again on next request
+        """
+        with self._lock:
+            self._cancel_timer()
+            if self._driver is not None:
+                logger.debug('Closing Chrome')
+                try:
+                    self._driver.quit()
+                except Exception as e:
+                    logger.debug(e)
+                self._driver = None
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+class DriverPool:
+    def __init__(self, size: int = 2, profile: str = 'pool', driver_headless: bool = True, temp_dir_path: str = None,
+                 max_page_loads: int = 100, idle_timeout: float = 300, acquire_timeout: float = 60):
+        """
+        Pool of Chrome drivers for Cloudflare fallback. Can be shared by many MagicParser instances and threads
+
+        pool = DriverPool(size=4)
+        mp = MagicParser(driver_pool=pool)
+
+
+        size: Chrome instances count
+
+        profile: Chrome profiles name prefix. Every instance use own profile
+
+        driver_headless: Chrome Headless mode
+
+        temp_dir_path: dir for Chrome profiles
+
+        max_page_loads: restart Chrome after this count of page loads. None - never restart
+
+        idle_timeout: seconds without requests before Chrome is closed. None - never close
+
+        acquire_timeout: max seconds to wait for free Chrome. None - wait forever
+        """
+        self.acquire_timeout = acquire_timeout
+        self.drivers = []
+        self._free = queue.Queue()
+
+        for i in range(size):
+            driver = LazyDriver(
+                profile=f'{profile}_{i}',
+                driver_headless=driver_headless,
+                temp_dir_path=None if temp_dir_path is None else os.path.join(temp_dir_path, f'{profile}_{i}'),
+                idle_timeout=idle_timeout,
+                max_page_loads=max_page_loads
+            )
+            self.drivers.append(driver)
+            self._free.put(driver)
+
+    @property
+    def size(self) -> int:
+        return len(self.drivers)
+
+    @contextmanager
+    def acquire(self, timeout: float = None):
+        """
+        Check out free driver
+
+        with pool.acquire() as driver:
+            text = driver.request(url)
+
+        :param timeout: max seconds to wait. Default - acquire_timeout
+        :return: LazyDriver
+        """
+        if timeout is None:
+            timeout = self.acquire_timeout
+
+        try:
+            driver = self._free.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f'No free Chrome in pool after {timeout} sec')
+
+        try:
+            yield driver
+        finally:
+            self._free.put(driver)
+
+    def request(self, url, timeout: float = None) -> Page:
+        """
+        Open url in free Chrome and get page text with Chrome cookies and User-Agent
+
+        :param url: page url
+        :param timeout: max seconds to wait for free Chrome
+        :return: Page(text, cookies, user_agent)
+        """
+        with self.acquire(timeout) as driver:
+            return driver.request(url)
+
+    def stats(self) -> list[dict]:
+        """
+        Pool drivers health
+
+        :return: list of dicts {running, page_loads, starts, errors}
+        """
+        return [
+            {
+                'running': driver.is_running,
+                'page_loads': driver.page_loads,
+                'starts': driver.starts,
+                'errors': driver.errors
+            } for driver in self.drivers
+        ]
+
+    def quit(self):
+        """
+        Close all Chrome instances
+        """
+        for driver in self.drivers:
+            driver.quit()
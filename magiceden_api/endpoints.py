@@ -0,0 +1,333 @@
+import json
+from string import Formatter
+from urllib.parse import quote, urlencode
+
+API_HOST = 'https://api-mainnet.magiceden.io'
+STATS_HOST = 'https://stats-mainnet.magiceden.io'
+BINANCE_HOST = 'https://api.binance.com'
+
+PERIODS = ['5m', '15m', '1h', '6h', '1d', '7d', '30d']
+
+# global activities default filter, sales only
+SALE_TX_TYPES = ('exchange', 'acceptBid', 'auctionSettled')
+
+# chars left as is, so same args always give same url
+PATH_SAFE = ',:@$'
+QUERY_SAFE = ',:@$/'
+
+EDGE_CACHE = {'edge_cache': 'true'}
+
+
+class Url(str):
+    """
+    Url string with endpoint name, used as metrics label
+    """
+    def __new__(cls, url: str, name: str = None):
+        obj = super().__new__(cls, url)
+        obj.name = name
+        return obj
+
+    def __getnewargs__(self):
+        return str(self), self.name
+
+
+def encode_value(value, safe: str = QUERY_SAFE) -> str:
+    """
+    Url encoded value. dict and list are sent as compact json, bool as true / false
+
+    :param value: param value
+    :param safe: chars not quoted
+    :return: str
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list, tuple)):
+        value = json.dumps(value, separators=(',', ':'))
+    return quote(str(value), safe=safe)
+
+
+class Endpoint:
+    def __init__(self, name: str, host: str, path: str, params=(), static: dict = None):
+        """
+        Url schema of one api endpoint. Path template is parsed once, building url is joining strings
+
+        Endpoint('holders', 'api_host', '/v2/collections/{symbol}/holder_stats')
+
+
+        name: Endpoints method name, metrics label
+
+        host: Endpoints host attribute, api_host | stats_host | binance_host
+
+        path: path template, {arg} is replaced by quoted path segment
+
+        params: query args in url order, name or (url name, arg name). None values are skipped
+
+        static: fixed query params sent after args
+        """
+        self.name = name
+        self.host = host
+        self.path = path
+        self.params = tuple(param if isinstance(param, tuple) else (param, param) for param in params)
+        self.static = urlencode(static or {})
+        self._segments = [(literal, field) for literal, field, _, _ in Formatter().parse(path)]
+
+    def url(self, host: str, **args) -> Url:
+        """
+        :param host: host url
+        :param args: path and query args
+        :return: Url
+        """
+        parts = [host]
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(encode_value(args[field], PATH_SAFE))
+
+        query = [f'{key}={encode_value(args[arg])}' for key, arg in self.params if args.get(arg) is not None]
+        if self.static:
+            query.append(self.static)
+        if query:
+            parts.append('?')
+            parts.append('&'.join(query))
+        return Url(''.join(parts), self.name)
+
+
+ENDPOINTS = {endpoint.name: endpoint for endpoint in [
+    Endpoint('featured_carousels', 'api_host', '/featured_carousels', static=EDGE_CACHE),
+    Endpoint('featured_collections_carousels', 'api_host', '/featured_collections_carousels', static=EDGE_CACHE),
+    Endpoint('magiceden_volumes', 'api_host', '/volumes', static=EDGE_CACHE),
+    Endpoint('all_collections', 'api_host', '/all_collections_with_escrow_data', static=EDGE_CACHE),
+    Endpoint('all_organizations', 'api_host', '/all_organizations', static=EDGE_CACHE),
+    Endpoint('popular_collections', 'stats_host', '/collection_stats/popular_collections/sol',
+             params=['limit', ('window', 'period')]),
+    Endpoint('price', 'binance_host', '/api/v3/ticker/price', params=['symbol']),
+    Endpoint('launchpad_collections', 'api_host', '/launchpad_collections', static=EDGE_CACHE),
+    Endpoint('auctions', 'api_host', '/auctions', params=['status', 'sort', 'limit', 'timeout'], static=EDGE_CACHE),
+    Endpoint('auction_by_symbol', 'api_host', '/auctions/{symbol}'),
+    Endpoint('drops', 'api_host', '/drops', params=['limit', 'offset', 'top']),
+    Endpoint('most_watched_collections', 'api_host', '/collection_watchlists/most_watched', static=EDGE_CACHE),
+    Endpoint('multi_collection_stats', 'api_host', '/rpc/getMultiCollectionEscrowStats/{symbols}'),
+    Endpoint('collections_witch_symbols', 'api_host', '/rpc/getCollectionsWithSymbols', params=['symbols']),
+    Endpoint('collection_escrow_stats', 'api_host', '/rpc/getCollectionEscrowStats/{symbol}'),
+    Endpoint('collection', 'api_host', '/collections/{symbol}'),
+    Endpoint('collection_scam_flag', 'api_host', '/collection_flags/check/{symbol}'),
+    Endpoint('twitter_followers', 'stats_host', '/social_metrics/collection/{symbol}'),
+    Endpoint('nft_by_mint_address', 'api_host', '/rpc/getNFTByMintAddress/{mint}', params=['useRarity']),
+    Endpoint('whitelists', 'api_host', '/whitelists/upcoming'),
+    Endpoint('listed_nfts', 'api_host', '/rpc/getListedNFTsByQueryLite', params=['q']),
+    Endpoint('collections_info', 'api_host', '/rpc/getAggregatedCollectionMetricsBySymbol', params=['symbols'],
+             static=EDGE_CACHE),
+    Endpoint('global_activities', 'api_host', '/rpc/getGlobalActivitiesByQuery', params=['q']),
+    Endpoint('activities_lite', 'api_host', '/v2/collections/{symbol}/activitiesLite',
+             params=['limit', 'offset', 'type']),
+    Endpoint('approx_listings', 'api_host', '/v2/collections/{symbol}/approx_listings', params=['limit', 'offset']),
+    Endpoint('holders', 'api_host', '/v2/collections/{symbol}/holder_stats'),
+    Endpoint('collection_time_series', 'api_host', '/rpc/getCollectionTimeSeries/{symbol}', params=['resolution']),
+    Endpoint('nfts_by_escrow_owner', 'api_host', '/rpc/getNFTsByEscrowOwner/{wallet}'),
+    Endpoint('biddings_by_query', 'api_host', '/rpc/getBiddingsByQuery', params=['q']),
+    Endpoint('user_auction_wallet', 'api_host', '/auctions/wallets/{wallet}'),
+    Endpoint('user_info', 'api_host', '/auth/user/{wallet}'),
+    Endpoint('user_listings', 'api_host', '/search_escrows', params=['initializerKey']),
+    Endpoint('user_activity', 'api_host', '/rpc/getGlobalActivitiesByQuery', params=['q']),
+    Endpoint('nfts_by_owner', 'api_host', '/rpc/getNFTsByOwner/{wallet}'),
+    Endpoint('offers_received', 'api_host', '/rpc/m2/getOffersReceived/{wallet}'),
+]}
+
+
+class Endpoints:
+    def __init__(self, api_host: str = API_HOST, stats_host: str = STATS_HOST, binance_host: str = BINANCE_HOST):
+        """
+        MagicEden api urls. Shared by MagicParser and AsyncMagicParser
+
+
+        api_host: api-mainnet host
+
+        stats_host: stats-mainnet host
+
+        binance_host: binance api host
+        """
+        self.api_host = api_host
+        self.stats_host = stats_host
+        self.binance_host = binance_host
+
+    def url(self, name: str, **args) -> Url:
+        """
+        Url of registered endpoint
+
+        :param name: ENDPOINTS name
+        :param args: path and query args
+        :return: Url
+        """
+        endpoint = ENDPOINTS[name]
+        return endpoint.url(getattr(self, endpoint.host), **args)
+
+    def featured_carousels(self) -> str:
+        return self.url('featured_carousels')
+
+    def featured_collections_carousels(self) -> str:
+        return self.url('featured_collections_carousels')
+
+    def magiceden_volumes(self) -> str:
+        return self.url('magiceden_volumes')
+
+    def all_collections(self) -> str:
+        return self.url('all_collections')
+
+    def all_organizations(self) -> str:
+        return self.url('all_organizations')
+
+    def popular_collections(self, limit=1000, period='1d') -> str:
+        return self.url('popular_collections', limit=limit, period=period)
+
+    def price(self, currency='SOL') -> str:
+        return self.url('price', symbol=f'{currency}USDC')
+
+    def launchpad_collections(self) -> str:
+        return self.url('launchpad_collections')
+
+    def auctions(self, status='live', timeout=30000) -> str:
+        sort = {'config.endDate': 1}
+        limit = None
+        if status == 'upcoming':
+            sort = {'config.startDate': 1}
+
+        elif status == 'finished':
+            sort = {'config.endDate': -1}
+            limit = 20
+
+        return self.url('auctions', status=status, sort=sort, limit=limit, timeout=timeout)
+
+    def auction_by_symbol(self, collection_symbol) -> str:
+        return self.url('auction_by_symbol', symbol=collection_symbol)
+
+    def drops(self, limit=500, offset=0, top=None) -> str:
+        return self.url('drops', limit=limit, offset=offset, top=top)
+
+    def most_watched_collections(self) -> str:
+        return self.url('most_watched_collections')
+
+    def multi_collection_stats(self, collections_symbols: list) -> str:
+        return self.url('multi_collection_stats', symbols=','.join(collections_symbols))
+
+    def collections_witch_symbols(self, collection_symbols: list) -> str:
+        return self.url('collections_witch_symbols', symbols=list(collection_symbols))
+
+    def collection_escrow_stats(self, collection_symbol: str) -> str:
+        return self.url('collection_escrow_stats', symbol=collection_symbol)
+
+    def collection(self, symbol: str) -> str:
+        return self.url('collection', symbol=symbol)
+
+    def collection_scam_flag(self, collection_symbol: str) -> str:
+        return self.url('collection_scam_flag', symbol=collection_symbol)
+
+    def twitter_followers(self, collection_symbol: str) -> str:
+        return self.url('twitter_followers', symbol=collection_symbol)
+
+    def nft_by_mint_address(self, mint_address: str, use_rarity=False) -> str:
+        return self.url('nft_by_mint_address', mint=mint_address, useRarity=bool(use_rarity))
+
+    def whitelists(self) -> str:
+        return self.url('whitelists')
+
+    def listed_nfts(self, collection_symbol, *, offset=0, limit=20) -> str:
+        q = {
+            "$match": {
+                "collectionSymbol": collection_symbol
+            },
+            "$sort": {
+                "takerAmount": 1
+            },
+            "$skip": offset,
+            "$limit": limit,
+            "status": []
+        }
+        return self.url('listed_nfts', q=q)
+
+    def collections_info(self, collection_symbols_list: list) -> str:
+        return self.url('collections_info', symbols=','.join(collection_symbols_list))
+
+    def global_activities(self, collection_symbol: str, *, offset=0, limit=50, tx_types=SALE_TX_TYPES) -> str:
+        q = {
+            "$match": {
+                "txType": {
+                    "$in": list(tx_types)
+                },
+                "source": {
+                    "$nin": ["yawww"]
+                },
+                "collection_symbol": collection_symbol
+            },
+            "$sort": {
+                "blockTime": -1,
+                "createdAt": -1
+            },
+            "$skip": offset,
+            "$limit": limit
+        }
+        return self.url('global_activities', q=q)
+
+    def activities_lite(self, collection_symbol, limit=500, offset=0, _type='buy,buyNow') -> str:
+        return self.url('activities_lite', symbol=collection_symbol, limit=limit, offset=offset, type=_type)
+
+    def approx_listings(self, collection_symbol: str, limit=500, offset=0) -> str:
+        return self.url('approx_listings', symbol=collection_symbol, limit=limit, offset=offset)
+
+    def holders(self, collection_symbol) -> str:
+        return self.url('holders', symbol=collection_symbol)
+
+    def collection_time_series(self, collection_symbol: str, tdelta: str = '1h') -> str:
+        return self.url('collection_time_series', symbol=collection_symbol, resolution=tdelta)
+
+    def nfts_by_escrow_owner(self, holder_wallet: str) -> str:
+        return self.url('nfts_by_escrow_owner', wallet=holder_wallet)
+
+    def biddings_by_query(self, holder_wallet: str, _type='initializerKey') -> str:
+        q = {
+            "$match": {
+                _type: holder_wallet
+            },
+            "$sort": {
+                "createdAt": -1
+            }
+        }
+        return self.url('biddings_by_query', q=q)
+
+    def user_auction_wallet(self, holder_wallet: str) -> str:
+        return self.url('user_auction_wallet', wallet=holder_wallet)
+
+    def user_info(self, holder_wallet: str) -> str:
+        return self.url('user_info', wallet=holder_wallet)
+
+    def user_listings(self, holder_wallet: str) -> str:
+        return self.url('user_listings', initializerKey=holder_wallet)
+
+    def user_activity(self, holder_wallet: str, *, offset=0, limit=None) -> str:
+        q = {
+            "$match": {
+                "$or": [
+                    {
+                        "seller_address": holder_wallet
+                    },
+                    {
+                        "buyer_address": holder_wallet
+                    }
+                ],
+                "source": {
+                    "$nin": ["yawww"]}
+            },
+            "$sort": {
+                "blockTime": -1,
+                "createdAt": -1
+            },
+            "$skip": offset
+        }
+        if limit is not None:
+            q['$limit'] = limit
+        return self.url('user_activity', q=q)
+
+    def nfts_by_owner(self, holder_wallet: str) -> str:
+        return self.url('nfts_by_owner', wallet=holder_wallet)
+
+    def offers_received(self, holder_wallet: str) -> str:
+        return self.url('offers_received', wallet=holder_wallet)
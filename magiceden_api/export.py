@@ -0,0 +1,443 @@
+import os
+import csv
+import json
+import logging
+import argparse
+from itertools import islice
+
+from magiceden_api.pagination import paginate
+
+logger = logging.getLogger('MagicParser')
+
+FORMATS = ('jsonl', 'csv', 'parquet')
+
+
+def _flat_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(',', ':'))
+    return value
+
+
+def infer_schema(records: list[dict], columns: list = None) -> list[str]:
+    """
+    Columns of records in first seen order
+
+    :param records: list of dicts
+    :param columns: known columns, new columns are added after them
+    :return: list of columns
+    """
+    columns = dict.fromkeys(columns or ())
+    for record in records:
+        for key in record:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def _arrow_column(values: list):
+    import pyarrow as pa
+
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # mixed types in one column
+        return pa.array([None if value is None else str(value) for value in values], pa.string())
+
+
+def promote_type(old, new):
+    """
+    Arrow type for column with values of both types. null < int < float < string
+
+    :param old: pyarrow DataType
+    :param new: pyarrow DataType
+    :return: pyarrow DataType
+    """
+    import pyarrow as pa
+
+    if old == new or pa.types.is_null(new):
+        return old
+    if pa.types.is_null(old):
+        return new
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(check(old) for check in numeric) and any(check(new) for check in numeric):
+        return pa.float64()
+    return pa.string()
+
+
+def _arrow_table(rows: list[dict], columns: list, schema=None):
+    """
+    Table of rows with schema promoted to fit both schema and rows
+
+    :return: (table, schema)
+    """
+    import pyarrow as pa
+
+    arrays = [_arrow_column([row.get(key) for row in rows]) for key in columns]
+    fields = []
+    for key, array in zip(columns, arrays):
+        index = schema.get_field_index(key) if schema is not None else -1
+        fields.append(pa.field(key, array.type if index < 0 else promote_type(schema.field(index).type, array.type)))
+    schema = pa.schema(fields)
+    return pa.Table.from_arrays(arrays, columns).cast(schema), schema
+
+
+def _cast_table(table, schema):
+    # add missing columns as nulls and cast to promoted schema
+    import pyarrow as pa
+
+    columns = [
+        table.column(field.name) if field.name in table.column_names else pa.nulls(len(table), field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema.names).cast(schema)
+
+
+class RotatingWriter:
+    def __init__(self, base_path: str, fmt: str = 'jsonl', max_records: int = 100000, buffer_size: int = 1000):
+        """
+        Streaming records writer. Records are buffered and written every buffer_size records,
+        new file is started every max_records records: <base_path>-00000.<fmt>, <base_path>-00001.<fmt> ...
+
+        csv and parquet columns are inferred from records, nested values are saved as json.
+        When later records have new columns or parquet column type must be promoted (null -> int -> float -> string),
+        current file is rewritten with wider schema. It happens once per schema change and reads one file at most
+
+
+        base_path: files path without extension
+
+        fmt: jsonl | csv | parquet
+
+        max_records: records per file
+
+        buffer_size: records kept in memory before write
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"fmt available states {', '.join(FORMATS)}")
+        if fmt == 'parquet':
+            import pyarrow  # noqa: F401, pip install magiceden_api_parser[parquet]
+
+        self.base_path = base_path
+        self.fmt = fmt
+        self.max_records = max_records
+        self.buffer_size = buffer_size
+
+        self.file_index = 0
+        self.file_records = 0
+        self.written = 0
+
+        self._buffer = []
+        self._file = None
+        self._columns = None
+        self._csv = None
+        self._parquet = None
+        self._schema = None  # parquet arrow schema
+
+    @property
+    def path(self) -> str:
+        return f'{self.base_path}-{self.file_index:05d}.{self.fmt}'
+
+    @property
+    def resumable(self) -> bool:
+        """
+        All records are on disk and state() can be saved. Parquet is resumable only between files
+        """
+        return not self._buffer and self._parquet is None
+
+    def write(self, record: dict):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.buffer_size or self.file_records + len(self._buffer) >= self.max_records:
+            self.flush()
+
+    def flush(self):
+        """
+        Write buffered records
+        """
+        while self._buffer:
+            room = self.max_records - self.file_records
+            chunk, self._buffer = self._buffer[:room], self._buffer[room:]
+            self._write_chunk(chunk)
+            self.file_records += len(chunk)
+            self.written += len(chunk)
+            if self.file_records >= self.max_records:
+                self.rotate()
+
+    def rotate(self):
+        """
+        Close current file, next records go to the next file
+        """
+        self._close_file()
+        self.file_index += 1
+        self.file_records = 0
+
+    def close(self):
+        self.flush()
+        self._close_file()
+
+    def state(self) -> dict:
+        """
+        Position to resume writing after restart. Only valid when resumable
+        """
+        size = None
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            size = self._file.tell()
+        return {
+            'file_index': self.file_index,
+            'file_records': self.file_records,
+            'file_size': size,
+            'columns': self._columns,
+            'schema': [[field.name, str(field.type)] for field in self._schema] if self._schema is not None else None
+        }
+
+    def restore(self, state: dict):
+        """
+        Continue writing from state. Data written after state is dropped
+
+        :param state: RotatingWriter.state()
+        """
+        self.file_index = state['file_index']
+        self.file_records = state['file_records']
+        if state.get('schema'):
+            import pyarrow as pa
+
+            self._schema = pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in state['schema']])
+        if not os.path.exists(self.path):
+            self.file_records = 0
+            return
+
+        if state.get('file_size') is None:
+            # file was started after state, write it again
+            os.remove(self.path)
+            self.file_records = 0
+            return
+
+        self._columns = state.get('columns')
+        if self.fmt == 'csv' and self._csv_header() != self._columns:
+            # file was widened after state, byte size is not valid, keep first file_records rows
+            self._truncate_csv(self.file_records)
+        else:
+            with open(self.path, 'r+b') as f:
+                f.truncate(state['file_size'])
+        self._open_file(append=True)
+
+    def _csv_header(self) -> list:
+        with open(self.path, 'r', newline='', encoding='utf-8') as f:
+            return next(csv.reader(f), None)
+
+    def _truncate_csv(self, records: int):
+        tmp_path = f'{self.path}.tmp'
+        with open(self.path, 'r', newline='', encoding='utf-8') as src, \
+                open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+            reader = csv.reader(src)
+            self._columns = next(reader)
+            writer = csv.writer(dst)
+            writer.writerow(self._columns)
+            writer.writerows(islice(reader, records))
+        os.replace(tmp_path, self.path)
+
+    def _open_file(self, append=False):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if self.fmt == 'parquet':
+            return
+        self._file = open(self.path, 'a' if append else 'w', newline='', encoding='utf-8')
+        if self.fmt == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=self._columns, extrasaction='ignore')
+            if not append:
+                self._csv.writeheader()
+
+    def _write_chunk(self, records: list[dict]):
+        columns = infer_schema(records, self._columns)
+
+        if self.fmt == 'jsonl':
+            self._columns = columns
+            if self._file is None:
+                self._open_file()
+            self._file.write(''.join(json.dumps(record) + '\n' for record in records))
+
+        elif self.fmt == 'csv':
+            if self._file is not None and columns != self._columns:
+                self._widen_csv(columns)
+            self._columns = columns
+            if self._file is None:
+                self._open_file()
+            self._csv.writerows({key: _flat_value(record.get(key)) for key in self._columns} for record in records)
+
+        else:
+            import pyarrow.parquet as pq
+
+            # schema is kept between files, so all files of export have the same column types
+            if self._schema is not None:
+                columns = infer_schema(records, self._schema.names)
+            self._columns = columns
+            rows = [{key: _flat_value(record.get(key)) for key in columns} for record in records]
+            table, schema = _arrow_table(rows, columns, self._schema)
+            self._schema = schema
+            if self._parquet is None:
+                self._open_file()
+                self._parquet = pq.ParquetWriter(self.path, schema)
+            elif not schema.equals(self._parquet.schema):
+                self._widen_parquet(schema)
+            self._parquet.write_table(table)
+
+    def _widen_csv(self, columns: list):
+        # rewrite file with new header, old rows get empty new columns
+        self._file.close()
+        tmp_path = f'{self.path}.tmp'
+        with open(self.path, 'r', newline='', encoding='utf-8') as src, \
+                open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst)
+            next(reader, None)
+            writer.writerow(columns)
+            padding = [''] * (len(columns) - len(self._columns))
+            writer.writerows(row + padding for row in reader)
+        os.replace(tmp_path, self.path)
+
+        self._columns = columns
+        self._file = open(self.path, 'a', newline='', encoding='utf-8')
+        self._csv = csv.DictWriter(self._file, fieldnames=columns, extrasaction='ignore')
+
+    def _widen_parquet(self, schema):
+        # parquet schema is fixed per file, copy written row groups to new file with promoted schema
+        import pyarrow.parquet as pq
+
+        self._parquet.close()
+        old_path = f'{self.path}.old'
+        os.replace(self.path, old_path)
+        self._parquet = pq.ParquetWriter(self.path, schema)
+        source = pq.ParquetFile(old_path)
+        try:
+            for i in range(source.num_row_groups):
+                self._parquet.write_table(_cast_table(source.read_row_group(i), schema))
+        finally:
+            source.close()
+        os.remove(old_path)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._csv = None
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+        self._columns = None
+
+
+def _all_collections(parser, start, **kwargs):
+    return islice(parser.get_all_collections(), start, None)
+
+
+def _popular_collections(parser, start, period='1d', limit=1000, **kwargs):
+    return islice(parser.get_popular_collections(limit=limit, period=period), start, None)
+
+
+def _holders(parser, start, symbol=None, **kwargs):
+    return islice(parser.get_holders(symbol)['topHolders'], start, None)
+
+
+def _activities_lite(parser, start, symbol=None, page_size=500, **kwargs):
+    return paginate(
+        lambda offset, limit: parser.get_activities_lite(symbol, limit, offset),
+        page_size=page_size, offset=start, prefetch=True
+    )
+
+
+SOURCES = {
+    'all_collections': _all_collections,
+    'popular_collections': _popular_collections,
+    'holders': _holders,
+    'activities_lite': _activities_lite,
+}
+
+
+def export(parser, source: str, base_path: str, fmt: str = 'jsonl', max_records: int = 100000,
+           buffer_size: int = 1000, resume: bool = True, **source_args) -> int:
+    """
+    Stream records from parser endpoint to rotating files. Checkpoint is saved to <base_path>.checkpoint.json
+    after every write, so crashed export continues from the last written record.
+    Parquet file can't be appended, its checkpoint is saved only when file is rotated,
+    so crashed parquet export loses up to max_records records. Use smaller max_records to lose less
+
+    :param parser: MagicParser
+    :param source: all_collections | popular_collections | holders | activities_lite
+    :param base_path: files path without extension
+    :param fmt: jsonl | csv | parquet
+    :param max_records: records per file
+    :param buffer_size: records kept in memory before write
+    :param resume: continue from checkpoint if it exists. ValueError if checkpoint has other source or source_args
+    :param source_args: source arguments. symbol, period, limit
+    :return: records written
+    """
+    if source not in SOURCES:
+        raise ValueError(f"source available states {', '.join(SOURCES)}")
+
+    checkpoint_path = f'{base_path}.checkpoint.json'
+    writer = RotatingWriter(base_path, fmt, max_records, buffer_size)
+    position = 0
+
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path, 'r') as f:
+            checkpoint = json.load(f)
+        args = json.loads(json.dumps(source_args))
+        if checkpoint.get('source') != source or checkpoint.get('args') != args:
+            raise ValueError(f"checkpoint {checkpoint_path} is for {checkpoint.get('source')} {checkpoint.get('args')}, "
+                             f"not {source} {args}. Use other base_path or resume=False")
+        position = checkpoint['position']
+        writer.restore(checkpoint['writer'])
+        logger.info(f'Resume {source} export from record {position}')
+
+    def save_checkpoint():
+        tmp_path = f'{checkpoint_path}.tmp'
+        with open(tmp_path, 'w') as cf:
+            json.dump({'source': source, 'args': source_args, 'position': position, 'writer': writer.state()}, cf)
+        os.replace(tmp_path, checkpoint_path)
+
+    for record in SOURCES[source](parser, position, **source_args):
+        writer.write(record)
+        position += 1
+        if writer.resumable:
+            save_checkpoint()
+
+    writer.close()
+    save_checkpoint()
+    return writer.written
+
+
+def main(args=None):
+    arg_parser = argparse.ArgumentParser(prog='magiceden-export', description='Export MagicEden data to files')
+    arg_parser.add_argument('source', choices=list(SOURCES))
+    arg_parser.add_argument('--out', required=True, help='files path without extension')
+    arg_parser.add_argument('--format', default='jsonl', choices=FORMATS)
+    arg_parser.add_argument('--symbol', help='collection symbol for holders and activities_lite')
+    arg_parser.add_argument('--period', default='1d', help='popular_collections period')
+    arg_parser.add_argument('--limit', type=int, default=1000, help='popular_collections limit')
+    arg_parser.add_argument('--max-records', type=int, default=100000, help='records per file. Crashed parquet export resumes from the last full file')
+    arg_parser.add_argument('--buffer-size', type=int, default=1000, help='records kept in memory before write')
+    arg_parser.add_argument('--no-resume', action='store_true', help='ignore checkpoint')
+    arg_parser.add_argument('--http-only', action='store_true', help="don't use Chrome for Cloudflare fallback")
+    args = arg_parser.parse_args(args)
+
+    from magiceden_api import MagicParser
+
+    source_args = {}
+    if args.source in ('holders', 'activities_lite'):
+        if args.symbol is None:
+            arg_parser.error(f'--symbol is required for {args.source}')
+        source_args['symbol'] = args.symbol
+    if args.source == 'popular_collections':
+        source_args.update(period=args.period, limit=args.limit)
+
+    parser = MagicParser(driver_mode='http' if args.http_only else 'lazy')
+    try:
+        written = export(
+            parser, args.source, args.out, fmt=args.format, max_records=args.max_records,
+            buffer_size=args.buffer_size, resume=not args.no_resume, **source_args
+        )
+    finally:
+        parser.close()
+    print(f'{written} records written')
+
+
+if __name__ == '__main__':
+    main()
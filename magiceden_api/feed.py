@@ -0,0 +1,346 @@
+import time
+import asyncio
+import inspect
+import logging
+from typing import NamedTuple
+
+from magiceden_api.floor import DELIST_TX_TYPES, LIST_TX_TYPES, SOLD_TX_TYPES
+from magiceden_api.models import Activity
+from magiceden_api.sync import SeenSet, activity_key
+
+logger = logging.getLogger('MagicParser')
+
+SALE = 'sale'
+LISTING = 'listing'
+DELIST = 'delist'
+DROP = 'drop'  # new drop or launchpad collection
+
+EVENT_TYPES = {
+    **{tx_type: SALE for tx_type in SOLD_TX_TYPES},
+    **{tx_type: LISTING for tx_type in LIST_TX_TYPES},
+    **{tx_type: DELIST for tx_type in DELIST_TX_TYPES},
+}
+FEED_TX_TYPES = SOLD_TX_TYPES + LIST_TX_TYPES + DELIST_TX_TYPES
+
+DROPS = 'drops'
+LAUNCHPAD = 'launchpad'
+
+
+class FeedEvent(NamedTuple):
+    type: str  # sale | listing | delist | drop
+    symbol: str  # collection symbol, drop symbol or name
+    key: str  # dedup key, activity signature or drop symbol
+    data: object  # activity dict or Activity, drop dict
+    time: float  # activity blockTime, drop discovery time
+
+
+class _Source:
+    # one polled request: collection activities, drops or launchpad
+    def __init__(self, name: str, symbol: str = None, interval: float = 1):
+        self.name = name
+        self.symbol = symbol
+        self.interval = interval
+        self.next_at = 0.0
+        self.started = False  # first poll done
+        self.busy = False
+        self.events = 0
+
+
+class LiveFeed:
+    def __init__(self, parser, symbols=(), drops: bool = True, launchpad: bool = True, rate: float = 5,
+                 min_interval: float = 1, max_interval: float = 60, page_size: int = 50, max_pages: int = 3,
+                 tx_types=FEED_TX_TYPES, drops_limit: int = 100, seen_size: int = 10000, emit_initial: bool = False,
+                 typed: bool = False, queue_size: int = 10000):
+        """
+        Live stream of sales, listings, delists and new drops. Sources share one request budget,
+        collections with recent events are polled more often, idle ones less
+
+        feed = LiveFeed(ap, ['degods', 'okay_bears'], rate=5)
+        async for event in feed:
+            if event.type == SALE:
+                ...
+
+        feed.subscribe(callback, types=[LISTING])  # callback(event), function or coroutine function
+        await feed.run()
+
+
+        parser: AsyncMagicParser
+
+        symbols: collections to watch activities of
+
+        drops: watch new drops
+
+        launchpad: watch new launchpad collections
+
+        rate: requests per second for all sources together
+
+        min_interval: poll interval of hot source
+
+        max_interval: poll interval of idle source
+
+        page_size: activities per request
+
+        max_pages: requests per poll while whole page is new
+
+        tx_types: activity types to watch, one request gets all of them
+
+        drops_limit: drops per request
+
+        seen_size: activity signatures remembered for dedup. Drop keys are all kept
+
+        emit_initial: emit events of first poll. By default first poll only marks current state as seen
+
+        typed: activity event data is Activity model
+
+        queue_size: events buffered per async iterator, oldest are dropped on overflow
+        """
+        self.parser = parser
+        self.rate = rate
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.tx_types = tuple(tx_types)
+        self.drops_limit = drops_limit
+        self.emit_initial = emit_initial
+        self.typed = typed
+        self.queue_size = queue_size
+
+        self.requests = 0
+        self.dropped = 0  # events dropped on queue overflow
+        self._seen = SeenSet(seen_size)  # activity signatures
+        self._drops = set()  # drop keys, not evicted by activity traffic, so live drops are never emitted again
+        self._sources = {}  # name: _Source
+        self._subscribers = []  # (callback, types)
+        self._queues = []  # (asyncio.Queue, types)
+        self._tasks = set()
+        self._next_slot = 0.0
+        self._budget_lock = None
+        self._wake = None
+        self._runner = None
+        self._running = False
+
+        for symbol in symbols:
+            self.track(symbol)
+        if drops:
+            self._add_source(_Source(DROPS, interval=self.min_interval))
+        if launchpad:
+            self._add_source(_Source(LAUNCHPAD, interval=self.min_interval))
+
+    def track(self, symbol: str):
+        """
+        Watch collection activities, first poll is made as soon as budget allows
+        """
+        self._add_source(_Source(f'collection:{symbol}', symbol, self.min_interval))
+
+    def untrack(self, symbol: str):
+        self._sources.pop(f'collection:{symbol}', None)
+
+    def _add_source(self, source: _Source):
+        if source.name not in self._sources:
+            self._sources[source.name] = source
+            if self._wake is not None:
+                self._wake.set()
+
+    def subscribe(self, callback, types=None):
+        """
+        :param callback: function(FeedEvent) or coroutine function. Called in event loop, must be fast
+        :param types: event types. None - all
+        """
+        self._subscribers.append((callback, set(types) if types else None))
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, types) for cb, types in self._subscribers if cb is not callback]
+
+    def intervals(self) -> dict:
+        """
+        :return: {source name: current poll interval}
+        """
+        return {name: source.interval for name, source in self._sources.items()}
+
+    def __aiter__(self):
+        return self.events()
+
+    async def events(self, types=None):
+        """
+        Async iterator of events. Starts feed if it is not running
+
+        :param types: event types. None - all
+        """
+        queue = asyncio.Queue(self.queue_size)
+        item = (queue, set(types) if types else None)
+        self._queues.append(item)
+        if self._runner is None and not self._running:
+            self._runner = asyncio.ensure_future(self.run())
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues.remove(item)
+            # feed started by iterators stops with the last one
+            if self._runner is not None and not self._queues and not self._subscribers:
+                await self.stop()
+
+    async def run(self):
+        """
+        Poll sources until stop()
+        """
+        loop = asyncio.get_running_loop()
+        self._budget_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._running = True
+        try:
+            while self._running:
+                self._wake.clear()
+                now = loop.time()
+                idle = [source for source in self._sources.values() if not source.busy]
+                for source in sorted(idle, key=lambda s: s.next_at):
+                    if source.next_at > now:
+                        break
+                    source.busy = True
+                    task = asyncio.ensure_future(self._poll_source(source))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+
+                wait = min((s.next_at for s in self._sources.values() if not s.busy), default=now + self.max_interval)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), max(wait - now, 0.001))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def stop(self):
+        self._running = False
+        if self._wake is not None:
+            self._wake.set()
+        runner, self._runner = self._runner, None
+        if runner is not None and runner is not asyncio.current_task():
+            await runner
+
+    async def poll(self, name: str) -> list[FeedEvent]:
+        """
+        Poll one source now and publish its events
+
+        :param name: 'collection:<symbol>' | 'drops' | 'launchpad'
+        :return: new events, oldest first
+        """
+        if self._budget_lock is None:
+            self._budget_lock = asyncio.Lock()
+        source = self._sources[name]
+        if source.symbol is not None:
+            events = await self._poll_activities(source)
+        else:
+            events = await self._poll_drops(source)
+
+        if not source.started:
+            source.started = True
+            if not self.emit_initial:
+                events = []
+
+        source.events += len(events)
+        for event in events:
+            self._publish(event)
+        return events
+
+    async def _poll_source(self, source: _Source):
+        loop = asyncio.get_running_loop()
+        try:
+            events = await self.poll(source.name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f'feed {source.name}: {e}')
+            source.interval = min(self.max_interval, source.interval * 2)
+        else:
+            self._adapt(source, events)
+        finally:
+            source.busy = False
+            source.next_at = loop.time() + source.interval
+            if self._wake is not None:
+                self._wake.set()
+
+    def _adapt(self, source: _Source, events: list):
+        # hot source is polled up to min_interval, every empty poll makes interval longer
+        if events:
+            source.interval = max(self.min_interval, source.interval / 2)
+        else:
+            source.interval = min(self.max_interval, source.interval * 1.5)
+
+    async def _acquire(self):
+        # requests of all sources are spread evenly within rate, waiting sources get budget in FIFO order
+        async with self._budget_lock:
+            now = time.monotonic()
+            if self._next_slot > now:
+                await asyncio.sleep(self._next_slot - now)
+            self._next_slot = max(now, self._next_slot) + 1 / self.rate
+            self.requests += 1
+
+    async def _poll_activities(self, source: _Source) -> list[FeedEvent]:
+        new = []
+        pages = self.max_pages if source.started else 1
+        for page in range(pages):
+            await self._acquire()
+            activities = await self.parser.get_global_activities(
+                source.symbol, offset=page * self.page_size, limit=self.page_size, tx_types=self.tx_types
+            )
+            fresh = [a for a in activities if f'activity:{activity_key(a)}' not in self._seen]
+            new.extend(fresh)
+            # next page only while the whole page is new
+            if len(fresh) < self.page_size:
+                break
+
+        events = []
+        for activity in reversed(new):
+            key = f'activity:{activity_key(activity)}'
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            event_type = EVENT_TYPES.get(activity.get('txType') or activity.get('type'))
+            if event_type is None:
+                continue
+            data = Activity.from_dict(activity) if self.typed else activity
+            events.append(FeedEvent(event_type, source.symbol, activity.get('signature'), data,
+                                    activity.get('blockTime')))
+        return events
+
+    async def _poll_drops(self, source: _Source) -> list[FeedEvent]:
+        await self._acquire()
+        if source.name == DROPS:
+            drops = await self.parser.get_drops(limit=self.drops_limit)
+        else:
+            drops = await self.parser.get_launchpad_collections()
+
+        now = time.time()
+        events = []
+        for drop in drops:
+            symbol = drop.get('symbol') or drop.get('name')
+            if symbol is None or symbol in self._drops:
+                continue
+            self._drops.add(symbol)
+            events.append(FeedEvent(DROP, symbol, symbol, drop, now))
+        return events
+
+    def _publish(self, event: FeedEvent):
+        for callback, types in self._subscribers:
+            if types is not None and event.type not in types:
+                continue
+            try:
+                result = callback(event)
+                if inspect.isawaitable(result):
+                    task = asyncio.ensure_future(result)
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            except Exception as e:
+                logger.error(f'feed subscriber: {e}')
+
+        for queue, types in self._queues:
+            if types is not None and event.type not in types:
+                continue
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
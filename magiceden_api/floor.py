@@ -0,0 +1,337 @@
+import time
+import bisect
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from magiceden_api.portfolio import get_floor_prices, mint_of
+from magiceden_api.sync import ActivitySync
+
+logger = logging.getLogger('MagicParser')
+
+# activity txType -> book update
+LIST_TX_TYPES = ('list', 'initializeEscrow', 'updateListing')
+DELIST_TX_TYPES = ('delist', 'cancelEscrow')
+SOLD_TX_TYPES = ('exchange', 'buyNow', 'acceptBid', 'auctionSettled')
+BOOK_TX_TYPES = LIST_TX_TYPES + DELIST_TX_TYPES + SOLD_TX_TYPES
+
+
+class FloorError(Exception):
+    def __init__(self, symbol: str, error: Exception):
+        """
+        Floor price is unknown, last update of collection book failed
+
+
+        symbol: collection symbol
+
+        error: exception of last update
+        """
+        self.symbol = symbol
+        self.error = error
+        super().__init__(f'{symbol} floor price is unknown: {error}')
+
+
+class ListingBook:
+    def __init__(self):
+        """
+        Collection listings sorted by price.
+        Snapshot holds cheapest listings up to horizon price, listings above horizon are not known,
+        so floor is valid only while the cheapest listing is not above horizon
+        """
+        self._prices = {}  # mint: price
+        self._sorted = []  # (price, mint)
+        self.horizon = None
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def snapshot(self, listings: list[dict], complete: bool):
+        """
+        Replace book with listings
+
+        :param listings: cheapest listings
+        :param complete: listings are all collection listings
+        """
+        self._prices = {}
+        self._sorted = []
+        for listing in listings:
+            self.add(mint_of(listing), listing.get('price'))
+        if complete or not self._sorted:
+            self.horizon = float('inf')
+        else:
+            self.horizon = self._sorted[-1][0]
+
+    def add(self, mint: str, price: float):
+        if mint is None or price is None:
+            return
+        self.remove(mint)
+        self._prices[mint] = price
+        bisect.insort(self._sorted, (price, mint))
+
+    def remove(self, mint: str):
+        price = self._prices.pop(mint, None)
+        if price is None:
+            return
+        i = bisect.bisect_left(self._sorted, (price, mint))
+        del self._sorted[i]
+
+    def apply(self, activity: dict):
+        """
+        Update book with list / delist / sale activity
+        """
+        tx_type = activity.get('txType')
+        if tx_type in LIST_TX_TYPES:
+            self.add(mint_of(activity), activity.get('price'))
+        elif tx_type in DELIST_TX_TYPES or tx_type in SOLD_TX_TYPES:
+            self.remove(mint_of(activity))
+
+    @property
+    def valid(self) -> bool:
+        if self.horizon is None:
+            return False
+        if not self._sorted:
+            return self.horizon == float('inf')
+        return self._sorted[0][0] <= self.horizon
+
+    @property
+    def floor(self) -> float:
+        """
+        Cheapest listing price. None - no listings
+        """
+        if not self._sorted:
+            return None
+        return self._sorted[0][0]
+
+
+class FloorTracker:
+    def __init__(self, parser, symbols: list = (), max_age: float = 60, depth: int = 20, page_size: int = 50,
+                 max_pages: int = 4, max_workers: int = 8, tolerance: float = 1e-6):
+        """
+        Floor prices of many collections from memory.
+
+        Every collection has listing book updated with list / delist / sale activities.
+        refresh() checks books with bulk collection stats (one request per ~50 collections),
+        only collections with different floor load new activities, and only books that still differ
+        are loaded again with get_listed_nfts
+
+        tracker = FloorTracker(mp, ['degods', 'okay_bears'], max_age=60)
+        threading.Thread(target=tracker.run, daemon=True).start()
+        tracker.floor('degods')
+
+
+        parser: MagicParser
+
+        symbols: collections to track
+
+        max_age: max seconds since last check of floor price
+
+        depth: listings per snapshot
+
+        page_size: activities per request
+
+        max_pages: max activities requests per collection refresh, snapshot is loaded after
+
+        max_workers: max parallel requests
+
+        tolerance: max difference between book and stats floor, SOL
+        """
+        self.parser = parser
+        self.max_age = max_age
+        self.depth = depth
+        self.max_pages = max_pages
+        self.max_workers = max_workers
+        self.tolerance = tolerance
+
+        self.books = {}  # symbol: ListingBook
+        self.updated = {}  # symbol: last successful check time
+        self.errors = {}  # symbol: exception of last failed update
+
+        self._sync = ActivitySync(parser, page_size=page_size, max_pages=max_pages)
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+        if symbols:
+            self.track(symbols)
+
+    def track(self, symbols: list):
+        """
+        Start tracking collections. Loads snapshot of every new collection
+
+        :param symbols: collection symbols
+        """
+        with self._lock:
+            symbols = [symbol for symbol in symbols if symbol not in self.books]
+            for symbol in symbols:
+                self.books[symbol] = ListingBook()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(self._start, symbols))
+
+    def untrack(self, symbol: str):
+        with self._lock:
+            self.books.pop(symbol, None)
+            self.updated.pop(symbol, None)
+            self.errors.pop(symbol, None)
+        self._sync.reset(self._sync_key(symbol))
+
+    def floor(self, symbol: str, max_age: float = None, stale: bool = False) -> float:
+        """
+        Floor price from memory. Collection is refreshed when last check is older than max_age
+
+        :param symbol: collection symbol. Not tracked collection is tracked from now
+        :param max_age: max seconds since last check. None - tracker max_age
+        :param stale: return last known floor when refresh failed instead of raising FloorError
+        :return: floor price SOL. None - no listings
+        """
+        if symbol not in self.books:
+            self.track([symbol])
+
+        max_age = self.max_age if max_age is None else max_age
+        if time.time() - self.updated.get(symbol, 0) > max_age:
+            self.refresh([symbol])
+
+        with self._lock:
+            book = self.books[symbol]
+            error = self.errors.get(symbol)
+            # book without snapshot knows nothing, even with stale=True
+            if error is not None and (not stale or book.horizon is None):
+                raise FloorError(symbol, error)
+            return book.floor
+
+    def floors(self, max_age: float = None) -> dict:
+        """
+        Floor prices of all tracked collections. Collections with failed update are not included,
+        their errors are in tracker.errors
+
+        :param max_age: max seconds since last check. None - tracker max_age
+        :return: {symbol: floor price SOL}
+        """
+        max_age = self.max_age if max_age is None else max_age
+        now = time.time()
+        stale = [symbol for symbol in list(self.books) if now - self.updated.get(symbol, 0) > max_age]
+        if stale:
+            self.refresh(stale)
+
+        with self._lock:
+            return {symbol: book.floor for symbol, book in self.books.items() if symbol not in self.errors}
+
+    def refresh(self, symbols: list = None) -> dict:
+        """
+        Check floor prices with bulk stats and update books that differ
+
+        :param symbols: collection symbols. None - all tracked
+        :return: {symbol: floor price SOL} of changed floors
+        """
+        with self._refresh_lock:
+            if symbols is None:
+                symbols = list(self.books)
+            symbols = [symbol for symbol in symbols if symbol in self.books]
+            if not symbols:
+                return {}
+
+            with self._lock:
+                before = {symbol: self.books[symbol].floor for symbol in symbols}
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                stats_floors = get_floor_prices(self.parser, symbols, executor)
+
+                # collections missing in stats are checked with activities only, failed ones are updated again
+                drifted = [
+                    symbol for symbol in symbols
+                    if symbol not in stats_floors or symbol in self.errors
+                    or not self._matches(symbol, stats_floors[symbol])
+                ]
+                list(executor.map(lambda symbol: self._catch_up(symbol, stats_floors), drifted))
+
+            now = time.time()
+            changed = {}
+            with self._lock:
+                for symbol in symbols:
+                    # failed collection stays due for next refresh
+                    if symbol not in self.books or symbol in self.errors:
+                        continue
+                    self.updated[symbol] = now
+                    floor = self.books[symbol].floor
+                    if floor != before[symbol]:
+                        changed[symbol] = floor
+            return changed
+
+    def run(self, interval: float = None):
+        """
+        Refresh forever
+
+        :param interval: seconds between refreshes. None - max_age
+        """
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(e)
+            time.sleep(self.max_age if interval is None else interval)
+
+    def _sync_key(self, symbol):
+        return f"collection:{symbol}:{','.join(BOOK_TX_TYPES)}"
+
+    def _matches(self, symbol, stats_floor) -> bool:
+        with self._lock:
+            book = self.books.get(symbol)
+            if book is None:
+                return True
+            if not book.valid:
+                return False
+            floor = book.floor
+        if floor is None or stats_floor is None:
+            return floor is None and stats_floor is None
+        return abs(floor - stats_floor) <= self.tolerance
+
+    def _start(self, symbol):
+        # watermark first, activities between watermark and snapshot are applied twice without harm
+        try:
+            self._poll(symbol)
+            self._snapshot(symbol)
+        except Exception as e:
+            self._failed(symbol, e)
+        else:
+            self._succeeded(symbol)
+
+    def _failed(self, symbol, error):
+        logger.error(f'FloorTracker {symbol}: {error}')
+        with self._lock:
+            if symbol in self.books:
+                self.errors[symbol] = error
+
+    def _succeeded(self, symbol):
+        with self._lock:
+            self.errors.pop(symbol, None)
+
+    def _poll(self, symbol) -> list[dict]:
+        return self._sync.poll_collection(symbol, tx_types=BOOK_TX_TYPES)
+
+    def _snapshot(self, symbol):
+        listings = self.parser.get_listed_nfts(symbol, limit=self.depth)
+        with self._lock:
+            if symbol in self.books:
+                self.books[symbol].snapshot(listings, complete=len(listings) < self.depth)
+                self.updated[symbol] = time.time()
+
+    def _catch_up(self, symbol, stats_floors):
+        try:
+            activities = self._poll(symbol)
+            with self._lock:
+                book = self.books.get(symbol)
+                if book is None:
+                    return
+                for activity in activities:
+                    book.apply(activity)
+
+            if symbol in stats_floors:
+                drift = not self._matches(symbol, stats_floors[symbol])
+            else:
+                drift = not book.valid
+            overflow = len(activities) >= self._sync.page_size * self.max_pages
+            if overflow or drift:
+                self._snapshot(symbol)
+        except Exception as e:
+            self._failed(symbol, e)
+        else:
+            self._succeeded(symbol)
@@ -0,0 +1,248 @@
+import bisect
+import logging
+import threading
+from typing import NamedTuple
+from urllib.parse import urlsplit
+
+logger = logging.getLogger('MagicParser')
+
+HTTP = 'http'  # one http attempt
+DRIVER = 'driver'  # Chrome fallback request
+RETRY = 'retry'  # wait before next attempt
+
+# latency histogram upper bounds, seconds
+DEFAULT_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf'))
+
+
+class RequestEvent(NamedTuple):
+    endpoint: str
+    url: str
+    kind: str  # http | driver | retry
+    seconds: float
+    status: int = None
+    size: int = 0
+    attempt: int = 0
+    error: str = None
+    started: float = None  # unix time
+
+
+def endpoint_name(url) -> str:
+    """
+    Endpoints method name for Url, path for other urls
+    """
+    return getattr(url, 'name', None) or urlsplit(url).path
+
+
+class EndpointStats:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Counters of one endpoint
+        """
+        self.buckets = buckets
+        self.latency = [0] * len(buckets)  # http attempts count per bucket
+        self.requests = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.statuses = {}  # status: count, None - network error
+        self.retries = 0
+        self.retry_seconds = 0.0
+        self.fallbacks = 0
+        self.fallback_errors = 0
+        self.fallback_seconds = 0.0
+        self.fallback_latency = [0] * len(buckets)
+
+    def add(self, event: RequestEvent):
+        if event.kind == HTTP:
+            self.requests += 1
+            self.seconds += event.seconds
+            self.bytes += event.size
+            self.statuses[event.status] = self.statuses.get(event.status, 0) + 1
+            self.latency[bisect.bisect_left(self.buckets, event.seconds)] += 1
+        elif event.kind == RETRY:
+            self.retries += 1
+            self.retry_seconds += event.seconds
+        elif event.kind == DRIVER:
+            self.fallbacks += 1
+            self.fallback_seconds += event.seconds
+            self.bytes += event.size
+            self.fallback_latency[bisect.bisect_left(self.buckets, event.seconds)] += 1
+            if event.error is not None:
+                self.fallback_errors += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Latency quantile estimate, upper bound of histogram bucket
+
+        :param q: 0-1
+        :return: seconds. None - no requests
+        """
+        if not self.requests:
+            return None
+        rank = q * self.requests
+        total = 0
+        for bound, count in zip(self.buckets, self.latency):
+            total += count
+            if total >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            'requests': self.requests,
+            'seconds': self.seconds,
+            'bytes': self.bytes,
+            'statuses': dict(self.statuses),
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'latency_buckets': dict(zip(self.buckets, self.latency)),
+            'retries': self.retries,
+            'retry_seconds': self.retry_seconds,
+            'fallbacks': self.fallbacks,
+            'fallback_errors': self.fallback_errors,
+            'fallback_seconds': self.fallback_seconds,
+        }
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS, listeners=()):
+        """
+        Per endpoint request metrics. Pass to MagicParser(metrics=...), can be shared by many parsers
+
+        metrics = Metrics()
+        metrics.add_listener(lambda event: print(event.endpoint, event.seconds))
+        mp = MagicParser(metrics=metrics)
+        metrics.stats()['holders']['p99']
+
+
+        buckets: latency histogram upper bounds, seconds. Last one must be inf
+
+        listeners: callbacks called with every RequestEvent
+        """
+        self.buckets = tuple(buckets)
+        self.listeners = list(listeners)
+        self._endpoints = {}  # endpoint: EndpointStats
+        self._lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """
+        :param callback: function(RequestEvent). Called in request thread, must be fast
+        """
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+    def record(self, event: RequestEvent):
+        with self._lock:
+            stats = self._endpoints.get(event.endpoint)
+            if stats is None:
+                stats = self._endpoints[event.endpoint] = EndpointStats(self.buckets)
+            stats.add(event)
+
+        for callback in self.listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f'metrics listener: {e}')
+
+    def endpoint(self, name: str) -> EndpointStats:
+        return self._endpoints.get(name)
+
+    def stats(self) -> dict:
+        """
+        :return: {endpoint: counters dict}
+        """
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._endpoints.items()}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+class PrometheusExporter:
+    def __init__(self, metrics: Metrics, registry=None, prefix: str = 'magiceden'):
+        """
+        Export events to prometheus_client metrics, pip install magiceden_api_parser[prometheus]
+
+        PrometheusExporter(metrics)
+        prometheus_client.start_http_server(8000)
+
+
+        metrics: Metrics
+
+        registry: prometheus CollectorRegistry. None - default registry
+
+        prefix: metric names prefix
+        """
+        from prometheus_client import Counter, Histogram, REGISTRY
+
+        registry = registry if registry is not None else REGISTRY
+        self.latency = Histogram(
+            f'{prefix}_request_seconds', 'HTTP request latency', ['endpoint'],
+            buckets=metrics.buckets, registry=registry
+        )
+        self.responses = Counter(
+            f'{prefix}_responses_total', 'HTTP responses by status', ['endpoint', 'status'], registry=registry
+        )
+        self.bytes = Counter(f'{prefix}_response_bytes_total', 'Response bytes', ['endpoint'], registry=registry)
+        self.retries = Counter(f'{prefix}_retries_total', 'Retried requests', ['endpoint'], registry=registry)
+        self.retry_seconds = Counter(
+            f'{prefix}_retry_wait_seconds_total', 'Seconds waited before retries', ['endpoint'], registry=registry
+        )
+        self.fallbacks = Histogram(
+            f'{prefix}_fallback_seconds', 'Chrome fallback latency', ['endpoint', 'result'],
+            buckets=metrics.buckets, registry=registry
+        )
+        metrics.add_listener(self)
+
+    def __call__(self, event: RequestEvent):
+        if event.kind == HTTP:
+            self.latency.labels(event.endpoint).observe(event.seconds)
+            self.responses.labels(event.endpoint, str(event.status or 'error')).inc()
+            self.bytes.labels(event.endpoint).inc(event.size)
+        elif event.kind == RETRY:
+            self.retries.labels(event.endpoint).inc()
+            self.retry_seconds.labels(event.endpoint).inc(event.seconds)
+        elif event.kind == DRIVER:
+            result = 'ok' if event.error is None else 'error'
+            self.fallbacks.labels(event.endpoint, result).observe(event.seconds)
+            self.bytes.labels(event.endpoint).inc(event.size)
+
+
+class OpenTelemetryTracer:
+    def __init__(self, metrics: Metrics, tracer=None):
+        """
+        Export http and fallback requests as OpenTelemetry spans, pip install magiceden_api_parser[otel]
+
+
+        metrics: Metrics
+
+        tracer: opentelemetry Tracer. None - trace.get_tracer('magiceden_api')
+        """
+        from opentelemetry import trace
+
+        self._status = trace.Status
+        self._status_code = trace.StatusCode
+        self.tracer = tracer if tracer is not None else trace.get_tracer('magiceden_api')
+        metrics.add_listener(self)
+
+    def __call__(self, event: RequestEvent):
+        if event.kind == RETRY:
+            return
+
+        end = int((event.started + event.seconds) * 1e9)
+        span = self.tracer.start_span(
+            f'{event.kind} {event.endpoint}',
+            start_time=int(event.started * 1e9),
+            attributes={
+                'http.url': event.url,
+                'http.status_code': event.status or 0,
+                'http.response_content_length': event.size,
+                'magiceden.endpoint': event.endpoint,
+                'magiceden.attempt': event.attempt,
+            }
+        )
+        if event.error is not None:
+            span.set_status(self._status(self._status_code.ERROR, event.error))
+        span.end(end_time=end)
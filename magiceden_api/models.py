@@ -0,0 +1,209 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict, fields
+
+LAMPORTS_PER_SOL = 10 ** 9
+
+
+def lamports_to_sol(value) -> float:
+    """
+    Convert lamports to SOL
+
+    :param value: lamports or None
+    :return: SOL or None
+    """
+    if value is None:
+        return None
+    return value / LAMPORTS_PER_SOL
+
+
+def _first(data: dict, *keys, default=None):
+    for key in keys:
+        value = data.get(key)
+        if value is not None:
+            return value
+    return default
+
+
+class Model(ABC):
+    __slots__ = ('raw',)  # api dict the model was made from
+
+    @classmethod
+    @abstractmethod
+    def from_dict(cls, data: dict):
+        pass
+
+    def to_dict(self) -> dict:
+        """
+        :return: api dict the model was made from, so Model.from_dict(model.to_dict()) == model.
+            Model created without from_dict - dict of model fields
+        """
+        raw = getattr(self, 'raw', None)
+        if raw is None:
+            return self.fields_dict()
+        return raw
+
+    def fields_dict(self) -> dict:
+        """
+        :return: dict of model fields, snake_case keys
+        """
+        return asdict(self)
+
+    def _with_raw(self, data: dict):
+        self.raw = data
+        return self
+
+    @classmethod
+    def field_names(cls) -> list[str]:
+        return [f.name for f in fields(cls)]
+
+
+@dataclass
+class Listing(Model):
+    __slots__ = ('mint', 'price', 'seller', 'collection_symbol', 'title', 'image')
+
+    mint: str
+    price: float  # SOL
+    seller: str
+    collection_symbol: str
+    title: str
+    image: str
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            mint=_first(data, 'tokenMint', 'mintAddress'),
+            price=data.get('price'),
+            seller=_first(data, 'seller', 'owner'),
+            collection_symbol=_first(data, 'collectionSymbol', 'collectionName'),
+            title=_first(data, 'title', 'name'),
+            image=_first(data, 'img', 'image')
+        )._with_raw(data)
+
+
+@dataclass
+class Activity(Model):
+    __slots__ = ('signature', 'tx_type', 'block_time', 'price', 'buyer', 'seller', 'mint', 'collection_symbol')
+
+    signature: str
+    tx_type: str
+    block_time: int
+    price: float  # SOL
+    buyer: str
+    seller: str
+    mint: str
+    collection_symbol: str
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        price = lamports_to_sol((data.get('parsedTransaction') or {}).get('total_amount'))
+        if price is None:
+            price = data.get('price')
+
+        return cls(
+            signature=data.get('signature'),
+            tx_type=_first(data, 'txType', 'type'),
+            block_time=data.get('blockTime'),
+            price=price,
+            buyer=_first(data, 'buyer_address', 'buyer'),
+            seller=_first(data, 'seller_address', 'seller'),
+            mint=_first(data, 'mint', 'tokenMint'),
+            collection_symbol=_first(data, 'collection_symbol', 'collectionSymbol', 'collection')
+        )._with_raw(data)
+
+
+@dataclass
+class Holder(Model):
+    __slots__ = ('owner', 'tokens', 'buy_volume_7d', 'buy_count_7d')
+
+    owner: str
+    tokens: int
+    buy_volume_7d: float  # SOL
+    buy_count_7d: int
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        buy7d = data.get('buy7d') or {}
+        return cls(
+            owner=data.get('owner'),
+            tokens=data.get('tokens'),
+            buy_volume_7d=lamports_to_sol(buy7d.get('volume')),
+            buy_count_7d=buy7d.get('count')
+        )._with_raw(data)
+
+
+@dataclass
+class PopularCollection(Model):
+    __slots__ = ('symbol', 'name', 'image', 'floor_price', 'volume', 'total_volume', 'listed_count')
+
+    symbol: str
+    name: str
+    image: str
+    floor_price: float  # SOL
+    volume: float  # SOL per period
+    total_volume: float  # SOL
+    listed_count: int
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            symbol=_first(data, 'collectionSymbol', 'symbol'),
+            name=data.get('name'),
+            image=data.get('image'),
+            floor_price=lamports_to_sol(data.get('fp')),
+            volume=lamports_to_sol(data.get('vol')),
+            total_volume=lamports_to_sol(data.get('totalVol')),
+            listed_count=data.get('listedCount')
+        )._with_raw(data)
+
+
+@dataclass
+class Collection(Model):
+    __slots__ = ('symbol', 'name', 'description', 'image', 'categories', 'total_items', 'twitter', 'discord',
+                 'created_at')
+
+    symbol: str
+    name: str
+    description: str
+    image: str
+    categories: list
+    total_items: int
+    twitter: str
+    discord: str
+    created_at: str
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            symbol=data.get('symbol'),
+            name=data.get('name'),
+            description=data.get('description'),
+            image=data.get('image'),
+            categories=[c for c in data.get('categories') or [] if c is not None],
+            total_items=data.get('totalItems'),
+            twitter=data.get('twitter'),
+            discord=data.get('discord'),
+            created_at=data.get('createdAt')
+        )._with_raw(data)
+
+
+def iter_models(items, model):
+    """
+    Lazy convert raw dicts to models
+
+    :param items: iterable of dicts
+    :param model: Model class
+    :return: models generator
+    """
+    for item in items:
+        yield model.from_dict(item)
+
+
+def to_models(items, model) -> list:
+    """
+    Convert raw dicts to models
+
+    :param items: iterable of dicts
+    :param model: Model class
+    :return: list of models
+    """
+    return [model.from_dict(item) for item in items]
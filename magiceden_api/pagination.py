@@ -0,0 +1,55 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def paginate(fetch_page, page_size: int, offset: int = 0, max_items: int = None, timeout: float = None,
+             stop_when=None, prefetch: bool = False):
+    """
+    Walk offset/limit endpoint page by page. Only current and next page are kept in memory
+
+    for item in paginate(lambda offset, limit: mp.get_drops(limit, offset), page_size=500):
+        ...
+
+    :param fetch_page: function(offset, limit) -> list of items
+    :param page_size: items per request
+    :param offset: first item offset
+    :param max_items: stop after this count of items. None - no limit
+    :param timeout: stop after this count of seconds. None - no limit
+    :param stop_when: function(item) -> bool. Stop on first item matched, item is not returned
+    :param prefetch: load next page in background thread while current page is processed
+    :return: items generator
+    """
+    started = time.monotonic()
+    count = 0
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    next_page = None
+
+    try:
+        while True:
+            if next_page is not None:
+                page = next_page.result()
+            else:
+                page = fetch_page(offset, page_size)
+
+            has_next = len(page) >= page_size
+            next_page = None
+            if has_next and executor is not None and (max_items is None or count + len(page) < max_items):
+                next_page = executor.submit(fetch_page, offset + page_size, page_size)
+
+            for item in page:
+                if max_items is not None and count >= max_items:
+                    return
+                if timeout is not None and time.monotonic() - started > timeout:
+                    return
+                if stop_when is not None and stop_when(item):
+                    return
+
+                count += 1
+                yield item
+
+            if not has_next or (max_items is not None and count >= max_items):
+                return
+            offset += page_size
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,176 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from magiceden_api.batching import chunk_symbols, index_by_symbol
+from magiceden_api.models import lamports_to_sol
+
+logger = logging.getLogger('MagicParser')
+
+# portfolio part: (parser method, args after wallet)
+WALLET_CALLS = {
+    'owned': ('get_nfts_by_owner', ()),
+    'escrow': ('get_nfts_by_escrow_owner', ()),
+    'listings': ('get_user_listings', ()),
+    'bids_received': ('get_biddings_by_query', ('initializerKey',)),
+    'bids_placed': ('get_biddings_by_query', ('bidderPubkey',)),
+    'offers': ('get_offers_received', ()),
+    'user': ('get_user_info', ()),
+}
+
+MINT_KEYS = ('mintAddress', 'tokenMint', 'mint', 'tokenAddress')
+COLLECTION_KEYS = ('collectionSymbol', 'collection_symbol', 'collection')
+
+
+def _get(item: dict, keys):
+    for key in keys:
+        if item.get(key) is not None:
+            return item[key]
+    return None
+
+
+def mint_of(item: dict) -> str:
+    return _get(item, MINT_KEYS)
+
+
+def collection_of(item: dict) -> str:
+    return _get(item, COLLECTION_KEYS)
+
+
+def _call(parser, wallet, name):
+    method, args = WALLET_CALLS[name]
+    return getattr(parser, method)(wallet, *args)
+
+
+def _empty(name):
+    return {} if name == 'user' else []
+
+
+def build_portfolio(wallet: str, parts: dict, floors: dict, errors: dict = None) -> dict:
+    """
+    Join wallet calls results by mint address. Items without mint address can't be joined,
+    every such item is a separate nft with key '<part>:<index>' and mint None
+
+    :param wallet: wallet address
+    :param parts: {part name: call result} for WALLET_CALLS
+    :param floors: {collection symbol: floor price SOL}
+    :param errors: {part name: exception} of failed parts, their results are empty
+    :return: portfolio dict
+    """
+    nfts = {}
+
+    def nft(item, name, index):
+        mint = mint_of(item)
+        key = mint if mint is not None else f'{name}:{index}'
+        if key not in nfts:
+            collection = collection_of(item)
+            nfts[key] = {
+                'mint': mint,
+                'collection': collection,
+                'floor_price': floors.get(collection),
+                'owned': False,
+                'in_escrow': False,
+                'listing': None,
+                'bids': [],
+                'offers': [],
+                'data': item
+            }
+        return nfts[key]
+
+    for i, item in enumerate(parts['owned']):
+        nft(item, 'owned', i)['owned'] = True
+    for i, item in enumerate(parts['escrow']):
+        nft(item, 'escrow', i)['in_escrow'] = True
+    for i, item in enumerate(parts['listings']):
+        nft(item, 'listings', i)['listing'] = item
+    for item in parts['bids_received']:
+        if mint_of(item) in nfts:
+            nfts[mint_of(item)]['bids'].append(item)
+    for item in parts['offers']:
+        if mint_of(item) in nfts:
+            nfts[mint_of(item)]['offers'].append(item)
+
+    collections = {}
+    for item in nfts.values():
+        stats = collections.setdefault(item['collection'], {'count': 0, 'floor_price': item['floor_price']})
+        stats['count'] += 1
+
+    return {
+        'wallet': wallet,
+        'user': parts['user'],
+        'nfts': nfts,
+        'collections': collections,
+        'bids_placed': parts['bids_placed'],
+        'floor_value': sum(item['floor_price'] or 0 for item in nfts.values()),
+        'errors': dict(errors or {})
+    }
+
+
+def get_floor_prices(parser, symbols, executor=None, errors: dict = None) -> dict:
+    """
+    Floor prices with bulk collection stats requests
+
+    :param parser: MagicParser
+    :param symbols: collection symbols
+    :param executor: ThreadPoolExecutor for parallel chunks
+    :param errors: dict to put {symbol: exception} of failed chunks to. None - failed chunks are only logged
+    :return: {symbol: floor price SOL}
+    """
+    symbols = sorted(s for s in set(symbols) if s)
+    chunks = chunk_symbols(symbols, parser.endpoints.multi_collection_stats)
+
+    def load(chunk):
+        try:
+            return index_by_symbol(parser.get_multi_collection_stats(chunk))
+        except Exception as e:
+            logger.error(f'get_multi_collection_stats: {e}')
+            if errors is not None:
+                errors.update(dict.fromkeys(chunk, e))
+            return {}
+
+    results = executor.map(load, chunks) if executor is not None else map(load, chunks)
+    floors = {}
+    for stats in results:
+        for symbol, item in stats.items():
+            floors[symbol] = lamports_to_sol(item.get('floorPrice'))
+    return floors
+
+
+def get_wallet_portfolios(parser, wallets: list, max_workers: int = 16) -> dict:
+    """
+    Load portfolios of many wallets. All calls run concurrently.
+    Failed calls don't fail portfolio: their parts are empty and portfolio['errors'] is
+    {part name: exception}, failed floor prices are in portfolio['errors']['floor_prices'] as {symbol: exception}
+
+    :param parser: MagicParser
+    :param wallets: wallet addresses
+    :param max_workers: max parallel requests
+    :return: {wallet: portfolio}
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            wallet: {name: executor.submit(_call, parser, wallet, name) for name in WALLET_CALLS}
+            for wallet in wallets
+        }
+        parts = {wallet: {} for wallet in wallets}
+        errors = {wallet: {} for wallet in wallets}
+        for wallet, calls in futures.items():
+            for name, future in calls.items():
+                try:
+                    parts[wallet][name] = future.result()
+                except Exception as e:
+                    logger.error(f'{WALLET_CALLS[name][0]}({wallet}): {e}')
+                    parts[wallet][name] = _empty(name)
+                    errors[wallet][name] = e
+
+        symbols = {wallet: set() for wallet in wallets}
+        for wallet, wallet_parts in parts.items():
+            for name in ('owned', 'escrow', 'listings'):
+                symbols[wallet].update(collection_of(item) for item in wallet_parts[name])
+        floor_errors = {}
+        floors = get_floor_prices(parser, set().union(*symbols.values()), executor, floor_errors)
+
+    for wallet in wallets:
+        failed = {symbol: floor_errors[symbol] for symbol in symbols[wallet] if symbol in floor_errors}
+        if failed:
+            errors[wallet]['floor_prices'] = failed
+    return {wallet: build_portfolio(wallet, parts[wallet], floors, errors[wallet]) for wallet in wallets}
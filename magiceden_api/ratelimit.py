@@ -0,0 +1,249 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+
+class RetryError(Exception):
+    def __init__(self, url, attempts, last_error=None):
+        """
+        Request failed after all retries
+
+        url: request url
+
+        attempts: attempts made
+
+        last_error: last exception or status code
+        """
+        self.url = url
+        self.attempts = attempts
+        self.last_error = last_error
+        super().__init__(f'{url} failed after {attempts} attempts: {last_error}')
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate: float = 10, capacity: float = None, min_rate: float = 0.5, max_rate: float = None,
+                 increase: float = 0.5, decrease: float = 0.5):
+        """
+        Adaptive token bucket. Rate goes down on throttling and slowly up on success (AIMD)
+
+
+        rate: requests per second
+
+        capacity: max burst. Default - rate
+
+        min_rate: rate limit on throttling
+
+        max_rate: rate limit on success. Default - rate
+
+        increase: rate added after every success
+
+        decrease: rate multiplier after throttling
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.increase = increase
+        self.decrease = decrease
+
+        self.tokens = self.capacity
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Take one token, block while bucket is empty
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1))
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 30):
+        """
+        Stop requests to host after failure_threshold failures in a row.
+        After reset_timeout one trial request is allowed
+
+
+        failure_threshold: failures in a row to open circuit
+
+        reset_timeout: seconds before trial request
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """
+        :return: closed | open | half_open
+        """
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def check(self, host: str = ''):
+        """
+        Raise CircuitOpenError if requests are not allowed
+        """
+        with self._lock:
+            state = self.state
+            if state == 'open':
+                raise CircuitOpenError(f'Circuit for {host} is open after {self.failures} failures')
+            if state == 'half_open':
+                # one trial request, next requests wait for its result
+                self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = 5, backoff_base: float = 1, backoff_max: float = 60,
+                 jitter: bool = True):
+        """
+        Exponential backoff with full jitter
+
+
+        max_attempts: attempts per call
+
+        backoff_base: first retry delay
+
+        backoff_max: max retry delay
+
+        jitter: random delay in [0, backoff]
+        """
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.jitter = jitter
+
+    def delay(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Delay before next attempt
+
+        :param attempt: failed attempt number, from 0
+        :param retry_after: server Retry-After seconds
+        :return: seconds
+        """
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+
+def parse_retry_after(value: str) -> float:
+    """
+    Parse Retry-After header
+
+    :param value: seconds or http date
+    :return: seconds or None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    def __init__(self, rates: dict = None, default_rate: float = 10, failure_threshold: int = 10,
+                 reset_timeout: float = 30):
+        """
+        Token buckets and circuit breakers per host. Can be shared by many parsers and threads
+
+
+        rates: {host: requests per second}
+
+        default_rate: requests per second for other hosts
+
+        failure_threshold: failures in a row to stop requests to host
+
+        reset_timeout: seconds before trial request to stopped host
+        """
+        self.rates = rates or {}
+        self.default_rate = default_rate
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.buckets = {}
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rates.get(host, self.default_rate))
+            return self.buckets[host]
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[host]
+
+    def stats(self) -> dict:
+        """
+        Current limiter state
+
+        :return: {host: {rate, tokens, waited, circuit, failures}}
+        """
+        with self._lock:
+            hosts = set(self.buckets) | set(self.breakers)
+            return {
+                host: {
+                    'rate': self.buckets[host].rate if host in self.buckets else None,
+                    'tokens': self.buckets[host].tokens if host in self.buckets else None,
+                    'waited': self.buckets[host].waited if host in self.buckets else None,
+                    'circuit': self.breakers[host].state if host in self.breakers else None,
+                    'failures': self.breakers[host].failures if host in self.breakers else None,
+                } for host in hosts
+            }
@@ -0,0 +1,559 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+from magiceden_api.batching import chunk_symbols
+from magiceden_api.ratelimit import RateLimiter, TokenBucket
+
+logger = logging.getLogger('MagicParser')
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+LEASE_EXPIRED = 'lease expired'  # error of task whose worker died or hung
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    method TEXT NOT NULL,
+    args TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    lease_until REAL,
+    worker TEXT,
+    error TEXT,
+    result TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_tasks_ready ON tasks (status, priority DESC, id);
+"""
+
+BUDGET_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    rate REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class Task(NamedTuple):
+    id: int
+    method: str  # MagicParser method name
+    args: list
+    priority: int = 0
+    attempts: int = 0
+    key: str = None
+
+
+def task_key(method: str, args) -> str:
+    """
+    Dedup key of task, same method with same args is queued once
+    """
+    return f'{method}:{json.dumps(list(args), separators=(",", ":"), sort_keys=True)}'
+
+
+class _Database:
+    # sqlite connection per process and thread, so queue and budget can be passed to worker processes
+    def __init__(self, path: str, schema: str, timeout: float = 30):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self._local = threading.local()
+        self.connect()
+
+    def __getstate__(self):
+        return {'path': self.path, 'schema': self.schema, 'timeout': self.timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            local.conn.row_factory = sqlite3.Row
+            local.conn.execute('PRAGMA journal_mode=WAL')
+            local.conn.executescript(self.schema)
+            local.pid = os.getpid()
+        return local.conn
+
+    def transaction(self):
+        """
+        Write transaction, other processes wait for its end
+        """
+        return _Transaction(self.connect())
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class TaskQueue(ABC):
+    """
+    Work queue interface. Implement it to run workers on many nodes, e.g. over redis or a database server
+    """
+
+    @abstractmethod
+    def put(self, tasks: list, priority: int = 0) -> int:
+        """
+        :param tasks: list of (method, args)
+        :param priority: bigger - earlier
+        :return: new tasks count, duplicates are skipped
+        """
+
+    @abstractmethod
+    def get(self, worker: str = None) -> Task:
+        """
+        Take ready task with max priority. Task with expired lease counts as failed attempt
+
+        :param worker: worker id
+        :return: Task or None
+        """
+
+    @abstractmethod
+    def done(self, task: Task, result=None):
+        """
+        Mark task done. Raises TypeError or ValueError if result can't be saved
+        """
+
+    @abstractmethod
+    def fail(self, task: Task, error: str, retry: bool = True):
+        """
+        Requeue task with backoff or mark it failed after max attempts
+
+        :param retry: False - mark failed now, e.g. when next attempt fails the same way
+        """
+
+    @abstractmethod
+    def counts(self) -> dict:
+        """
+        :return: {status: tasks count}
+        """
+
+    def unfinished(self) -> int:
+        counts = self.counts()
+        return counts.get(PENDING, 0) + counts.get(RUNNING, 0)
+
+
+class SqliteQueue(TaskQueue):
+    def __init__(self, path: str = 'tasks.db', max_attempts: int = 3, retry_delay: float = 5,
+                 lease_timeout: float = 300, keep_results: bool = True):
+        """
+        Task queue in local sqlite file. Shared by worker processes of one node
+
+        queue = SqliteQueue('tasks.db')
+        queue.put([('get_holders', ['degods'])], priority=1)
+
+
+        path: database file
+
+        max_attempts: attempts per task
+
+        retry_delay: delay before second attempt, doubled every next attempt
+
+        lease_timeout: seconds before task of dead worker is taken by other worker, expired lease is an attempt
+
+        keep_results: save task results in queue
+        """
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_timeout = lease_timeout
+        self.keep_results = keep_results
+        self._db = _Database(path, QUEUE_SCHEMA)
+
+    @property
+    def path(self) -> str:
+        return self._db.path
+
+    def put(self, tasks: list, priority: int = 0) -> int:
+        now = time.time()
+        rows = [
+            (task_key(method, args), method, json.dumps(list(args)), priority, now)
+            for method, args in tasks
+        ]
+        with self._db.transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO tasks (key, method, args, priority, updated_at) VALUES (?, ?, ?, ?, ?)', rows
+            )
+            return conn.total_changes - before
+
+    def get(self, worker: str = None) -> Task:
+        now = time.time()
+        with self._db.transaction() as conn:
+            while True:
+                row = conn.execute(
+                    'SELECT id, method, args, priority, attempts, key, status FROM tasks '
+                    'WHERE (status = ? AND not_before <= ?) OR (status = ? AND lease_until < ?) '
+                    'ORDER BY priority DESC, id LIMIT 1',
+                    (PENDING, now, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                attempts = row['attempts']
+                if row['status'] == RUNNING:
+                    # worker died or hung, its attempt is spent
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        conn.execute(
+                            'UPDATE tasks SET status = ?, attempts = ?, error = ?, lease_until = NULL, updated_at = ? '
+                            'WHERE id = ?',
+                            (FAILED, attempts, LEASE_EXPIRED, now, row['id'])
+                        )
+                        continue
+                conn.execute(
+                    'UPDATE tasks SET status = ?, attempts = ?, lease_until = ?, worker = ?, updated_at = ? '
+                    'WHERE id = ?',
+                    (RUNNING, attempts, now + self.lease_timeout, worker, now, row['id'])
+                )
+                return Task(row['id'], row['method'], json.loads(row['args']), row['priority'], attempts, row['key'])
+
+    def done(self, task: Task, result=None):
+        result = json.dumps(result) if self.keep_results else None
+        with self._db.transaction() as conn:
+            conn.execute(
+                'UPDATE tasks SET status = ?, result = ?, error = NULL, lease_until = NULL, updated_at = ? '
+                'WHERE id = ?',
+                (DONE, result, time.time(), task.id)
+            )
+
+    def fail(self, task: Task, error: str, retry: bool = True):
+        attempts = task.attempts + 1
+        now = time.time()
+        status = PENDING if retry and attempts < self.max_attempts else FAILED
+        with self._db.transaction() as conn:
+            conn.execute(
+                'UPDATE tasks SET status = ?, attempts = ?, error = ?, not_before = ?, lease_until = NULL, '
+                'updated_at = ? WHERE id = ?',
+                (status, attempts, error, now + self.retry_delay * 2 ** task.attempts, now, task.id)
+            )
+
+    def counts(self) -> dict:
+        rows = self._db.connect().execute('SELECT status, COUNT(*) FROM tasks GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+    def results(self, method: str = None):
+        """
+        Results of done tasks
+
+        :param method: only tasks of method. None - all
+        :return: generator of (method, args, result)
+        """
+        query = 'SELECT method, args, result FROM tasks WHERE status = ?'
+        params = [DONE]
+        if method is not None:
+            query += ' AND method = ?'
+            params.append(method)
+        for row in self._db.connect().execute(query + ' ORDER BY id', params):
+            yield row['method'], json.loads(row['args']), json.loads(row['result']) if row['result'] else None
+
+    def failed(self) -> list[dict]:
+        """
+        :return: [{method, args, attempts, error}] of tasks failed after all attempts
+        """
+        rows = self._db.connect().execute(
+            'SELECT method, args, attempts, error FROM tasks WHERE status = ? ORDER BY id', (FAILED,)
+        ).fetchall()
+        return [dict(row, args=json.loads(row['args'])) for row in rows]
+
+    def retry_failed(self) -> int:
+        """
+        Move failed tasks back to queue
+
+        :return: tasks count
+        """
+        with self._db.transaction() as conn:
+            return conn.execute(
+                'UPDATE tasks SET status = ?, attempts = 0, not_before = 0 WHERE status = ?', (PENDING, FAILED)
+            ).rowcount
+
+    def clear(self):
+        with self._db.transaction() as conn:
+            conn.execute('DELETE FROM tasks')
+
+
+class SharedTokenBucket(TokenBucket):
+    def __init__(self, path: str, name: str, rate: float = 10, capacity: float = None, min_rate: float = 0.5,
+                 max_rate: float = None, increase: float = 0.5, decrease: float = 0.5):
+        """
+        Token bucket kept in sqlite file, so all processes of node share one request rate.
+        Throttling seen by one process slows down all of them
+
+
+        path: database file
+
+        name: bucket name, usually host
+        """
+        super().__init__(rate, capacity, min_rate, max_rate, increase, decrease)
+        self.name = name
+        self._db = _Database(path, BUDGET_SCHEMA)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _update(self, change):
+        # refill shared bucket, apply change(now) and save
+        with self._db.transaction() as conn:
+            now = time.time()
+            row = conn.execute('SELECT tokens, rate, updated FROM buckets WHERE name = ?', (self.name,)).fetchone()
+            if row is None:
+                self.tokens, self.rate = self.capacity, self.max_rate
+            else:
+                self.rate = row['rate']
+                self.tokens = min(self.capacity, row['tokens'] + max(0.0, now - row['updated']) * self.rate)
+            result = change()
+            conn.execute(
+                'INSERT OR REPLACE INTO buckets (name, tokens, rate, updated) VALUES (?, ?, ?, ?)',
+                (self.name, self.tokens, self.rate, now)
+            )
+        return result
+
+    def _take(self) -> float:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """
+        Take one token of shared bucket, block while bucket is empty
+        """
+        while True:
+            with self._lock:
+                wait = self._update(self._take)
+                if not wait:
+                    return
+                self.waited += wait
+            time.sleep(wait)
+
+    def on_success(self):
+        def increase():
+            self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1))
+
+        with self._lock:
+            if self.rate < self.max_rate:  # no write while budget is not throttled
+                self._update(increase)
+
+    def on_throttle(self):
+        def decrease():
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0)
+
+        with self._lock:
+            self._update(decrease)
+
+
+class SharedRateLimiter(RateLimiter):
+    def __init__(self, path: str = 'budget.db', rates: dict = None, default_rate: float = 10,
+                 failure_threshold: int = 10, reset_timeout: float = 30):
+        """
+        RateLimiter with token buckets shared by all processes through sqlite file.
+        Rates are global budget of all workers, not per worker
+
+        mp = MagicParser(rate_limiter=SharedRateLimiter('budget.db', default_rate=20))
+
+
+        path: database file
+        """
+        super().__init__(rates, default_rate, failure_threshold, reset_timeout)
+        self.path = path
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self.buckets:
+                self.buckets[host] = SharedTokenBucket(self.path, host, self.rates.get(host, self.default_rate))
+            return self.buckets[host]
+
+
+def collection_stats_tasks(parser, max_batch: int = 50) -> list[tuple]:
+    """
+    Split stats of all collections to getMultiCollectionEscrowStats tasks
+
+    :param parser: MagicParser
+    :param max_batch: max symbols per task
+    :return: list of (method, args)
+    """
+    symbols = [c['symbol'] for c in parser.get_all_collections() if c.get('symbol')]
+    chunks = chunk_symbols(symbols, parser.endpoints.multi_collection_stats, max_batch=max_batch)
+    return [('get_multi_collection_stats', [chunk]) for chunk in chunks]
+
+
+def top_holders_tasks(parser, top: int = 100, period: str = '1d') -> list[tuple]:
+    """
+    Holders tasks for top popular collections
+
+    :param parser: MagicParser
+    :param top: collections count
+    :param period: popular collections period
+    :return: list of (method, args)
+    """
+    collections = parser.get_popular_collections(limit=top, period=period)
+    return [('get_holders', [c['collectionSymbol']]) for c in collections[:top] if c.get('collectionSymbol')]
+
+
+def _default_parser(rate_limiter):
+    from magiceden_api import MagicParser
+
+    return MagicParser(rate_limiter=rate_limiter)
+
+
+class Scheduler:
+    def __init__(self, queue: TaskQueue = None, parser_factory=None, workers: int = 4, threads: int = 1,
+                 budget_path: str = 'budget.db', rates: dict = None, default_rate: float = 10,
+                 poll_interval: float = 0.5):
+        """
+        Run queued parser calls in worker processes. All workers share one rate budget,
+        so more workers give more throughput until budget is used
+
+        scheduler = Scheduler(SqliteQueue('tasks.db'), workers=8, default_rate=20)
+        scheduler.submit(top_holders_tasks(mp, top=500), priority=1)
+        scheduler.submit(collection_stats_tasks(mp))
+        scheduler.run()
+        for method, args, holders in scheduler.queue.results('get_holders'):
+            ...
+
+        On other nodes with own queue backend: Scheduler(queue, ...).run() or .work() in existing process
+
+
+        queue: TaskQueue. Default - SqliteQueue('tasks.db')
+
+        parser_factory: function(rate_limiter) -> MagicParser, called once in every worker process. Must be
+        picklable, e.g. module function or functools.partial(MagicParser, ...). Default - MagicParser
+
+        workers: worker processes
+
+        threads: threads per worker process, sharing one parser and its Chrome
+
+        budget_path: sqlite file of shared rate budget
+
+        rates: {host: requests per second} for all workers together
+
+        default_rate: requests per second for other hosts for all workers together
+
+        poll_interval: seconds between queue checks while tasks wait for retry or other workers
+        """
+        self.queue = queue if queue is not None else SqliteQueue()
+        self.parser_factory = parser_factory or _default_parser
+        self.workers = workers
+        self.threads = threads
+        self.budget_path = budget_path
+        self.rates = rates
+        self.default_rate = default_rate
+        self.poll_interval = poll_interval
+
+    def submit(self, tasks: list, priority: int = 0) -> int:
+        """
+        :param tasks: list of (method, args)
+        :param priority: bigger - earlier
+        :return: new tasks count
+        """
+        return self.queue.put(tasks, priority)
+
+    def rate_limiter(self) -> SharedRateLimiter:
+        return SharedRateLimiter(self.budget_path, self.rates, self.default_rate)
+
+    def run(self) -> dict:
+        """
+        Run worker processes until queue is empty
+
+        :return: {status: tasks count}
+        """
+        if self.workers <= 1:
+            self.work()
+            return self.queue.counts()
+
+        context = multiprocessing.get_context()
+        processes = [
+            context.Process(target=self.work, name=f'MagicWorker-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+        return self.queue.counts()
+
+    def work(self) -> int:
+        """
+        Run tasks in current process until queue is empty
+
+        :return: done tasks count
+        """
+        parser = self.parser_factory(rate_limiter=self.rate_limiter())
+        try:
+            if self.threads <= 1:
+                return self._work(parser, f'{os.getpid()}')
+
+            results = [0] * self.threads
+
+            def target(i):
+                results[i] = self._work(parser, f'{os.getpid()}-{i}')
+
+            threads = [threading.Thread(target=target, args=(i,)) for i in range(self.threads)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return sum(results)
+        finally:
+            parser.close()
+
+    def _work(self, parser, worker: str) -> int:
+        done = 0
+        while True:
+            task = self.queue.get(worker)
+            if task is None:
+                if not self.queue.unfinished():
+                    return done
+                time.sleep(self.poll_interval)
+                continue
+
+            try:
+                result = getattr(parser, task.method)(*task.args)
+            except Exception as e:
+                logger.error(f'task {task.method}{tuple(task.args)} failed: {e}')
+                self.queue.fail(task, f'{type(e).__name__}: {e}')
+                continue
+
+            try:
+                self.queue.done(task, result)
+            except (TypeError, ValueError) as e:
+                # result is not serializable, every attempt would end the same
+                logger.error(f'task {task.method}{tuple(task.args)} result is not saved: {e}')
+                self.queue.fail(task, f'result is not saved: {type(e).__name__}: {e}', retry=False)
+                continue
+            done += 1
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url) -> str:
+    """
+    Same key for urls that differ only by host case, default port or query params order
+
+    :param url: request url
+    :return: normalized url
+    """
+    parts = urlsplit(str(url))
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or '/', query, ''))
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Concurrent calls with same key share one call. All callers get its result or its error
+
+        flight = SingleFlight()
+        content = flight.do(normalize_url(url), fetch, url)
+        """
+        self.calls = 0  # calls made
+        self.shared = 0  # calls that got result of call in flight
+        self._flights = {}  # key: Future
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args):
+        """
+        Call fn(*args) or wait for result of the same call in flight
+
+        :param key: call key
+        :param fn: function
+        :return: fn result
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+class AsyncSingleFlight:
+    def __init__(self):
+        """
+        SingleFlight for coroutines of one event loop
+
+        content = await flight.do(normalize_url(url), fetch, url)
+        """
+        self.calls = 0
+        self.shared = 0
+        self._flights = {}  # key: Task
+
+    async def do(self, key, fn, *args):
+        """
+        Await fn(*args) or result of the same call in flight. Cancelled caller doesn't cancel shared call
+
+        :param key: call key
+        :param fn: coroutine function
+        :return: fn result
+        """
+        task = self._flights.get(key)
+        if task is None:
+            task = self._flights[key] = asyncio.ensure_future(fn(*args))
+
+            def land(done):
+                if self._flights.get(key) is done:
+                    del self._flights[key]
+
+            task.add_done_callback(land)
+            self.calls += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
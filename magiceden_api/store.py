@@ -0,0 +1,364 @@
+import json
+import time
+import sqlite3
+import threading
+from numbers import Number
+
+from magiceden_api.batching import chunk_symbols
+from magiceden_api.models import Activity, lamports_to_sol
+from magiceden_api.sync import ActivitySync
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    symbol TEXT PRIMARY KEY,
+    name TEXT,
+    updated_at REAL,
+    data TEXT
+);
+CREATE TABLE IF NOT EXISTS collection_stats (
+    symbol TEXT NOT NULL,
+    ts REAL NOT NULL,
+    floor_price REAL,
+    listed_count INTEGER,
+    volume REAL,
+    total_volume REAL,
+    PRIMARY KEY (symbol, ts)
+);
+CREATE INDEX IF NOT EXISTS ix_stats_ts ON collection_stats (ts);
+CREATE INDEX IF NOT EXISTS ix_stats_floor ON collection_stats (floor_price);
+CREATE TABLE IF NOT EXISTS activities (
+    signature TEXT PRIMARY KEY,
+    collection_symbol TEXT,
+    tx_type TEXT,
+    block_time INTEGER,
+    price REAL,
+    buyer TEXT,
+    seller TEXT,
+    mint TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_activities_symbol ON activities (collection_symbol, block_time);
+CREATE INDEX IF NOT EXISTS ix_activities_buyer ON activities (buyer, block_time);
+CREATE INDEX IF NOT EXISTS ix_activities_seller ON activities (seller, block_time);
+CREATE INDEX IF NOT EXISTS ix_activities_time ON activities (block_time);
+CREATE INDEX IF NOT EXISTS ix_activities_price ON activities (price);
+"""
+
+COLLECTION_ORDER = ('symbol', 'name', 'floor_price', 'listed_count', 'volume', 'total_volume', 'volume_growth', 'ts')
+ACTIVITY_ORDER = ('block_time', 'price', 'collection_symbol', 'tx_type')
+ACTIVITY_GROUPS = {
+    'collection': 'collection_symbol',
+    'buyer': 'buyer',
+    'seller': 'seller',
+    'tx_type': 'tx_type',
+    'day': 'CAST(block_time / 86400 AS INTEGER) * 86400',
+    'hour': 'CAST(block_time / 3600 AS INTEGER) * 3600',
+}
+
+
+def _number(data: dict, *keys):
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, Number):
+            return value
+    return None
+
+
+def stats_row(data: dict, ts: float) -> tuple:
+    """
+    Collection stats record from getMultiCollectionEscrowStats, popular collections or collection stats payload
+
+    :param data: payload record
+    :param ts: snapshot time
+    :return: (symbol, ts, floor_price, listed_count, volume, total_volume), prices in SOL
+    """
+    return (
+        data.get('symbol') or data.get('collectionSymbol'),
+        ts,
+        lamports_to_sol(_number(data, 'floorPrice', 'fp')),
+        _number(data, 'listedCount'),
+        lamports_to_sol(_number(data, 'volume24hr', 'vol', 'volume')),
+        lamports_to_sol(_number(data, 'volumeAll', 'totalVol')),
+    )
+
+
+class SnapshotStore:
+    def __init__(self, path: str = ':memory:'):
+        """
+        Local sqlite store of collections, collection stats history and activities.
+        Indexed by symbol, wallet, blockTime and price, so analytical queries don't need api sweeps
+
+        store = SnapshotStore('magiceden.db')
+        store.fill_collections(mp)
+        store.fill_activities(mp, ['degods'])
+        store.query_collections(min_floor=10, min_volume_growth=0.5)
+        store.query_activities(wallet=wallet, since=time.time() - 86400)
+
+
+        path: database file. ':memory:' - not saved
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._sync = None
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def sql(self, query: str, params=()) -> list[dict]:
+        """
+        Run any sql query
+
+        :param query: sql
+        :param params: query parameters
+        :return: list of rows
+        """
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def add_collections(self, collections: list[dict]) -> int:
+        """
+        Save collections info, for example get_all_collections() result
+
+        :param collections: list of collection dicts
+        :return: saved count
+        """
+        now = time.time()
+        rows = [
+            (c.get('symbol'), c.get('name'), now, json.dumps(c))
+            for c in collections if c.get('symbol')
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO collections (symbol, name, updated_at, data) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (symbol) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at, '
+                'data = excluded.data',
+                rows
+            )
+        return len(rows)
+
+    def add_stats(self, stats: list[dict], ts: float = None) -> int:
+        """
+        Save collection stats snapshot, for example get_multi_collection_stats() or get_popular_collections() result
+
+        :param stats: list of stats dicts
+        :param ts: snapshot time. None - now
+        :return: saved count
+        """
+        ts = time.time() if ts is None else ts
+        rows = [row for row in (stats_row(item, ts) for item in stats) if row[0]]
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO collection_stats VALUES (?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def add_activities(self, activities: list) -> int:
+        """
+        Save activities. Already saved signatures are skipped
+
+        :param activities: list of activity dicts or Activity models
+        :return: new activities count
+        """
+        rows = []
+        for activity in activities:
+            if not isinstance(activity, Activity):
+                activity = Activity.from_dict(activity)
+            if activity.signature:
+                rows.append((
+                    activity.signature, activity.collection_symbol, activity.tx_type, activity.block_time,
+                    activity.price, activity.buyer, activity.seller, activity.mint
+                ))
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany('INSERT OR IGNORE INTO activities VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            return self._conn.total_changes - before
+
+    def fill_collections(self, parser, stats: bool = True) -> int:
+        """
+        Load all collections and their stats snapshot
+
+        :param parser: MagicParser
+        :param stats: load getMultiCollectionEscrowStats for all collections
+        :return: collections count
+        """
+        collections = parser.get_all_collections()
+        self.add_collections(collections)
+        if stats:
+            ts = time.time()
+            symbols = [c['symbol'] for c in collections if c.get('symbol')]
+            for chunk in chunk_symbols(symbols, parser.endpoints.multi_collection_stats):
+                self.add_stats(parser.get_multi_collection_stats(chunk), ts)
+        return len(collections)
+
+    def fill_activities(self, parser, symbols: list, sync: ActivitySync = None, tx_types=None) -> int:
+        """
+        Load new activities of collections since previous fill
+
+        :param parser: MagicParser
+        :param symbols: collection symbols
+        :param sync: ActivitySync with watermarks. None - new in-memory sync, first fill loads last page only
+        :param tx_types: activity types. None - sales
+        :return: new activities count
+        """
+        if sync is None:
+            if self._sync is None:
+                self._sync = ActivitySync(parser)
+            sync = self._sync
+        count = 0
+        for symbol in symbols:
+            count += self.add_activities(sync.poll_collection(symbol, tx_types=tx_types))
+        return count
+
+    def query_collections(self, symbols: list = None, min_floor: float = None, max_floor: float = None,
+                          min_listed: int = None, min_volume: float = None, min_volume_growth: float = None,
+                          period: float = 86400, order_by: str = 'floor_price', desc: bool = True,
+                          limit: int = None) -> list[dict]:
+        """
+        Collections by latest stats snapshot
+
+        :param symbols: only these symbols
+        :param min_floor: min floor price SOL
+        :param max_floor: max floor price SOL
+        :param min_listed: min listed count
+        :param min_volume: min volume SOL
+        :param min_volume_growth: min total volume growth over period, 0.5 - +50%
+        :param period: seconds for volume growth
+        :param order_by: symbol | name | floor_price | listed_count | volume | total_volume | volume_growth | ts
+        :param desc: descending order
+        :param limit: max rows
+        :return: list of rows
+        """
+        if order_by not in COLLECTION_ORDER:
+            raise ValueError(f"order_by available states {', '.join(COLLECTION_ORDER)}")
+
+        where, params = [], [time.time() - period]
+        if symbols is not None:
+            where.append(f"s.symbol IN ({', '.join('?' * len(symbols))})")
+            params.extend(symbols)
+        for condition, value in (('s.floor_price >= ?', min_floor), ('s.floor_price <= ?', max_floor),
+                                 ('s.listed_count >= ?', min_listed), ('s.volume >= ?', min_volume),
+                                 ('volume_growth >= ?', min_volume_growth)):
+            if value is not None:
+                where.append(condition)
+                params.append(value)
+
+        query = f"""
+            WITH latest AS (
+                SELECT symbol, MAX(ts) AS ts FROM collection_stats GROUP BY symbol
+            ), s AS (
+                SELECT collection_stats.* FROM collection_stats JOIN latest USING (symbol, ts)
+            )
+            SELECT s.symbol AS symbol, c.name AS name, s.ts AS ts, s.floor_price AS floor_price,
+                s.listed_count AS listed_count, s.volume AS volume, s.total_volume AS total_volume,
+                (s.total_volume - p.total_volume) / p.total_volume AS volume_growth
+            FROM s
+            LEFT JOIN collections c ON c.symbol = s.symbol
+            LEFT JOIN collection_stats p ON p.symbol = s.symbol AND p.ts = (
+                SELECT MAX(ts) FROM collection_stats WHERE symbol = s.symbol AND ts <= ?
+            )
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY {order_by} {'DESC' if desc else 'ASC'}
+            {'LIMIT ' + str(int(limit)) if limit is not None else ''}
+        """
+        return self.sql(query, params)
+
+    def stats_history(self, symbol: str, since: float = None) -> list[dict]:
+        """
+        Collection stats snapshots, oldest first
+
+        :param symbol: collection symbol
+        :param since: unix time. None - all
+        :return: list of rows
+        """
+        return self.sql(
+            'SELECT * FROM collection_stats WHERE symbol = ? AND ts >= ? ORDER BY ts',
+            (symbol, since or 0)
+        )
+
+    def _activity_filters(self, symbol, wallet, tx_types, since, until, min_price, max_price):
+        where, params = [], []
+        if symbol is not None:
+            where.append('collection_symbol = ?')
+            params.append(symbol)
+        if wallet is not None:
+            # OR of two indexed columns, sqlite uses both indexes
+            where.append('(buyer = ? OR seller = ?)')
+            params.extend((wallet, wallet))
+        if tx_types is not None:
+            where.append(f"tx_type IN ({', '.join('?' * len(tx_types))})")
+            params.extend(tx_types)
+        for condition, value in (('block_time >= ?', since), ('block_time < ?', until),
+                                 ('price >= ?', min_price), ('price <= ?', max_price)):
+            if value is not None:
+                where.append(condition)
+                params.append(value)
+        return ('WHERE ' + ' AND '.join(where)) if where else '', params
+
+    def query_activities(self, symbol: str = None, wallet: str = None, tx_types: list = None, since: float = None,
+                         until: float = None, min_price: float = None, max_price: float = None,
+                         order_by: str = 'block_time', desc: bool = True, limit: int = None) -> list[dict]:
+        """
+        Saved activities
+
+        :param symbol: collection symbol
+        :param wallet: buyer or seller wallet
+        :param tx_types: activity types
+        :param since: min blockTime
+        :param until: max blockTime, exclusive
+        :param min_price: min price SOL
+        :param max_price: max price SOL
+        :param order_by: block_time | price | collection_symbol | tx_type
+        :param desc: descending order
+        :param limit: max rows
+        :return: list of rows
+        """
+        if order_by not in ACTIVITY_ORDER:
+            raise ValueError(f"order_by available states {', '.join(ACTIVITY_ORDER)}")
+
+        where, params = self._activity_filters(symbol, wallet, tx_types, since, until, min_price, max_price)
+        query = f"""
+            SELECT * FROM activities {where}
+            ORDER BY {order_by} {'DESC' if desc else 'ASC'}
+            {'LIMIT ' + str(int(limit)) if limit is not None else ''}
+        """
+        return self.sql(query, params)
+
+    def aggregate_activities(self, group_by: str = 'collection', symbol: str = None, wallet: str = None,
+                             tx_types: list = None, since: float = None, until: float = None,
+                             min_price: float = None, max_price: float = None, limit: int = None) -> list[dict]:
+        """
+        Activities count and volume per group, biggest volume first
+
+        :param group_by: collection | buyer | seller | tx_type | day | hour
+        :param symbol: collection symbol
+        :param wallet: buyer or seller wallet
+        :param tx_types: activity types
+        :param since: min blockTime
+        :param until: max blockTime, exclusive
+        :param min_price: min price SOL
+        :param max_price: max price SOL
+        :param limit: max rows
+        :return: list of {key, count, volume, avg_price, min_price, max_price}
+        """
+        if group_by not in ACTIVITY_GROUPS:
+            raise ValueError(f"group_by available states {', '.join(ACTIVITY_GROUPS)}")
+
+        where, params = self._activity_filters(symbol, wallet, tx_types, since, until, min_price, max_price)
+        query = f"""
+            SELECT {ACTIVITY_GROUPS[group_by]} AS key, COUNT(*) AS count, SUM(price) AS volume,
+                AVG(price) AS avg_price, MIN(price) AS min_price, MAX(price) AS max_price
+            FROM activities {where}
+            GROUP BY key
+            ORDER BY volume DESC
+            {'LIMIT ' + str(int(limit)) if limit is not None else ''}
+        """
+        return self.sql(query, params)
@@ -0,0 +1,215 @@
+import os
+import json
+import logging
+import threading
+from collections import deque
+
+from magiceden_api.pagination import paginate
+
+logger = logging.getLogger('MagicParser')
+
+
+def activity_key(activity: dict) -> str:
+    """
+    Dedup key of activity. Activities without signature are keyed by blockTime, mint and type
+
+    :param activity: activity dict
+    :return: key
+    """
+    signature = activity.get('signature')
+    if signature:
+        return signature
+    tx_type = activity.get('txType') or activity.get('type')
+    return f"{activity.get('blockTime')}:{activity.get('tokenMint')}:{tx_type}"
+
+
+class SeenSet:
+    def __init__(self, maxsize: int = 1000, items=()):
+        """
+        Set of last maxsize items. Oldest items are forgotten first
+
+        maxsize: max items count
+        """
+        self.maxsize = maxsize
+        self._order = deque()
+        self._items = set()
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def add(self, item):
+        if item in self._items:
+            return
+        self._order.append(item)
+        self._items.add(item)
+        while len(self._order) > self.maxsize:
+            self._items.discard(self._order.popleft())
+
+
+class ActivitySync:
+    def __init__(self, parser, state_path: str = None, page_size: int = 50, seen_size: int = 1000,
+                 max_pages: int = 20):
+        """
+        Incremental activity sync. Every poll returns only activities newer than the last poll
+
+        sync = ActivitySync(mp, state_path='activity_state.json')
+        while True:
+            for activity in sync.poll_collection('degods'):
+                ...
+
+
+        parser: MagicParser
+
+        state_path: json file for watermarks. None - keep state in memory only
+
+        page_size: activities per request
+
+        seen_size: signatures count remembered for dedup per collection or wallet
+
+        max_pages: max requests per poll. If watermark is not reached within max_pages, a warning is logged
+        and older new activities are skipped
+        """
+        self.parser = parser
+        self.state_path = state_path
+        self.page_size = page_size
+        self.seen_size = seen_size
+        self.max_pages = max_pages
+
+        self.watermarks = {}  # key: {'blockTime': int, 'signature': str}
+        self._seen = {}  # key: SeenSet
+        self._lock = threading.Lock()
+
+        if state_path is not None and os.path.exists(state_path):
+            self.load()
+
+    def poll_collection(self, collection_symbol: str, tx_types=None) -> list[dict]:
+        """
+        Get new collection activities (exchange, acceptBid, auctionSettled)
+
+        :param collection_symbol:
+        :param tx_types: activity types. None - sales. Every tx_types set has its own watermark
+        :return: list of new activities, oldest first
+        """
+        if tx_types is None:
+            return self._poll(
+                f'collection:{collection_symbol}',
+                lambda offset, limit: self.parser.get_global_activities(collection_symbol, offset=offset, limit=limit)
+            )
+        return self._poll(
+            f"collection:{collection_symbol}:{','.join(tx_types)}",
+            lambda offset, limit: self.parser.get_global_activities(collection_symbol, offset=offset, limit=limit,
+                                                                    tx_types=tx_types)
+        )
+
+    def poll_wallet(self, holder_wallet: str) -> list[dict]:
+        """
+        Get new wallet activities
+
+        :param holder_wallet:
+        :return: list of new activities, oldest first
+        """
+        return self._poll(
+            f'wallet:{holder_wallet}',
+            lambda offset, limit: self.parser.get_user_activity(holder_wallet, offset=offset, limit=limit)
+        )
+
+    def reset(self, key: str = None):
+        """
+        Forget watermark. Next poll starts from the latest page
+
+        :param key: 'collection:<symbol>' | 'wallet:<address>'. None - all
+        """
+        with self._lock:
+            if key is None:
+                self.watermarks.clear()
+                self._seen.clear()
+            else:
+                self.watermarks.pop(key, None)
+                self._seen.pop(key, None)
+        self.save()
+
+    def _poll(self, key, fetch_page) -> list[dict]:
+        with self._lock:
+            mark = self.watermarks.get(key)
+            seen = self._seen.setdefault(key, SeenSet(self.seen_size))
+
+        reached = mark is None
+
+        def stop_when(activity):
+            nonlocal reached
+            if activity.get('blockTime', 0) < mark['blockTime']:
+                reached = True
+            return reached
+
+        if mark is None:
+            # first poll, start from the latest page
+            max_items = self.page_size
+            stop_when = None
+        else:
+            max_items = self.page_size * self.max_pages
+
+        new = []
+        polled = set()  # offsets may shift between pages of one poll
+        fetched = 0
+        for activity in paginate(fetch_page, self.page_size, max_items=max_items, stop_when=stop_when):
+            fetched += 1
+            activity_id = activity_key(activity)
+            if activity_id in seen or activity_id in polled:
+                continue
+            polled.add(activity_id)
+            new.append(activity)
+
+        if not reached and fetched >= max_items:
+            logger.warning(f'activity sync {key}: watermark not reached within {self.max_pages} pages, '
+                           f'older new activities are skipped')
+
+        new.reverse()
+        with self._lock:
+            for activity in new:
+                seen.add(activity_key(activity))
+
+            if new:
+                latest = new[-1]
+                self.watermarks[key] = {'blockTime': latest.get('blockTime', 0), 'signature': latest.get('signature')}
+            elif mark is None:
+                self.watermarks[key] = {'blockTime': 0, 'signature': None}
+
+        self.save()
+        return new
+
+    def load(self):
+        """
+        Load watermarks and seen signatures from state_path
+        """
+        with open(self.state_path, 'r') as f:
+            state = json.load(f)
+
+        with self._lock:
+            self.watermarks = state.get('watermarks', {})
+            self._seen = {key: SeenSet(self.seen_size, items) for key, items in state.get('seen', {}).items()}
+
+    def save(self):
+        """
+        Save watermarks and seen signatures to state_path
+        """
+        if self.state_path is None:
+            return
+
+        with self._lock:
+            state = {
+                'watermarks': self.watermarks,
+                'seen': {key: list(seen) for key, seen in self._seen.items()}
+            }
+
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
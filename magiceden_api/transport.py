@@ -0,0 +1,223 @@
+import os
+import ssl
+import threading
+from http.client import HTTPMessage
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.certs import where as default_ca_bundle
+from requests.structures import CaseInsensitiveDict
+from requests.utils import select_proxy
+from urllib3.util import make_headers
+
+from magiceden_api.endpoints import API_HOST, STATS_HOST, BINANCE_HOST
+
+DEFAULT_HOSTS = (API_HOST, STATS_HOST, BINANCE_HOST)
+
+
+def accept_encoding() -> str:
+    """
+    Accept-Encoding with all installed decoders, gzip, deflate and br / zstd when brotli / zstandard are installed
+    """
+    return make_headers(accept_encoding=True)['accept-encoding']
+
+
+class _RawResponse:
+    # requests reads response cookies from raw._original_response.msg
+    def __init__(self, headers):
+        msg = HTTPMessage()
+        for key, value in headers.multi_items():
+            msg[key] = value
+        self._original_response = self
+        self.msg = msg
+
+    def close(self):
+        pass
+
+
+def ssl_context(verify=True, cert=None) -> ssl.SSLContext:
+    """
+    SSL context for requests verify and cert arguments
+
+    :param verify: True - requests CA bundle | False - no verification | path to CA bundle file or dir
+    :param cert: client certificate file or (cert, key) files
+    :return: ssl.SSLContext
+    """
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif isinstance(verify, str) and os.path.isdir(verify):
+        context = ssl.create_default_context(capath=verify)
+    else:
+        context = ssl.create_default_context(cafile=verify if isinstance(verify, str) else default_ca_bundle())
+
+    if cert is not None:
+        if isinstance(cert, str):
+            context.load_cert_chain(cert)
+        else:
+            context.load_cert_chain(*cert)
+    return context
+
+
+class HTTP2Adapter(BaseAdapter):
+    def __init__(self, max_connections: int = 16, max_keepalive: int = 16):
+        """
+        requests adapter sending requests with httpx HTTP/2 client. All requests to a host are multiplexed
+        over one connection. pip install magiceden_api_parser[http2]
+
+        verify, cert and proxies of session or request are applied, every combination of them
+        has own httpx client
+
+
+        max_connections: max connections per adapter
+
+        max_keepalive: max idle connections kept open
+        """
+        super().__init__()
+        import httpx
+
+        self._httpx = httpx
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self._clients = {}  # (verify, cert, proxy): httpx.Client
+        self._lock = threading.Lock()
+        self.client = self.get_client()
+
+    def get_client(self, verify=True, cert=None, proxy: str = None):
+        """
+        :param verify: requests verify argument
+        :param cert: requests cert argument
+        :param proxy: proxy url. None - direct connection
+        :return: httpx.Client for these settings
+        """
+        key = (verify, tuple(cert) if isinstance(cert, list) else cert, proxy)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                # session already merged environment proxies into proxies, httpx must not apply them again
+                client = self._clients[key] = self._httpx.Client(
+                    http2=True, limits=self._limits, follow_redirects=False, trust_env=False,
+                    verify=ssl_context(verify, key[1]), proxy=proxy
+                )
+            return client
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+        else:
+            connect = read = timeout
+        timeout = self._httpx.Timeout(read, connect=connect)
+        client = self.get_client(verify, cert, select_proxy(request.url, proxies) if proxies else None)
+
+        try:
+            r = client.request(
+                request.method, request.url, headers=dict(request.headers), content=request.body, timeout=timeout
+            )
+        except self._httpx.ConnectTimeout as e:
+            raise requests.ConnectTimeout(e, request=request)
+        except self._httpx.ReadTimeout as e:
+            raise requests.ReadTimeout(e, request=request)
+        except self._httpx.TransportError as e:
+            raise requests.ConnectionError(e, request=request)
+
+        response = requests.Response()
+        response.status_code = r.status_code
+        response.reason = r.reason_phrase
+        response.headers = CaseInsensitiveDict(r.headers.multi_items())
+        response.url = request.url
+        response.request = request
+        response.encoding = r.encoding
+        response.raw = _RawResponse(r.headers)
+        response._content = r.content
+        response._content_consumed = True
+        response.connection = self
+        response.http_version = r.http_version
+        return response
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+
+class Transport:
+    def __init__(self, pool_maxsize: int = 16, host_pools: dict = None, pool_block: bool = True,
+                 connect_timeout: float = 5, read_timeout: float = 30, compression: bool = True,
+                 http2: bool = False, http2_hosts: list = None):
+        """
+        Http session settings. Every api host gets own pool of keep-alive connections shared by all threads
+
+        mp = MagicParser(transport=Transport(pool_maxsize=8, read_timeout=20, http2=True))
+
+
+        pool_maxsize: max open connections per host
+
+        host_pools: {host url: pool_maxsize} for hosts that need other pool size
+
+        pool_block: wait for free connection when pool is full instead of opening extra connection
+
+        connect_timeout: seconds to connect
+
+        read_timeout: seconds to wait for response data
+
+        compression: send Accept-Encoding with all installed decoders (gzip, deflate, br, zstd)
+
+        http2: use HTTP/2 for all api hosts, needs httpx[http2]
+
+        http2_hosts: host urls to use HTTP/2 for
+        """
+        self.pool_maxsize = pool_maxsize
+        self.host_pools = {_prefix(host): size for host, size in (host_pools or {}).items()}
+        self.pool_block = pool_block
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.compression = compression
+        self.http2 = http2
+        self.http2_hosts = {_prefix(host) for host in http2_hosts or ()}
+
+    @property
+    def timeout(self) -> tuple:
+        """
+        (connect, read) timeout for requests
+        """
+        return self.connect_timeout, self.read_timeout
+
+    def session(self, hosts: list = DEFAULT_HOSTS) -> requests.Session:
+        """
+        New configured session. requests.Session with mounted adapters is safe to share between threads
+
+        :param hosts: api host urls
+        :return: requests.Session
+        """
+        session = requests.Session()
+        session.headers['Accept-Encoding'] = accept_encoding() if self.compression else 'identity'
+        session.headers['Connection'] = 'keep-alive'
+
+        default = HTTPAdapter(pool_maxsize=self.pool_maxsize, pool_block=self.pool_block)
+        session.mount('https://', default)
+        session.mount('http://', default)
+
+        # own adapter per host, so every host has own pool size and protocol
+        prefixes = [_prefix(host) for host in hosts]
+        for prefix in dict.fromkeys(prefixes + list(self.host_pools) + list(self.http2_hosts)):
+            session.mount(prefix, self.adapter(prefix, http2=self.http2 and prefix in prefixes))
+        return session
+
+    def adapter(self, host: str, http2: bool = False) -> BaseAdapter:
+        """
+        :param host: host url
+        :param http2: use HTTP/2 even if host is not in http2_hosts
+        :return: adapter for host
+        """
+        prefix = _prefix(host)
+        pool_maxsize = self.host_pools.get(prefix, self.pool_maxsize)
+        if http2 or prefix in self.http2_hosts:
+            return HTTP2Adapter(max_connections=pool_maxsize, max_keepalive=pool_maxsize)
+        return HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, pool_block=self.pool_block)
+
+
+def _prefix(host: str) -> str:
+    url = urlsplit(host if '://' in host else f'https://{host}')
+    return f'{url.scheme}://{url.netloc}/'
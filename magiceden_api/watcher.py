@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import NamedTuple
+
+logger = logging.getLogger('MagicParser')
+
+ADD = 'add'
+REMOVE = 'remove'
+CHANGE = 'change'
+
+
+class CollectionEvent(NamedTuple):
+    type: str  # add | remove | change
+    symbol: str
+    collection: dict  # None for removed collections
+
+
+def collection_digest(collection: dict) -> str:
+    """
+    Short hash of collection data
+
+    :param collection: collection dict
+    :return: hex digest
+    """
+    data = json.dumps(collection, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+class CollectionWatcher:
+    def __init__(self, parser, index_path: str = None, interval: float = 60, min_interval: float = 15,
+                 max_interval: float = 300, emit_initial: bool = False, on_add=None, on_remove=None, on_change=None):
+        """
+        Watch MagicEden for new, removed and changed collections
+
+        watcher = CollectionWatcher(mp, index_path='collections.json', on_add=print)
+        watcher.run()
+
+
+        parser: MagicParser
+
+        index_path: json file for symbols index. None - keep index in memory only
+
+        interval: first poll interval
+
+        min_interval: poll interval after changes
+
+        max_interval: poll interval limit without changes
+
+        emit_initial: emit 'add' for all collections on first poll with empty index
+
+        on_add, on_remove, on_change: callbacks function(CollectionEvent)
+        """
+        self.parser = parser
+        self.index_path = index_path
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.emit_initial = emit_initial
+        self.callbacks = {ADD: on_add, REMOVE: on_remove, CHANGE: on_change}
+
+        self.index = {}  # symbol: digest
+        self.validators = {}
+
+        if index_path is not None and os.path.exists(index_path):
+            self.load()
+
+    def poll(self) -> list[CollectionEvent]:
+        """
+        Load collections if modified and compare with index
+
+        :return: list of events
+        """
+        collections, self.validators = self.parser.get_all_collections_if_modified(self.validators)
+        if collections is None:
+            self._adapt_interval(False)
+            return []
+
+        initial = not self.index
+        index = {}
+        events = []
+        for collection in collections:
+            symbol = collection['symbol']
+            digest = collection_digest(collection)
+            index[symbol] = digest
+
+            old = self.index.get(symbol)
+            if old is None:
+                events.append(CollectionEvent(ADD, symbol, collection))
+            elif old != digest:
+                events.append(CollectionEvent(CHANGE, symbol, collection))
+
+        for symbol in self.index.keys() - index.keys():
+            events.append(CollectionEvent(REMOVE, symbol, None))
+
+        self.index = index
+        self.save()
+
+        if initial and not self.emit_initial:
+            events = []
+
+        self._adapt_interval(len(events) > 0)
+        for event in events:
+            callback = self.callbacks[event.type]
+            if callback is not None:
+                callback(event)
+
+        return events
+
+    def run(self):
+        """
+        Poll forever. Use callbacks to get events
+        """
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(e)
+            time.sleep(self.interval)
+
+    async def events(self):
+        """
+        Async iterator of events
+
+        async for event in watcher.events():
+            ...
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                events = await loop.run_in_executor(None, self.poll)
+            except Exception as e:
+                logger.error(e)
+                events = []
+
+            for event in events:
+                yield event
+            await asyncio.sleep(self.interval)
+
+    def _adapt_interval(self, changed: bool):
+        if changed:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+
+    def load(self):
+        """
+        Load index from index_path
+        """
+        with open(self.index_path, 'r') as f:
+            state = json.load(f)
+        self.index = state.get('index', {})
+        self.validators = state.get('validators', {})
+
+    def save(self):
+        """
+        Save index to index_path
+        """
+        if self.index_path is None:
+            return
+
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'index': self.index, 'validators': self.validators}, f)
+        os.replace(tmp_path, self.index_path)
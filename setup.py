@@ -14,6 +14,18 @@ setup(
     description='MagicEden API Parser',
     packages=find_packages(),
     install_requires=requirements,
+    extras_require={
+        'async': ["aiohttp>=3.8.1"],
+        'numpy': ["numpy>=1.20"],
+        'parquet': ["pyarrow>=8.0"],
+        'fast': ["orjson>=3.8", "msgspec>=0.16"],
+        'prometheus': ["prometheus-client>=0.14"],
+        'otel': ["opentelemetry-api>=1.12"],
+        'http2': ["httpx[http2]>=0.26"],
+    },
+    entry_points={
+        'console_scripts': ['magiceden-export=magiceden_api.export:main'],
+    },
     author_email='dimazver61@gmail.com',
     classifiers=[
         "Programming Language :: Python :: 3.9",
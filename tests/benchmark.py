@@ -0,0 +1,232 @@
+"""
+Offline MagicParser benchmark against local MockServer
+
+python tests/benchmark.py --calls 500 --latency 0.005 --rate-limit 0.02 --challenge 0.05 --memory
+python tests/benchmark.py --save baseline.json
+python tests/benchmark.py --baseline baseline.json --tolerance 0.2
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from magiceden_api import MagicParser  # noqa: E402
+from magiceden_api.cache import TTLCache  # noqa: E402
+from magiceden_api.ratelimit import RateLimiter, RetryPolicy  # noqa: E402
+from mock_server import MockServer, MockDriver  # noqa: E402
+
+SCENARIOS = ('sync', 'cached', 'concurrent', 'async')
+
+# endpoint mix of one benchmark round: (method, args)
+WORKLOAD = [
+    ('get_all_collections', ()),
+    ('get_popular_collections', (100, '1d')),
+    ('get_listed_nfts', ('collection_0',)),
+    ('get_global_activities', ('collection_0',)),
+    ('get_activities_lite', ('collection_0',)),
+    ('get_holders', ('collection_0',)),
+    ('get_collection_time_series', ('collection_0',)),
+    ('get_collection', ('collection_0',)),
+    ('get_nfts_by_owner', ('wallet0',)),
+    ('get_user_activity', ('wallet0',)),
+    ('get_featured_collections_carousels', ()),
+    ('get_price', ()),
+]
+
+
+def workload(calls: int) -> list[tuple]:
+    return [WORKLOAD[i % len(WORKLOAD)] for i in range(calls)]
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def make_parser(server: MockServer, driver: MockDriver, cached: bool = False) -> MagicParser:
+    return MagicParser(
+        driver_mode='lazy',
+        driver_pool=driver,
+        endpoints=server.endpoints(),
+        cache=TTLCache(maxsize=1024, ttl=600) if cached else None,
+        rate_limiter=RateLimiter(default_rate=100000),
+        retry_policy=RetryPolicy(backoff_base=0.001, backoff_max=0.01)
+    )
+
+
+def _timed(parser, method, args):
+    start = time.perf_counter()
+    try:
+        getattr(parser, method)(*args)
+        error = False
+    except Exception:
+        error = True
+    return time.perf_counter() - start, error
+
+
+def run_sync(server, driver, calls, workers, cached=False) -> list[tuple]:
+    parser = make_parser(server, driver, cached)
+    try:
+        return [_timed(parser, method, args) for method, args in workload(calls)]
+    finally:
+        parser.close()
+
+
+def run_concurrent(server, driver, calls, workers) -> list[tuple]:
+    parser = make_parser(server, driver)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda call: _timed(parser, *call), workload(calls)))
+    finally:
+        parser.close()
+
+
+def run_async(server, driver, calls, workers) -> list[tuple]:
+    from magiceden_api.aio import AsyncMagicParser
+
+    fallback = make_parser(server, driver)
+
+    async def timed(ap, method, args):
+        start = time.perf_counter()
+        try:
+            await getattr(ap, method)(*args)
+            error = False
+        except Exception:
+            error = True
+        return time.perf_counter() - start, error
+
+    async def main():
+        async with AsyncMagicParser(concurrency=workers, fallback=fallback, endpoints=server.endpoints()) as ap:
+            return await asyncio.gather(*(timed(ap, method, args) for method, args in workload(calls)))
+
+    try:
+        return asyncio.run(main())
+    finally:
+        fallback.close()
+
+
+RUNNERS = {
+    'sync': run_sync,
+    'cached': lambda server, driver, calls, workers: run_sync(server, driver, calls, workers, cached=True),
+    'concurrent': run_concurrent,
+    'async': run_async,
+}
+
+
+def run_scenario(name: str, server: MockServer, calls: int = 200, workers: int = 16, memory: bool = False) -> dict:
+    """
+    Run scenario and collect metrics
+
+    :param name: sync | cached | concurrent | async
+    :param server: started MockServer
+    :param calls: parser calls count
+    :param workers: threads or async concurrency
+    :param memory: measure peak python memory with tracemalloc, slows down calls
+    :return: metrics dict
+    """
+    server.reset()
+    driver = MockDriver(server)
+    if memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    results = RUNNERS[name](server, driver, calls, workers)
+    elapsed = time.perf_counter() - start
+
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    latencies = [latency for latency, _ in results]
+    stats = server.stats()
+    return {
+        'scenario': name,
+        'calls': calls,
+        'seconds': round(elapsed, 4),
+        'throughput': round(calls / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'peak_memory_kb': None if peak is None else round(peak / 1024, 1),
+        'http_requests': sum(stats['hits'].values()),
+        'rate_limited': stats['statuses'].get(429, 0),
+        'challenges': stats['statuses'].get(403, 0),
+        'fallback_rate': round(driver.requests / calls, 4),
+        'errors': sum(1 for _, error in results if error),
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """
+    :return: list of regressions, empty if results are not worse than baseline by more than tolerance
+    """
+    baseline = {item['scenario']: item for item in baseline}
+    regressions = []
+    for item in results:
+        base = baseline.get(item['scenario'])
+        if base is None:
+            continue
+        if item['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{item['scenario']}: throughput {item['throughput']} < {base['throughput']}")
+        if item['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{item['scenario']}: p99 {item['p99_ms']}ms > {base['p99_ms']}ms")
+    return regressions
+
+
+def main(args=None):
+    arg_parser = argparse.ArgumentParser(description='Offline MagicParser benchmark')
+    arg_parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+    arg_parser.add_argument('--calls', type=int, default=300)
+    arg_parser.add_argument('--workers', type=int, default=16)
+    arg_parser.add_argument('--items', type=int, default=100, help='records in list payloads')
+    arg_parser.add_argument('--latency', type=float, default=0.005, help='server latency seconds')
+    arg_parser.add_argument('--jitter', type=float, default=0.005, help='random extra latency seconds')
+    arg_parser.add_argument('--rate-limit', type=float, default=0.02, help='share of 429 responses')
+    arg_parser.add_argument('--challenge', type=float, default=0.02, help='share of Cloudflare 403 responses')
+    arg_parser.add_argument('--payloads-dir', help='recorded payloads <route name>.json')
+    arg_parser.add_argument('--memory', action='store_true', help='trace peak memory, slows down calls')
+    arg_parser.add_argument('--save', help='save results json')
+    arg_parser.add_argument('--baseline', help='results json to compare with')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression share')
+    args = arg_parser.parse_args(args)
+
+    server = MockServer(
+        items=args.items, latency=args.latency, jitter=args.jitter, rate_limit=args.rate_limit,
+        challenge=args.challenge, payloads_dir=args.payloads_dir, process=True
+    )
+    results = []
+    with server:
+        for name in args.scenarios:
+            if name == 'async':
+                try:
+                    import aiohttp  # noqa: F401
+                except ImportError:
+                    print('async: skipped, aiohttp is not installed')
+                    continue
+            result = run_scenario(name, server, args.calls, args.workers, memory=args.memory)
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+import os
+import re
+import json
+import time
+import random
+import threading
+import multiprocessing
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from requests.utils import requote_uri
+
+from magiceden_api.driver import Page
+
+CLEARANCE_COOKIE = 'cf_clearance'
+CHALLENGE_PAGE = b'<!DOCTYPE html><html><head><title>Just a moment...</title></head><body></body></html>'
+
+
+def _collection(i):
+    return {
+        'symbol': f'collection_{i}',
+        'name': f'Collection {i}',
+        'description': 'x' * 200,
+        'image': f'https://img.example/{i}.png',
+        'twitter': f'https://twitter.com/c{i}',
+        'discord': f'https://discord.gg/c{i}',
+        'categories': ['pfp', 'art'],
+        'floorPrice': (i + 1) * 10 ** 9,
+        'listedCount': i * 3,
+        'volumeAll': i * 10 ** 12,
+        'totalItems': 10000,
+        'isFlagged': False,
+        'createdAt': '2022-01-01T00:00:00.000Z'
+    }
+
+
+def _listing(i, symbol='collection_0'):
+    return {
+        'pdaAddress': f'pda{i}',
+        'auctionHouse': '',
+        'tokenAddress': f'token{i}',
+        'tokenMint': f'mint{i}',
+        'seller': f'seller{i}',
+        'tokenSize': 1,
+        'price': round(1 + i * 0.1, 2),
+        'rarity': {'moonrank': {'rank': i}},
+        'extra': {'img': f'https://img.example/{i}.png'},
+        'collectionSymbol': symbol,
+        'createdAt': '2022-01-01T00:00:00.000Z'
+    }
+
+
+def _activity(i, symbol='collection_0', tx_type='exchange'):
+    return {
+        'txType': tx_type,
+        'transactionId': f'tx{i}',
+        'blockTime': 1672531200 - i * 60,
+        'signature': f'sig{i}',
+        'tokenMint': f'mint{i}',
+        'collection_symbol': symbol,
+        'collectionSymbol': symbol,
+        'slot': 170000000 - i,
+        'buyer': f'buyer{i}',
+        'seller': f'seller{i}',
+        'price': round(1 + i * 0.01, 3),
+        'source': 'magiceden_v2',
+        'createdAt': '2023-01-01T00:00:00.000Z'
+    }
+
+
+def _nft(i, owner='wallet'):
+    return {
+        'mintAddress': f'mint{i}',
+        'owner': owner,
+        'supply': 1,
+        'collection': f'collection_{i % 5}',
+        'collectionSymbol': f'collection_{i % 5}',
+        'name': f'NFT #{i}',
+        'updateAuthority': 'authority',
+        'primarySaleHappened': True,
+        'sellerFeeBasisPoints': 500,
+        'img': f'https://img.example/{i}.png',
+        'attributes': [{'trait_type': 'Background', 'value': 'Blue'}, {'trait_type': 'Eyes', 'value': 'Red'}]
+    }
+
+
+def _query(query: dict) -> dict:
+    # ?q={"$match": ...} of rpc endpoints
+    if 'q' not in query:
+        return {}
+    try:
+        return json.loads(unquote(query['q'][0]))
+    except ValueError:
+        return {}
+
+
+def _page(query: dict, default_limit: int, items: int):
+    q = _query(query)
+    offset = int(q.get('$skip', query.get('offset', [0])[0]))
+    limit = int(q.get('$limit', query.get('limit', [default_limit])[0]))
+    return range(offset, min(offset + limit, items))
+
+
+# (name, path regex, payload(match, query, items))
+ROUTES = [
+    ('featured_carousels', r'/featured_carousels',
+     lambda m, q, n: [{'id': i, 'title': f'carousel {i}'} for i in range(10)]),
+    ('featured_collections_carousels', r'/featured_collections_carousels',
+     lambda m, q, n: [_collection(i) for i in range(10)]),
+    ('magiceden_volumes', r'/volumes', lambda m, q, n: {'totalVolume': 10 ** 18, 'last24Hrs': 10 ** 15}),
+    ('all_collections', r'/all_collections_with_escrow_data',
+     lambda m, q, n: {'collections': [_collection(i) for i in range(n)]}),
+    ('all_organizations', r'/all_organizations',
+     lambda m, q, n: [{'name': f'org{i}', 'bio': 'x' * 100} for i in range(n)]),
+    ('popular_collections', r'/collection_stats/popular_collections/sol', lambda m, q, n: [
+        {'collectionSymbol': f'collection_{i}', 'name': f'Collection {i}', 'floorPrice': (i + 1) * 10 ** 9,
+         'volume': i * 10 ** 12, 'txns': i, 'totalVol': i * 10 ** 13, 'image': ''}
+        for i in range(min(n, int(q.get('limit', [n])[0])))
+    ]),
+    ('price', r'/api/v3/ticker/price',
+     lambda m, q, n: {'symbol': q.get('symbol', ['SOLUSDC'])[0], 'price': '31.64000000'}),
+    ('launchpad_collections', r'/launchpad_collections', lambda m, q, n: [_collection(i) for i in range(n)]),
+    ('user_auction_wallet', r'/auctions/wallets/[^/]+', lambda m, q, n: {'wallet': 'wallet', 'auctions': []}),
+    ('auction_by_symbol', r'/auctions/[^/]+', lambda m, q, n: {'symbol': 'auction', 'price': 1}),
+    ('auctions', r'/auctions', lambda m, q, n: [{'symbol': f'auction_{i}', 'price': i} for i in range(10)]),
+    ('drops', r'/drops',
+     lambda m, q, n: [{'name': f'drop {i}', 'date': 1672531200 + i} for i in _page(q, 500, n)]),
+    ('most_watched_collections', r'/collection_watchlists/most_watched',
+     lambda m, q, n: [_collection(i) for i in range(10)]),
+    ('multi_collection_stats', r'/rpc/getMultiCollectionEscrowStats/(?P<symbols>[^/]+)', lambda m, q, n: [
+        {'symbol': symbol, 'floorPrice': 10 ** 9, 'listedCount': 10, 'volumeAll': 10 ** 12}
+        for symbol in unquote(m['symbols']).split(',')
+    ]),
+    ('collections_witch_symbols', r'/rpc/getCollectionsWithSymbols',
+     lambda m, q, n: [_collection(i) for i in range(3)]),
+    ('collection_escrow_stats', r'/rpc/getCollectionEscrowStats/(?P<symbol>[^/]+)', lambda m, q, n: {
+        'results': {'symbol': m['symbol'], 'floorPrice': 10 ** 9, 'listedCount': 10, 'volumeAll': 10 ** 12}
+    }),
+    ('collection', r'/collections/(?P<symbol>[^/]+)', lambda m, q, n: dict(_collection(0), symbol=m['symbol'])),
+    ('collection_scam_flag', r'/collection_flags/check/[^/]+', lambda m, q, n: {'hasFlag': False}),
+    ('twitter_followers', r'/social_metrics/collection/[^/]+', lambda m, q, n: {'twitterFollowerCount': 12345}),
+    ('nft_by_mint_address', r'/rpc/getNFTByMintAddress/[^/]+', lambda m, q, n: {'results': _nft(0)}),
+    ('whitelists', r'/whitelists/upcoming', lambda m, q, n: [{'name': f'wl{i}'} for i in range(10)]),
+    ('listed_nfts', r'/rpc/getListedNFTsByQueryLite', lambda m, q, n: {
+        'results': [_listing(i, _query(q).get('$match', {}).get('collectionSymbol')) for i in _page(q, 20, n)]
+    }),
+    ('collections_info', r'/rpc/getAggregatedCollectionMetricsBySymbol', lambda m, q, n: [
+        {'symbol': symbol, 'fp': 10 ** 9} for symbol in q.get('symbols', [''])[0].split(',')
+    ]),
+    ('global_activities', r'/rpc/getGlobalActivitiesByQuery', lambda m, q, n: {
+        'results': [_activity(i, _query(q).get('$match', {}).get('collection_symbol')) for i in _page(q, 50, n)]
+    }),
+    ('activities_lite', r'/v2/collections/[^/]+/activitiesLite', lambda m, q, n: [
+        {'blockTime': 1672531200 - i * 60, 'price': round(1 + i * 0.01, 3), 'type': 'buyNow'}
+        for i in _page(q, 500, n)
+    ]),
+    ('approx_listings', r'/v2/collections/[^/]+/approx_listings', lambda m, q, n: [
+        {'price': round(1 + i * 0.1, 2), 'tokenMint': f'mint{i}'} for i in _page(q, 500, n)
+    ]),
+    ('holders', r'/v2/collections/(?P<symbol>[^/]+)/holder_stats', lambda m, q, n: {
+        'symbol': m['symbol'], 'totalSupply': 10000, 'uniqueHolders': n,
+        'topHolders': [{'owner': f'wallet{i}', 'tokens': n - i} for i in range(n)]
+    }),
+    ('collection_time_series', r'/rpc/getCollectionTimeSeries/[^/]+', lambda m, q, n: [
+        {'ts': (1672531200 + i * 3600) * 1000, 'fp': (10 + i % 7) * 10 ** 8, 'vol': i * 10 ** 9} for i in range(n)
+    ]),
+    ('nfts_by_escrow_owner', r'/rpc/getNFTsByEscrowOwner/(?P<wallet>[^/]+)', lambda m, q, n: {
+        'results': [_nft(i, m['wallet']) for i in range(min(n, 10))]
+    }),
+    ('biddings_by_query', r'/rpc/getBiddingsByQuery',
+     lambda m, q, n: {'results': [{'tokenMint': 'mint1', 'price': 1}]}),
+    ('user_info', r'/auth/user/[^/]+', lambda m, q, n: {'displayName': 'user', 'avatar': None}),
+    ('user_listings', r'/search_escrows', lambda m, q, n: {'results': [_listing(i) for i in range(min(n, 5))]}),
+    ('nfts_by_owner', r'/rpc/getNFTsByOwner/(?P<wallet>[^/]+)', lambda m, q, n: {
+        'results': [_nft(i, m['wallet']) for i in range(min(n, 20))]
+    }),
+    ('offers_received', r'/rpc/m2/getOffersReceived/[^/]+',
+     lambda m, q, n: {'results': [{'tokenMint': 'mint2', 'price': 1}]}),
+]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    server_version = 'cloudflare'
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.mock.connected()
+
+    def do_GET(self):
+        self.server.mock.handle(self)
+
+    def log_message(self, *args):
+        pass
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients close keep-alive connections at exit
+        pass
+
+
+class MockServer:
+    def __init__(self, items: int = 100, latency: float = 0, jitter: float = 0, rate_limit: float = 0,
+                 challenge: float = 0, payloads_dir: str = None, seed: int = 0, process: bool = False):
+        """
+        Local stand-in for MagicEden api hosts behind Cloudflare.
+        Serves payload for every MagicParser endpoint, simulates latency, 429 and Cloudflare 403 challenges
+
+        with MockServer(latency=0.01, rate_limit=0.05) as server:
+            mp = MagicParser(driver_mode='http', endpoints=server.endpoints())
+
+
+        items: records in list payloads
+
+        latency: seconds before response
+
+        jitter: random extra seconds before response, 0..jitter
+
+        rate_limit: share of responses replaced with 429 Retry-After: 0
+
+        challenge: share of responses without cf_clearance cookie replaced with 403 challenge page
+
+        payloads_dir: recorded payloads <route name>.json, they replace generated payloads
+
+        seed: random seed for reproducible runs
+
+        process: serve from forked child process, so server doesn't share GIL and memory with measured client.
+        script is not available, use stats() and reset()
+        """
+        self.items = items
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.challenge = challenge
+        self.payloads_dir = payloads_dir
+        self.process = process
+
+        self.routes = [(name, re.compile(pattern + '$'), payload) for name, pattern, payload in ROUTES]
+        self.clearance = 'mock-clearance'
+        self.hits = {}  # route name: count
+        self.statuses = {}  # status: count
+        self.connections = 0  # accepted tcp connections
+        self.script = {}  # route name: list of statuses for next requests
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recorded = {}
+        self._httpd = None
+        self._thread = None
+        self._process = None
+        self._port = None
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._port}'
+
+    def endpoints(self):
+        """
+        Endpoints with all hosts pointed to the server
+        """
+        from magiceden_api.endpoints import Endpoints
+        return Endpoints(self.url, self.url, self.url)
+
+    def start(self) -> 'MockServer':
+        if self.process:
+            context = multiprocessing.get_context('fork')
+            conn, child_conn = context.Pipe()
+            self._process = context.Process(target=self._serve, args=(child_conn,), daemon=True)
+            self._process.start()
+            self._port = conn.recv()
+            return self
+
+        self._httpd = MockHTTPServer(('127.0.0.1', 0), MockHandler)
+        self._httpd.mock = self
+        self._port = self._httpd.server_port
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def _serve(self, conn):
+        self._process = None  # child serves stats itself
+        self._httpd = MockHTTPServer(('127.0.0.1', 0), MockHandler)
+        self._httpd.mock = self
+        conn.send(self._httpd.server_port)
+        self._httpd.serve_forever()
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def stats(self) -> dict:
+        """
+        :return: {'hits': {route name: count}, 'statuses': {status: count}, 'connections': count}
+        """
+        if self._process is not None:
+            with urllib.request.urlopen(f'{self.url}/_mock/stats', timeout=10) as r:
+                stats = json.loads(r.read())
+            stats['statuses'] = {int(k): v for k, v in stats['statuses'].items()}
+            return stats
+        with self._lock:
+            return {'hits': dict(self.hits), 'statuses': dict(self.statuses), 'connections': self.connections}
+
+    def reset(self):
+        """
+        Clear stats and script
+        """
+        if self._process is not None:
+            urllib.request.urlopen(f'{self.url}/_mock/reset', timeout=10).close()
+            return
+        with self._lock:
+            self.hits.clear()
+            self.statuses.clear()
+            self.script.clear()
+            self.connections = 0
+
+    def connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def route(self, path: str):
+        """
+        :param path: url path
+        :return: (route name, match, payload function) or None
+        """
+        for name, pattern, payload in self.routes:
+            match = pattern.match(path)
+            if match:
+                return name, match, payload
+        return None
+
+    def handle(self, request: BaseHTTPRequestHandler):
+        url = urlsplit(request.path)
+        if url.path == '/_mock/stats':
+            return self._send(request, 200, json.dumps(self.stats()).encode(), count=False)
+        if url.path == '/_mock/reset':
+            self.reset()
+            return self._send(request, 200, b'{}', count=False)
+
+        found = self.route(url.path)
+        if found is None:
+            return self._send(request, 404, b'{"error": "not found"}')
+        name, match, payload = found
+
+        cleared = f'{CLEARANCE_COOKIE}={self.clearance}' in (request.headers.get('Cookie') or '')
+        with self._lock:
+            self.hits[name] = self.hits.get(name, 0) + 1
+            scripted = self.script.get(name)
+            status = scripted.pop(0) if scripted else None
+            if status is None:
+                if self.rate_limit and self._random.random() < self.rate_limit:
+                    status = 429
+                elif self.challenge and not cleared and self._random.random() < self.challenge:
+                    status = 403
+                else:
+                    status = 200
+            delay = self.latency + (self._random.random() * self.jitter if self.jitter else 0)
+
+        if delay:
+            time.sleep(delay)
+
+        if status == 429:
+            return self._send(request, 429, b'{"error": "rate limited"}', {'Retry-After': '0'})
+        if status == 403:
+            return self._send(request, 403, CHALLENGE_PAGE, {'cf-mitigated': 'challenge'}, 'text/html')
+        if status != 200:
+            return self._send(request, status, b'{"error": "scripted"}')
+
+        body = self._payload(name, match, payload, parse_qs(url.query))
+        self._send(request, 200, body)
+
+    def _payload(self, name, match, payload, query) -> bytes:
+        if self.payloads_dir is not None:
+            if name not in self._recorded:
+                path = os.path.join(self.payloads_dir, f'{name}.json')
+                self._recorded[name] = open(path, 'rb').read() if os.path.exists(path) else None
+            if self._recorded[name] is not None:
+                return self._recorded[name]
+        return json.dumps(payload(match, query, self.items)).encode()
+
+    def _send(self, request, status, body: bytes, headers: dict = None, content_type='application/json',
+              count=True):
+        if count:
+            with self._lock:
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(body)
+
+
+class MockDriver:
+    def __init__(self, server: MockServer, solve_time: float = 0):
+        """
+        Stand-in for Chrome Cloudflare fallback. Passes the challenge and returns cf_clearance cookie
+
+        mp = MagicParser(driver_mode='lazy', driver_pool=MockDriver(server), endpoints=server.endpoints())
+
+
+        server: MockServer
+
+        solve_time: seconds to solve challenge
+        """
+        self.server = server
+        self.solve_time = solve_time
+        self.user_agent = 'Mozilla/5.0 MockChrome'
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def request(self, url) -> Page:
+        with self._lock:
+            self.requests += 1
+        if self.solve_time:
+            time.sleep(self.solve_time)
+
+        cookie = f'{CLEARANCE_COOKIE}={self.server.clearance}'
+        request = urllib.request.Request(requote_uri(url), headers={'Cookie': cookie, 'User-Agent': self.user_agent})
+        with urllib.request.urlopen(request, timeout=30) as r:
+            text = r.read().decode()
+        cookies = [{'name': CLEARANCE_COOKIE, 'value': self.server.clearance, 'path': '/'}]
+        return Page(text, cookies, self.user_agent)
+
+    def quit(self):
+        pass
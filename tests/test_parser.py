@@ -0,0 +1,1190 @@
+import json
+import time
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from magiceden_api import MagicParser  # noqa: E402
+from magiceden_api.cache import TTLCache  # noqa: E402
+from magiceden_api.endpoints import Endpoints  # noqa: E402
+from magiceden_api.metrics import Metrics  # noqa: E402
+from magiceden_api.models import iter_models, to_models  # noqa: E402
+from magiceden_api.scheduler import (  # noqa: E402
+    LEASE_EXPIRED, Scheduler, SharedTokenBucket, SqliteQueue, TaskQueue, collection_stats_tasks, top_holders_tasks
+)
+from magiceden_api.singleflight import normalize_url  # noqa: E402
+from magiceden_api.store import SnapshotStore  # noqa: E402
+from magiceden_api.transport import Transport  # noqa: E402
+from magiceden_api.ratelimit import RateLimiter, RetryPolicy  # noqa: E402
+from mock_server import MockServer, MockDriver  # noqa: E402
+from benchmark import WORKLOAD, run_scenario  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    with MockServer(items=45) as server:
+        yield server
+
+
+def make_parser(server, **kwargs):
+    kwargs.setdefault('driver_mode', 'http')
+    return MagicParser(endpoints=server.endpoints(), retry_policy=RetryPolicy(backoff_base=0.001), **kwargs)
+
+
+@pytest.mark.parametrize('method, args', WORKLOAD)
+def test_endpoint_served(server, method, args):
+    mp = make_parser(server)
+    assert getattr(mp, method)(*args)
+    assert sum(server.hits.values()) == 1
+
+
+def test_rate_limit_retried(server):
+    mp = make_parser(server)
+    server.script['holders'] = [429, 429]
+    assert mp.get_holders('degods')['topHolders']
+    assert server.hits['holders'] == 3
+
+
+def test_challenge_without_driver_raises(server):
+    mp = make_parser(server)
+    server.script['collection'] = [403]
+    with pytest.raises(requests.HTTPError):
+        mp.get_collection('degods')
+
+
+def test_challenge_fallback_replays_clearance():
+    with MockServer(challenge=1) as server:
+        driver = MockDriver(server)
+        mp = make_parser(server, driver_mode='lazy', driver_pool=driver)
+
+        assert mp.get_collection('degods')['symbol'] == 'degods'
+        assert driver.requests == 1
+        assert mp.has_clearance(server.url)
+
+        mp.get_collection('okay_bears')
+        assert driver.requests == 1
+        assert server.statuses == {403: 1, 200: 2}
+
+
+def test_query_page_size(server):
+    mp = make_parser(server)
+    assert len(mp.get_activities_lite('degods', limit=10, offset=40)) == 5
+    assert len(mp.get_approx_listings('degods', limit=10)) == 10
+    assert len(mp.get_listed_nfts('degods', offset=5, limit=30)) == 30
+    assert len(mp.get_global_activities('degods', limit=7)) == 7
+    assert len(mp.get_user_activity('wallet', limit=3)) == 3
+    # paging arguments added to old methods are keyword only, positional order can't be mixed up
+    with pytest.raises(TypeError):
+        mp.get_listed_nfts('degods', 5, 30)
+
+
+def test_endpoint_urls():
+    endpoints = Endpoints('https://host')
+    assert endpoints.activities_lite('de gods', 10) == 'https://host/v2/collections/de%20gods/activitiesLite?' \
+                                                       'limit=10&offset=0&type=buy,buyNow'
+    url = endpoints.global_activities('degods', tx_types=['list'])
+    assert url.name == 'global_activities'
+    assert ' ' not in url and '{' not in url
+    assert endpoints.nft_by_mint_address('mint', use_rarity=True).endswith('?useRarity=true')
+    assert endpoints.drops(10, top=5) == endpoints.drops(10, top=5) == 'https://host/drops?limit=10&offset=0&top=5'
+
+
+def test_cache(server):
+    mp = make_parser(server, cache=TTLCache())
+    mp.get_all_collections()
+    mp.get_all_collections()
+    assert server.hits['all_collections'] == 1
+    assert mp.cache.stats()['hits'] == 1 and mp.cache.stats()['misses'] == 1
+
+    mp.get_all_collections(refresh=True)
+    mp.get_all_collections(cache=False)
+    assert server.hits['all_collections'] == 3
+    assert mp.get_all_collections(fields=['symbol'])[0] == {'symbol': 'collection_0'}
+    assert server.hits['all_collections'] == 3
+
+
+def test_cache_endpoint_ttls(server):
+    mp = make_parser(server, cache=TTLCache(ttls={'holders': 60, 'all_collections': 0}))
+    for _ in range(2):
+        mp.get_holders('degods')
+        mp.get_all_collections()
+    assert server.hits['holders'] == 1
+    assert server.hits['all_collections'] == 2
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_cache_expiry_and_eviction(tmp_path, backend):
+    from magiceden_api.cache import SqliteCache
+
+    def make(name, **kwargs):
+        if backend == 'sqlite':
+            return SqliteCache(str(tmp_path / f'{name}.db'), **kwargs)
+        return TTLCache(**kwargs)
+
+    cache = make('count', maxsize=3, ttl=60)
+    cache.set('short', b'x', ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get('short') is None
+
+    for key in 'abcd':
+        cache.set(key, b'x')
+    cache.get('b')
+    cache.set('e', b'x')  # a, c are least recently used
+    assert [key for key in 'abcde' if cache.get(key) is not None] == ['b', 'd', 'e']
+    assert cache.stats()['items'] == 3
+
+    cache = make('bytes', maxsize=100, max_bytes=10)
+    cache.set('big', b'x' * 11)
+    cache.set('a', b'x' * 6)
+    cache.set('b', b'x' * 4)
+    cache.set('c', b'x' * 3)
+    assert cache.get('big') is None and cache.get('a') is None
+    assert cache.stats()['bytes'] == 7
+    assert cache.stats()['evictions'] == 1
+
+
+def test_sqlite_cache_survives_restart(server, tmp_path):
+    from magiceden_api.cache import SqliteCache
+
+    path = str(tmp_path / 'cache.db')
+    make_parser(server, cache=SqliteCache(path)).get_all_collections()
+    assert len(make_parser(server, cache=SqliteCache(path)).get_all_collections()) == 45
+    assert server.hits['all_collections'] == 1
+
+
+def test_pagination(server):
+    mp = make_parser(server)
+    listings = list(mp.iter_listed_nfts('degods', page_size=20, prefetch=False))
+    assert len(listings) == 45
+    assert server.hits['listed_nfts'] == 3
+
+
+def test_metrics():
+    metrics = Metrics()
+    events = []
+    metrics.add_listener(events.append)
+    with MockServer() as server:
+        mp = make_parser(server, driver_mode='lazy', driver_pool=MockDriver(server), metrics=metrics)
+        server.script['holders'] = [429, 403]
+        mp.get_holders('degods')
+
+    stats = metrics.stats()['holders']
+    assert stats['statuses'] == {429: 1, 403: 1}
+    assert stats['retries'] == 1
+    assert stats['fallbacks'] == 1
+    assert stats['bytes'] > 0
+    assert [event.kind for event in events] == ['http', 'retry', 'http', 'driver']
+
+
+def test_connections_reused(server):
+    mp = make_parser(server, transport=Transport(pool_maxsize=4), rate_limiter=RateLimiter(default_rate=1000))
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(mp.get_holders, [f'collection_{i}' for i in range(64)]))
+    assert server.connections <= 4
+
+
+def test_http2_transport(server):
+    pytest.importorskip('h2')
+    mp = make_parser(server, transport=Transport(http2=True, read_timeout=5))
+    assert mp.session.get_adapter(server.url + '/').__class__.__name__ == 'HTTP2Adapter'
+    assert mp.get_holders('degods')['topHolders']
+    assert mp.get_collection('degods')['symbol'] == 'degods'
+
+
+def test_snapshot_store(server):
+    mp = make_parser(server, rate_limiter=RateLimiter(default_rate=1000))
+    store = SnapshotStore()
+    assert store.fill_collections(mp) == 45
+    assert store.fill_activities(mp, ['degods']) == 45
+    assert store.fill_activities(mp, ['degods']) == 0
+
+    collections = store.query_collections(min_floor=1, order_by='symbol', desc=False, limit=3)
+    assert [c['symbol'] for c in collections] == ['collection_0', 'collection_1', 'collection_10']
+    assert len(store.query_activities(wallet='buyer3')) == 1
+    assert store.aggregate_activities('collection')[0]['count'] == 45
+
+
+def test_single_flight():
+    with MockServer(latency=0.2) as server:
+        mp = make_parser(server)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            prices = list(executor.map(lambda _: mp.get_price('SOL'), range(8)))
+        assert prices == [prices[0]] * 8
+        assert server.hits['price'] == 1
+        assert mp.flights.shared == 7
+
+        server.script['magiceden_volumes'] = [404]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(mp.get_magiceden_volumes) for _ in range(8)]
+        assert all(isinstance(f.exception(), requests.HTTPError) for f in futures)
+        assert server.hits['magiceden_volumes'] == 1
+
+
+def test_async_single_flight():
+    aio = pytest.importorskip('magiceden_api.aio')
+
+    async def run(server):
+        async with aio.AsyncMagicParser(endpoints=server.endpoints()) as ap:
+            return await ap.map(ap.get_price, ['SOL'] * 8)
+
+    with MockServer(latency=0.2) as server:
+        prices = asyncio.run(run(server))
+        assert len(prices) == 8
+        assert server.hits['price'] == 1
+
+
+def test_live_feed():
+    aio = pytest.importorskip('magiceden_api.aio')
+    from magiceden_api.feed import DROP, SALE, LiveFeed
+
+    async def run(server):
+        async with aio.AsyncMagicParser(endpoints=server.endpoints()) as ap:
+            feed = LiveFeed(ap, ['degods'], launchpad=False, rate=1000, min_interval=0.01, max_interval=0.05)
+            assert await feed.poll('collection:degods') == []
+            assert await feed.poll('drops') == []
+
+            server.items = 8
+            events = await feed.poll('collection:degods')
+            assert [(event.type, event.key) for event in events] == [(SALE, 'sig7'), (SALE, 'sig6'), (SALE, 'sig5')]
+            assert await feed.poll('collection:degods') == []
+
+            server.items = 10
+            received = []
+            stream = feed.events()
+            async for event in stream:
+                received.append((event.type, event.key))
+                if len(received) == 7:
+                    break
+            await stream.aclose()
+            return sorted(received)
+
+    with MockServer(items=5) as server:
+        assert asyncio.run(run(server)) == [(DROP, f'drop {i}') for i in range(5, 10)] + [(SALE, 'sig8'), (SALE, 'sig9')]
+
+
+def test_live_feed_activities_without_signature():
+    from magiceden_api.feed import SALE, LiveFeed
+
+    class Parser:
+        activities = []
+
+        async def get_global_activities(self, symbol, offset=0, limit=100, tx_types=None):
+            return self.activities[offset:offset + limit]
+
+    async def run():
+        parser = Parser()
+        feed = LiveFeed(parser, ['degods'], drops=False, launchpad=False, rate=1000, emit_initial=True)
+        parser.activities = [{'txType': 'exchange', 'blockTime': 1, 'tokenMint': 'a'}]
+        first = await feed.poll('collection:degods')
+        parser.activities = [{'txType': 'exchange', 'blockTime': 2, 'tokenMint': 'b'}] + parser.activities
+        second = await feed.poll('collection:degods')
+        return [e.data['tokenMint'] for e in first + second if e.type == SALE]
+
+    assert asyncio.run(run()) == ['a', 'b']
+
+
+def test_live_feed_drops_not_evicted():
+    aio = pytest.importorskip('magiceden_api.aio')
+    from magiceden_api.feed import LiveFeed
+
+    async def run(server):
+        async with aio.AsyncMagicParser(endpoints=server.endpoints()) as ap:
+            feed = LiveFeed(ap, ['degods'], rate=1000, seen_size=8, emit_initial=True)
+            assert len(await feed.poll('drops')) == 10
+            assert len(await feed.poll('launchpad')) == 10
+            assert len(await feed.poll('collection:degods')) == 10  # evicts older activity keys
+            assert await feed.poll('drops') == []
+            assert await feed.poll('launchpad') == []
+
+    with MockServer(items=10) as server:
+        asyncio.run(run(server))
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://Api.Example.com:443/a?b=2&a=1') == 'https://api.example.com/a?a=1&b=2'
+
+
+def test_scheduler(server, tmp_path):
+    queue = SqliteQueue(str(tmp_path / 'tasks.db'), retry_delay=0)
+    factory = partial(
+        MagicParser, endpoints=server.endpoints(), driver_mode='http', retry_policy=RetryPolicy(max_attempts=1)
+    )
+    scheduler = Scheduler(
+        queue, factory, workers=2, threads=2, budget_path=str(tmp_path / 'budget.db'), default_rate=1000,
+        poll_interval=0.01
+    )
+    mp = make_parser(server)
+    assert scheduler.submit(top_holders_tasks(mp, top=10), priority=1) == 10
+    assert scheduler.submit(top_holders_tasks(mp, top=10)) == 0
+    assert scheduler.submit(collection_stats_tasks(mp, max_batch=10)) == 5
+
+    server.script['holders'] = [500]
+    assert scheduler.run() == {'done': 15}
+    assert server.hits['holders'] == 11
+    assert len(list(queue.results('get_holders'))) == 10
+    assert sum(len(stats) for _, _, stats in queue.results('get_multi_collection_stats')) == 45
+
+
+def test_queue_lease_expiry_is_attempt(tmp_path):
+    queue = SqliteQueue(str(tmp_path / 'tasks.db'), max_attempts=2, lease_timeout=0)
+    queue.put([('get_holders', ['degods'])])
+    assert queue.get('dead').attempts == 0
+    time.sleep(0.01)
+    assert queue.get('hung').attempts == 1
+    time.sleep(0.01)
+    assert queue.get('next') is None
+    assert queue.counts() == {'failed': 1}
+    assert queue.failed() == [{'method': 'get_holders', 'args': ['degods'], 'attempts': 2, 'error': LEASE_EXPIRED}]
+
+
+class ObjectParser:
+    def __init__(self, rate_limiter=None):
+        self.calls = 0
+
+    def get_object(self):
+        self.calls += 1
+        return object()
+
+    def close(self):
+        pass
+
+
+def test_scheduler_unserializable_result(tmp_path):
+    queue = SqliteQueue(str(tmp_path / 'tasks.db'), retry_delay=0)
+    scheduler = Scheduler(queue, ObjectParser, workers=1, budget_path=str(tmp_path / 'budget.db'))
+    scheduler.submit([('get_object', [])])
+    assert scheduler.run() == {'failed': 1}
+    failed, = queue.failed()
+    assert failed['attempts'] == 1 and failed['error'].startswith('result is not saved: TypeError')
+
+
+def test_task_queue_is_abstract():
+    class PartialQueue(TaskQueue):
+        def put(self, tasks, priority=0):
+            return 0
+
+    with pytest.raises(TypeError):
+        TaskQueue()
+    with pytest.raises(TypeError):
+        PartialQueue()
+
+
+def test_shared_rate_budget(tmp_path):
+    path = str(tmp_path / 'budget.db')
+    first, second = SharedTokenBucket(path, 'host', rate=5), SharedTokenBucket(path, 'host', rate=5)
+    for _ in range(5):
+        first.acquire()
+    start = time.monotonic()
+    second.acquire()
+    assert time.monotonic() - start >= 0.1
+
+
+@pytest.mark.parametrize('scenario', ['sync', 'cached', 'concurrent'])
+def test_benchmark_scenario(server, scenario):
+    result = run_scenario(scenario, server, calls=len(WORKLOAD), workers=4)
+    assert result['errors'] == 0
+    assert result['http_requests'] >= 1
+
+
+class FlakyParser:
+    # get_all_collections stream that crashes at fail_at record
+    def __init__(self, records, fail_at=None):
+        self.records = records
+        self.fail_at = fail_at
+
+    def get_all_collections(self):
+        for i, record in enumerate(self.records):
+            if i == self.fail_at:
+                raise RuntimeError('crash')
+            yield record
+
+
+EXPORT_RECORDS = [{'symbol': f'c{i}', 'floor': None} for i in range(7)] + [
+    {'symbol': f'c{i}', 'floor': i, 'name': f'C {i}', 'stats': {'volume': i * 10}} for i in range(7, 15)
+] + [{'symbol': f'c{i}', 'floor': i + 0.5, 'name': i} for i in range(15, 23)]
+
+
+def read_export(base_path, fmt):
+    import csv
+    import glob
+
+    records = []
+    for path in sorted(glob.glob(f'{base_path}-*.{fmt}')):
+        if fmt == 'jsonl':
+            with open(path) as f:
+                records += [json.loads(line) for line in f]
+        elif fmt == 'csv':
+            with open(path, newline='') as f:
+                records += list(csv.DictReader(f))
+        else:
+            import pyarrow.parquet as pq
+            records += pq.read_table(path).to_pylist()
+    return records
+
+
+def as_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, dict):
+        return json.dumps(value, separators=(',', ':'))
+    return str(value)
+
+
+def check_export(records, fmt):
+    assert len(records) == len(EXPORT_RECORDS)
+    for record, expected in zip(records, EXPORT_RECORDS):
+        if fmt == 'jsonl':
+            assert record == expected
+        elif fmt == 'csv':
+            assert {key: value for key, value in record.items() if value} == \
+                   {key: as_text(value) for key, value in expected.items() if value is not None}
+        else:
+            assert record['symbol'] == expected['symbol']
+            assert record['floor'] == expected['floor']
+            assert record.get('name') == (None if expected.get('name') is None else str(expected['name']))
+
+
+@pytest.mark.parametrize('fmt', ['jsonl', 'csv', 'parquet'])
+def test_export_schema_changes(tmp_path, fmt):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    from magiceden_api.export import export
+
+    base_path = str(tmp_path / 'collections')
+    assert export(FlakyParser(EXPORT_RECORDS), 'all_collections', base_path, fmt, max_records=20,
+                  buffer_size=4) == len(EXPORT_RECORDS)
+    check_export(read_export(base_path, fmt), fmt)
+
+
+@pytest.mark.parametrize('fmt', ['jsonl', 'csv', 'parquet'])
+@pytest.mark.parametrize('fail_at', [5, 9, 21])
+def test_export_resume(tmp_path, fmt, fail_at):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    from magiceden_api.export import export
+
+    base_path = str(tmp_path / 'collections')
+    with pytest.raises(RuntimeError):
+        export(FlakyParser(EXPORT_RECORDS, fail_at), 'all_collections', base_path, fmt, max_records=6, buffer_size=3)
+    export(FlakyParser(EXPORT_RECORDS), 'all_collections', base_path, fmt, max_records=6, buffer_size=3)
+    check_export(read_export(base_path, fmt), fmt)
+
+
+def test_export_resume_other_source(tmp_path):
+    from magiceden_api.export import export
+
+    base_path = str(tmp_path / 'holders')
+    with pytest.raises(RuntimeError):
+        export(FlakyParser(EXPORT_RECORDS, 5), 'all_collections', base_path, max_records=6, buffer_size=3)
+    with pytest.raises(ValueError, match='checkpoint'):
+        export(FlakyParser(EXPORT_RECORDS), 'popular_collections', base_path, max_records=6, buffer_size=3)
+
+
+def crawl_edges(path):
+    from collections import Counter
+
+    with open(path) as f:
+        return Counter(f.read().splitlines())
+
+
+def test_crawler_resume_after_crash(server, tmp_path):
+    import shutil
+    from magiceden_api.crawler import HolderCrawler
+
+    server.items = 20
+    full = HolderCrawler(make_parser(server), str(tmp_path / 'full.json'), str(tmp_path / 'full.jsonl'))
+    assert len(list(full.crawl(collections=['degods']))) == 220
+
+    state_path, edges_path = str(tmp_path / 'crawl.json'), str(tmp_path / 'edges.jsonl')
+    crawler = HolderCrawler(make_parser(server), state_path, edges_path, max_workers=2, save_every=7)
+    saves = []
+    save = crawler.save
+    crawler.save = lambda running=(): saves.append(1) or save(running)
+    edges = crawler.crawl(collections=['degods'])
+    for _ in range(150):
+        next(edges)
+    # process killed: state and edges as they are on disk, nothing is saved on exit
+    assert len(saves) < 20
+    shutil.copy(state_path, tmp_path / 'crash.json')
+    shutil.copy(edges_path, tmp_path / 'crash.jsonl')
+    edges.close()
+    # edges of nodes expanded after last save and a torn line
+    with open(tmp_path / 'crash.jsonl', 'a') as f:
+        f.write(json.dumps({'wallet': 'wallet0', 'collection': 'collection_0', 'tokens': 4, 'depth': 1}) + '\n')
+        f.write('{"wallet": "wal')
+
+    resumed = HolderCrawler(make_parser(server), str(tmp_path / 'crash.json'), str(tmp_path / 'crash.jsonl'))
+    list(resumed.crawl())
+    assert crawl_edges(tmp_path / 'crash.jsonl') == crawl_edges(tmp_path / 'full.jsonl')
+
+
+class FailingWalletParser:
+    def __init__(self, parser, wallet):
+        self.parser = parser
+        self.wallet = wallet
+        self.calls = 0
+
+    def get_holders(self, symbol):
+        return self.parser.get_holders(symbol)
+
+    def get_nfts_by_owner(self, wallet):
+        if wallet == self.wallet:
+            self.calls += 1
+            raise RuntimeError('down')
+        return self.parser.get_nfts_by_owner(wallet)
+
+
+def test_crawler_max_attempts(server, tmp_path):
+    from magiceden_api.crawler import HolderCrawler
+
+    server.items = 5
+    parser = FailingWalletParser(make_parser(server), 'wallet3')
+    state_path = str(tmp_path / 'crawl.json')
+    crawler = HolderCrawler(parser, state_path, max_depth=1, max_attempts=3)
+    edges = list(crawler.crawl(collections=['degods']))
+
+    assert parser.calls == 3
+    assert crawler.failed == [('wallet', 'wallet3', 1)]
+    assert len(edges) == 5 + 4 * 5
+    assert crawler.requests == 1 + 5 + 2
+
+    resumed = HolderCrawler(parser, state_path, max_depth=1)
+    assert resumed.failed == crawler.failed
+    assert list(resumed.crawl()) == []
+    assert parser.calls == 3
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError('down')
+
+
+def test_wallet_portfolio(server):
+    mp = make_parser(server)
+    portfolio = mp.get_wallet_portfolio('wallet0')
+    assert portfolio['errors'] == {}
+    assert sorted(portfolio['nfts']) == sorted(f'mint{i}' for i in range(20))
+    assert portfolio['nfts']['mint1']['owned'] and portfolio['nfts']['mint1']['in_escrow']
+    assert portfolio['nfts']['mint1']['listing']['tokenMint'] == 'mint1'
+    assert portfolio['collections']['collection_0']['count'] == 4
+    assert portfolio['user']['displayName'] == 'user'
+
+
+def test_wallet_portfolio_errors(server):
+    mp = make_parser(server)
+    mp.get_user_listings = fail
+    mp.get_user_info = fail
+    mp.get_multi_collection_stats = fail
+    portfolio = mp.get_wallet_portfolio('wallet0')
+
+    assert set(portfolio['errors']) == {'listings', 'user', 'floor_prices'}
+    assert isinstance(portfolio['errors']['listings'], RuntimeError)
+    assert set(portfolio['errors']['floor_prices']) == {f'collection_{i}' for i in range(5)}
+    assert portfolio['user'] == {}
+    assert all(nft['listing'] is None for nft in portfolio['nfts'].values())
+    assert len(portfolio['nfts']) == 20
+
+
+def test_wallet_portfolio_without_mints(server):
+    mp = make_parser(server)
+    mp.get_nfts_by_owner = lambda wallet: [{'collectionSymbol': 'a'}, {'collectionName': 'B', 'name': 'b'}]
+    mp.get_nfts_by_escrow_owner = lambda wallet: [{'mintAddress': 'mint1', 'collection': 'a'}]
+    mp.get_user_listings = lambda wallet: []
+    portfolio = mp.get_wallet_portfolio('wallet0')
+
+    nfts = portfolio['nfts']
+    assert sorted(nfts) == ['mint1', 'owned:0', 'owned:1']
+    assert nfts['owned:0']['mint'] is None and nfts['owned:0']['collection'] == 'a'
+    # collection name is not a symbol
+    assert nfts['owned:1']['collection'] is None
+    assert portfolio['collections']['a']['count'] == 2
+
+
+def test_columnar_imported_lazily(server):
+    import subprocess
+    import sys
+
+    code = "import sys, magiceden_api; print('numpy' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True).stdout.strip() == 'False'
+
+    pytest.importorskip('numpy')
+    series = make_parser(server).get_collection_time_series('degods', columnar=True)
+    assert len(series) == 45 and series.names == ['timestamp', 'floor_price', 'volume']
+    assert series.floor_price[0] == 1.0 and series.timestamp[1] - series.timestamp[0] == 3600
+
+
+@pytest.mark.parametrize('how, expected', [
+    ('first', [1, 3, 6]), ('last', [2, 5, 6]), ('sum', [3, 12, 6]),
+    ('mean', [1.5, 4, 6]), ('min', [1, 3, 6]), ('max', [2, 5, 6]),
+])
+def test_resample(how, expected):
+    np = pytest.importorskip('numpy')
+    from magiceden_api.columnar import resample
+
+    timestamp = np.array([0., 50, 100, 120, 199, 310])
+    bucket_ts, values = resample(timestamp, np.array([1., 2, 3, 4, 5, 6]), 100, how)
+    assert bucket_ts.tolist() == [0, 100, 300]
+    assert values.tolist() == expected
+
+    bucket_ts, values = resample(np.array([]), np.array([]), 100, how)
+    assert len(bucket_ts) == 0 and len(values) == 0
+
+
+def test_rolling_and_vwap():
+    np = pytest.importorskip('numpy')
+    from magiceden_api.columnar import resample, rolling_mean, rolling_min, rolling_sum, vwap
+
+    values = np.array([4., 2, 6, 1, 3])
+    assert np.isnan(rolling_mean(values, 3)[:2]).all()
+    assert rolling_mean(values, 3)[2:].tolist() == [4, 3, 10 / 3]
+    assert rolling_min(values, 2)[1:].tolist() == [2, 2, 1, 1]
+    assert rolling_sum(values, 5)[-1] == 16
+    assert np.isnan(rolling_min(values, 6)).all()
+    assert len(rolling_mean(np.array([]), 3)) == 0
+
+    price, volume = np.array([1., 2, 4]), np.array([3., 1, 1])
+    assert vwap(price, volume) == 9 / 5
+    assert vwap(price, volume, window=2)[1:].tolist() == [5 / 4, 3]
+
+    with pytest.raises(ValueError):
+        resample(values, values, 10, how='median')
+
+
+def test_async_parser_imported_lazily():
+    import subprocess
+    import sys
+
+    code = "import sys, magiceden_api; print('aiohttp' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True).stdout.strip() == 'False'
+
+    code = "import sys; sys.modules['aiohttp'] = None; from magiceden_api import AsyncMagicParser"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    assert 'ImportError: aiohttp is required' in result.stderr
+
+
+def test_async_retries(server):
+    aio = pytest.importorskip('magiceden_api.aio')
+    from magiceden_api.ratelimit import RetryError
+
+    async def run():
+        async with aio.AsyncMagicParser(endpoints=server.endpoints(), retries=2, retry_timeout=0.001) as ap:
+            server.script['price'] = [429, 503]
+            assert (await ap.get_price())['price']
+            server.script['price'] = [500, 500, 500]
+            with pytest.raises(RetryError):
+                await ap.get_price()
+
+    asyncio.run(run())
+    assert server.hits['price'] == 6
+
+
+def test_async_retry_releases_slot(server):
+    aio = pytest.importorskip('magiceden_api.aio')
+    from magiceden_api.ratelimit import RetryPolicy
+
+    async def run():
+        policy = RetryPolicy(max_attempts=2, backoff_base=0.5, jitter=False)
+        async with aio.AsyncMagicParser(endpoints=server.endpoints(), concurrency=1, retry_policy=policy) as ap:
+            server.script['price'] = [503]
+            done = []
+
+            async def call(name, method):
+                await method()
+                done.append(name)
+
+            await asyncio.gather(call('price', ap.get_price), call('volumes', ap.get_magiceden_volumes))
+            return done
+
+    # other request runs while price waits for retry
+    assert asyncio.run(run()) == ['volumes', 'price']
+
+
+class PublicFallback:
+    def __init__(self):
+        self.urls = []
+
+    def fetch(self, url):
+        self.urls.append(url)
+        return b'{"solPrice": 1}'
+
+
+def test_async_fallback(server):
+    aio = pytest.importorskip('magiceden_api.aio')
+    fallback = PublicFallback()
+
+    async def run():
+        async with aio.AsyncMagicParser(endpoints=server.endpoints(), fallback=fallback) as ap:
+            server.script['price'] = [403]
+            return await ap.get_price()
+
+    assert asyncio.run(run()) == {'solPrice': 1}
+    assert len(fallback.urls) == 1 and server.hits['price'] == 1
+
+
+EXTRACT_PAYLOAD = json.dumps({'collections': [
+    {'symbol': 'a', 'name': None, 'image': 'a.png', 'stats': {'floor': 1}},
+    {'symbol': 'b', 'image': 'b.png'},
+    {'name': 'C', 'stats': None},
+]}).encode()
+
+
+@pytest.mark.parametrize('backend', ['orjson', 'msgspec', 'json'])
+def test_decoder_extract_parity(backend):
+    from magiceden_api.decoding import Decoder, available_backends
+
+    if backend not in available_backends():
+        pytest.skip(f'{backend} is not installed')
+    decoder = Decoder(backend)
+    assert decoder.backend == backend
+
+    # explicit nulls are kept, missing fields are omitted
+    assert decoder.extract(EXTRACT_PAYLOAD, ['symbol', 'name', 'stats'], path='collections') == [
+        {'symbol': 'a', 'name': None, 'stats': {'floor': 1}},
+        {'symbol': 'b'},
+        {'name': 'C', 'stats': None},
+    ]
+    records = json.dumps(json.loads(EXTRACT_PAYLOAD)['collections'])
+    assert decoder.extract(records.encode(), ['name']) == [{'name': None}, {}, {'name': 'C'}]
+    assert decoder.loads(EXTRACT_PAYLOAD) == json.loads(EXTRACT_PAYLOAD)
+
+
+@pytest.mark.parametrize('backend', ['orjson', 'msgspec', 'json'])
+def test_fields_parity(server, backend):
+    from magiceden_api.decoding import available_backends
+
+    if backend not in available_backends():
+        pytest.skip(f'{backend} is not installed')
+    mp = make_parser(server, json_backend=backend)
+    collections = mp.get_all_collections()
+    assert mp.get_all_collections(fields=['symbol', 'description']) == [
+        {key: c[key] for key in ('symbol', 'description') if key in c} for c in collections
+    ]
+
+
+def test_batcher_merges_concurrent_calls(server):
+    from magiceden_api import CollectionBatcher
+
+    batcher = CollectionBatcher(make_parser(server), window=0.2)
+    symbols = [f'collection_{i}' for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        stats = list(executor.map(batcher.get_collection_escrow_stats, symbols))
+
+    assert [item['symbol'] for item in stats] == symbols
+    assert server.hits['multi_collection_stats'] == 1
+    assert batcher.escrow_stats.requests_sent == 1
+
+    # 120 symbols don't fit one request
+    assert len(batcher.map_collection_escrow_stats([f'c{i}' for i in range(120)])) == 120
+    assert batcher.escrow_stats.requests_sent == server.hits['multi_collection_stats'] == 4
+
+
+def test_batcher_error_reaches_all_callers(server):
+    from magiceden_api import CollectionBatcher
+
+    batcher = CollectionBatcher(make_parser(server), window=0.2)
+    server.script['multi_collection_stats'] = [404]
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(batcher.get_collection_escrow_stats, f'c{i}') for i in range(5)]
+    assert all(isinstance(future.exception(), requests.HTTPError) for future in futures)
+    assert server.hits['multi_collection_stats'] == 1
+
+
+def test_listing_book():
+    from magiceden_api.floor import ListingBook
+
+    book = ListingBook()
+    assert not book.valid and book.floor is None
+    book.snapshot([{'tokenMint': 'a', 'price': 2}, {'mint': 'b', 'price': 1}, {'tokenMint': 'c', 'price': 3}],
+                  complete=False)
+    assert book.floor == 1 and book.horizon == 3 and book.valid
+
+    book.apply({'txType': 'list', 'tokenMint': 'd', 'price': 0.5})
+    book.apply({'txType': 'updateListing', 'tokenMint': 'b', 'price': 1.5})
+    assert book.floor == 0.5 and len(book) == 4
+    book.apply({'txType': 'buyNow', 'tokenMint': 'd'})
+    book.apply({'txType': 'delist', 'tokenMint': 'b'})
+    book.apply({'txType': 'cancelEscrow', 'tokenMint': 'a'})
+    assert book.floor == 3 and book.valid
+    # listings above horizon are unknown
+    book.apply({'txType': 'exchange', 'tokenMint': 'c'})
+    assert book.floor is None and not book.valid
+
+    book.snapshot([], complete=True)
+    assert book.floor is None and book.valid
+
+
+def test_floor_tracker(server):
+    from magiceden_api.floor import FloorTracker
+
+    mp = make_parser(server)
+    tracker = FloorTracker(mp, ['degods'], max_age=60)
+    assert tracker.floor('degods') == 1.0
+    assert server.hits['listed_nfts'] == 1
+
+    # stats floor matches book, nothing is reloaded
+    assert tracker.refresh() == {}
+    assert server.hits['multi_collection_stats'] == 1 and server.hits['listed_nfts'] == 1
+
+    # stats floor differs, activities don't explain it, book is reloaded
+    mp.get_multi_collection_stats = lambda symbols: [{'symbol': 'degods', 'floorPrice': 2 * 10 ** 9}]
+    server.items = 0
+    assert tracker.refresh() == {'degods': None}
+    assert server.hits['listed_nfts'] == 2
+    assert tracker.floors() == {'degods': None}
+
+
+def test_floor_tracker_errors(server):
+    from magiceden_api.floor import FloorError, FloorTracker
+
+    mp = make_parser(server)
+    get_listed_nfts = mp.get_listed_nfts
+    mp.get_listed_nfts = fail
+    tracker = FloorTracker(mp, ['degods', 'okay_bears'])
+    with pytest.raises(FloorError) as error:
+        tracker.floor('degods')
+    assert error.value.symbol == 'degods' and isinstance(error.value.error, RuntimeError)
+    with pytest.raises(FloorError):
+        tracker.floor('degods', stale=True)
+    assert tracker.floors() == {}
+
+    # failed collections are loaded on next refresh
+    mp.get_listed_nfts = get_listed_nfts
+    assert tracker.floor('degods') == 1.0
+    assert set(tracker.errors) == {'okay_bears'}
+    tracker.refresh()
+    assert tracker.errors == {}
+    assert tracker.floors() == {'degods': 1.0, 'okay_bears': 1.0}
+
+    # refresh failure keeps last known floor for stale reads
+    mp.get_multi_collection_stats = fail
+    mp.get_global_activities = fail
+    tracker.refresh()
+    with pytest.raises(FloorError):
+        tracker.floor('degods')
+    assert tracker.floor('degods', stale=True) == 1.0
+
+
+class FakeChrome:
+    # undetected Chrome stand-in for LazyDriver lifecycle tests
+    def __init__(self, crash_on=None):
+        self.crash_on = crash_on
+        self.loads = 0
+        self.closed = False
+
+    def get(self, url):
+        self.loads += 1
+        if self.crash_on == self.loads:
+            self.closed = True
+            raise RuntimeError('chrome crashed')
+
+    @property
+    def current_url(self):
+        if self.closed:
+            raise RuntimeError('chrome is closed')
+        return 'about:blank'
+
+    def get_cookies(self):
+        return []
+
+    def execute_script(self, script):
+        return 'FakeChrome'
+
+    def quit(self):
+        self.closed = True
+
+
+@pytest.fixture
+def chromes(monkeypatch):
+    from magiceden_api import driver
+
+    started = []
+
+    def start_chrome(*args, **kwargs):
+        started.append(FakeChrome())
+        return started[-1]
+
+    monkeypatch.setattr(driver, 'start_chrome', start_chrome)
+    monkeypatch.setattr(driver, 'page_text', lambda chrome: '{}')
+    return started
+
+
+def test_lazy_driver_recycled_after_max_page_loads(chromes):
+    from magiceden_api.driver import LazyDriver
+
+    driver = LazyDriver(idle_timeout=None, max_page_loads=2)
+    assert not driver.is_running and chromes == []
+    for _ in range(5):
+        assert driver.request('https://example.com').text == '{}'
+    assert driver.starts == len(chromes) == 3
+    assert [chrome.closed for chrome in chromes] == [True, True, False]
+    assert driver.page_loads == 1
+
+
+def test_lazy_driver_restarts_crashed_chrome(chromes):
+    from magiceden_api.driver import LazyDriver
+
+    driver = LazyDriver(idle_timeout=None)
+    driver.request('https://example.com')
+    chromes[0].crash_on = 2
+    with pytest.raises(RuntimeError):
+        driver.request('https://example.com')
+    assert driver.errors == 1 and not driver.is_running
+    driver.request('https://example.com')
+    assert driver.starts == 2
+
+
+def test_lazy_driver_idle_timeout(chromes):
+    from magiceden_api.driver import LazyDriver
+
+    driver = LazyDriver(idle_timeout=0.05)
+    driver.request('https://example.com')
+    assert driver.is_running
+    time.sleep(0.2)
+    assert not driver.is_running and chromes[0].closed
+
+
+def test_driver_pool_acquire_timeout(chromes):
+    from magiceden_api.driver import DriverPool
+
+    pool = DriverPool(size=1, acquire_timeout=0.05)
+    with pool.acquire() as driver:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            with pool.acquire():
+                pass
+        assert time.monotonic() - started >= 0.05
+        with pytest.raises(TimeoutError):
+            pool.request('https://example.com', timeout=0.01)
+
+    # released driver is checked out again
+    with pool.acquire(timeout=0.01) as again:
+        assert again is driver
+    assert pool.request('https://example.com').text == '{}'
+    assert pool.stats() == [{'running': True, 'page_loads': 1, 'starts': 1, 'errors': 0}]
+    pool.quit()
+    assert chromes[0].closed
+
+
+def test_activity_sync_resume(server, tmp_path):
+    from magiceden_api.sync import ActivitySync
+
+    state_path = str(tmp_path / 'activity.json')
+    sync = ActivitySync(make_parser(server), state_path, page_size=10)
+    first = sync.poll_collection('degods')
+    assert [a['signature'] for a in first] == [f'sig{i}' for i in range(9, -1, -1)]
+    assert sync.poll_collection('degods') == []
+
+    # restarted sync continues from saved watermark
+    resumed = ActivitySync(make_parser(server), state_path, page_size=10)
+    assert resumed.watermarks == {'collection:degods': {'blockTime': 1672531200, 'signature': 'sig0'}}
+    assert resumed.poll_collection('degods') == []
+
+    # activities newer than watermark are returned oldest first, once
+    with open(state_path) as f:
+        state = json.load(f)
+    state['watermarks']['collection:degods'] = {'blockTime': 1672531200 - 15 * 60, 'signature': 'sig15'}
+    state['seen']['collection:degods'] = ['sig15']
+    with open(state_path, 'w') as f:
+        json.dump(state, f)
+    resumed = ActivitySync(make_parser(server), state_path, page_size=10)
+    assert [a['signature'] for a in resumed.poll_collection('degods')] == [f'sig{i}' for i in range(14, -1, -1)]
+    assert resumed.poll_collection('degods') == []
+
+
+def test_activity_sync_dedup_and_gap(caplog):
+    from magiceden_api.sync import ActivitySync
+
+    sync = ActivitySync(None, page_size=2, max_pages=2)
+    sync.watermarks['k'] = {'blockTime': 0, 'signature': None}
+    # offsets shifted between pages, activities without signature differ by mint
+    pages = [
+        [{'signature': 's2', 'blockTime': 3}, {'signature': 's1', 'blockTime': 2}],
+        [{'signature': 's1', 'blockTime': 2}, {'blockTime': 1, 'tokenMint': 'a'}],
+    ]
+    with caplog.at_level('WARNING', logger='MagicParser'):
+        new = sync._poll('k', lambda offset, limit: pages[offset // limit])
+    assert [a.get('signature', a.get('tokenMint')) for a in new] == ['a', 's1', 's2']
+    assert 'watermark not reached' in caplog.text
+
+    pages = [[{'blockTime': 4, 'tokenMint': 'b'}, {'blockTime': 0, 'tokenMint': 'c'}]]
+    assert [a['tokenMint'] for a in sync._poll('k', lambda offset, limit: pages[offset // limit])] == ['b']
+
+
+def test_activity_sync_atomic_save(server, tmp_path, monkeypatch):
+    from magiceden_api.sync import ActivitySync
+
+    state_path = str(tmp_path / 'activity.json')
+    sync = ActivitySync(make_parser(server), state_path, page_size=10)
+    sync.poll_collection('degods')
+    with open(state_path) as f:
+        saved = f.read()
+
+    def crash(state, f):
+        f.write('{"watermarks": {')
+        raise OSError('disk full')
+
+    monkeypatch.setattr(json, 'dump', crash)
+    with pytest.raises(OSError):
+        sync.poll_wallet('wallet0')
+    monkeypatch.undo()
+
+    # interrupted save leaves previous state
+    with open(state_path) as f:
+        assert f.read() == saved
+    assert list(ActivitySync(make_parser(server), state_path).watermarks) == ['collection:degods']
+
+
+def test_collection_watcher_digest_diff(server, tmp_path):
+    from magiceden_api.watcher import ADD, CHANGE, REMOVE, CollectionWatcher, collection_digest
+
+    index_path = str(tmp_path / 'collections.json')
+    server.items = 5
+    added = []
+    watcher = CollectionWatcher(make_parser(server), index_path, on_add=added.append)
+    # first poll builds index without events
+    assert watcher.poll() == [] and len(watcher.index) == 5 and added == []
+
+    server.items = 7
+    events = watcher.poll()
+    assert [(e.type, e.symbol) for e in events] == [(ADD, 'collection_5'), (ADD, 'collection_6')]
+    assert added == events
+
+    server.items = 4
+    assert sorted((e.type, e.symbol) for e in watcher.poll()) == [
+        (REMOVE, 'collection_4'), (REMOVE, 'collection_5'), (REMOVE, 'collection_6')
+    ]
+
+    # restarted watcher diffs against saved digests
+    with open(index_path) as f:
+        state = json.load(f)
+    assert state['index']['collection_0'] == collection_digest(make_parser(server).get_all_collections()[0])
+    state['index']['collection_1'] = 'old digest'
+    with open(index_path, 'w') as f:
+        json.dump(state, f)
+    events = CollectionWatcher(make_parser(server), index_path).poll()
+    assert [(e.type, e.symbol, e.collection['name']) for e in events] == [(CHANGE, 'collection_1', 'Collection 1')]
+
+
+def test_collection_watcher_adaptive_interval(server):
+    from magiceden_api.watcher import CollectionWatcher
+
+    server.items = 3
+    watcher = CollectionWatcher(make_parser(server), interval=60, min_interval=15, max_interval=100)
+    watcher.poll()
+    assert watcher.interval == 90
+    watcher.poll()
+    assert watcher.interval == 100
+
+    for items, interval in [(4, 50), (5, 25), (6, 15), (7, 15)]:
+        server.items = items
+        watcher.poll()
+        assert watcher.interval == interval
+
+    watcher.poll()
+    assert watcher.interval == 22.5
+
+
+def test_models_from_dict():
+    from magiceden_api.models import Activity, Collection, Holder, Listing, Model, PopularCollection
+
+    activity = Activity.from_dict({
+        'signature': 'sig', 'type': 'buyNow', 'blockTime': 1, 'buyer_address': 'b', 'seller': 's',
+        'tokenMint': 'm', 'collection': 'c', 'price': 5, 'parsedTransaction': {'total_amount': 2 * 10 ** 9}
+    })
+    assert activity == Activity('sig', 'buyNow', 1, 2.0, 'b', 's', 'm', 'c')
+    assert Activity.from_dict({'price': 5}).price == 5
+
+    raw = {'owner': 'w', 'tokens': 3, 'buy7d': {'volume': 10 ** 9, 'count': 1}}
+    holder = Holder.from_dict(raw)
+    assert holder.fields_dict() == {'owner': 'w', 'tokens': 3, 'buy_volume_7d': 1.0, 'buy_count_7d': 1}
+    # typed result converts back to api dict
+    assert holder.to_dict() == raw and Holder.from_dict(holder.to_dict()) == holder
+    assert Holder('w', 3, 1.0, 1).to_dict() == holder.fields_dict()
+    assert Holder.from_dict({'owner': 'w'}).buy_volume_7d is None
+
+    popular = PopularCollection.from_dict({'symbol': 's', 'fp': 10 ** 9, 'vol': None, 'listedCount': 2})
+    assert (popular.symbol, popular.floor_price, popular.volume, popular.listed_count) == ('s', 1.0, None, 2)
+
+    collection = Collection.from_dict({'symbol': 's', 'categories': ['pfp', None], 'totalItems': 5})
+    assert collection.categories == ['pfp'] and collection.total_items == 5 and collection.twitter is None
+    assert Listing.field_names() == ['mint', 'price', 'seller', 'collection_symbol', 'title', 'image']
+    with pytest.raises(TypeError):
+        Model()
+
+    # compact records, no per instance dict
+    assert not hasattr(holder, '__dict__')
+    with pytest.raises(AttributeError):
+        holder.extra = 1
+
+
+def test_models_typed_results(server):
+    from magiceden_api.models import Activity, Collection, Holder, Listing
+
+    mp = make_parser(server)
+    listings = mp.get_listed_nfts('degods', limit=3, typed=True)
+    assert listings == to_models(mp.get_listed_nfts('degods', limit=3), Listing)
+    assert [(item.mint, item.price, item.seller) for item in listings] == [
+        ('mint0', 1.0, 'seller0'), ('mint1', 1.1, 'seller1'), ('mint2', 1.2, 'seller2')
+    ]
+
+    activities = mp.get_global_activities('degods', limit=2, typed=True)
+    assert all(isinstance(item, Activity) for item in activities)
+    assert [(item.signature, item.block_time, item.collection_symbol) for item in activities] == [
+        ('sig0', 1672531200, 'degods'), ('sig1', 1672531140, 'degods')
+    ]
+
+    holders = mp.get_holders('degods', typed=True)
+    assert len(holders) == 45 and holders[0] == Holder('wallet0', 45, None, None)
+    assert mp.get_collection('degods', typed=True).symbol == 'degods'
+    assert isinstance(mp.get_collection('degods', typed=True), Collection)
+
+    lazy = iter_models(iter([{'owner': 'w'}]), Holder)
+    assert next(lazy).owner == 'w'
+
+
+def test_parser_driver_released(server, chromes):
+    mp = make_parser(server, driver_mode='lazy', driver_idle_timeout=0.05)
+    assert chromes == []
+    with pytest.deprecated_call():
+        assert mp.driver is chromes[0]
+    # idle timer restarts after access
+    time.sleep(0.2)
+    assert chromes[0].closed
+
+    with mp.use_driver() as driver:
+        time.sleep(0.2)
+        assert driver is chromes[1] and not driver.closed
+    time.sleep(0.2)
+    assert chromes[1].closed
+
+    with pytest.raises(RuntimeError):
+        with make_parser(server).use_driver():
+            pass
+
+
+def test_http2_adapter_settings(server):
+    pytest.importorskip('h2')
+    import ssl
+    from magiceden_api.transport import ssl_context
+
+    mp = make_parser(server, transport=Transport(http2=True, read_timeout=5))
+    mp.session.trust_env = False  # no CA bundle and proxies from environment
+    adapter = mp.session.get_adapter(server.url + '/')
+    with MockServer(items=3) as proxy:
+        mp.session.proxies = {'http': proxy.url}
+        assert len(mp.get_holders('degods')['topHolders']) == 3
+        assert proxy.hits['holders'] == 1 and server.hits.get('holders', 0) == 0
+
+        mp.session.proxies = {}
+        mp.session.verify = False
+        assert len(mp.get_holders('okay_bears')['topHolders']) == 45
+        assert proxy.hits['holders'] == 1
+
+    assert set(adapter._clients) == {(True, None, None), (True, None, proxy.url), (False, None, None)}
+    assert ssl_context(False).verify_mode == ssl.CERT_NONE
+    assert ssl_context(True).verify_mode == ssl.CERT_REQUIRED
+    with pytest.raises(OSError):
+        ssl_context(True, cert='missing.pem')
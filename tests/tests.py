@@ -1,7 +1,7 @@
 import json
 from pprint import pprint
 
-from magicapi import MagicParser
+from magiceden_api import MagicParser
 from urllib.parse import quote, urlencode
 
 